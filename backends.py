@@ -0,0 +1,390 @@
+"""
+Data backends for Lottorama.
+
+A backend reads the 'euro' draw history, records the user ticket in
+the 'user' workbook, appends the tickets played to the 'tickets'
+workbook and reads the 'user-ranking' and 'num-ranks' rankings.
+SheetsBackend does this against the 'lottorama-data' Google Sheets
+document. LocalBackend does it against CSV files in a local
+directory, laid out like the worksheets, and computes the rankings
+itself where the spreadsheet uses formulas, so the app can run and be
+benchmarked without Google Sheets. FallbackBackend answers from a
+primary backend and switches to a second one whenever the first fails,
+for example when the Sheets API is slow or over its quota.
+
+The backend is chosen with LOTTORAMA_BACKEND:
+    sheets    Google Sheets only (default).
+    local     The CSV files in LOTTORAMA_DATA_DIR only, with the draws
+              imported by ingest.py if any (default when
+              LOTTORAMA_OFFLINE is set).
+    fallback  Google Sheets, falling back to the CSV files.
+"""
+import csv
+import os
+import tempfile
+
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from draw_store import DrawStore
+from metrics import increment, span
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX, count_wins
+from ranking import parse_draws
+from sheet_writer import WriteReport, append_rows, write_rows
+from sheets import OFFLINE, get_spreadsheet, get_worksheet
+
+DEFAULT_BACKEND = os.environ.get(
+    "LOTTORAMA_BACKEND", "local" if OFFLINE else "sheets"
+    )
+DEFAULT_DATA_DIR = os.environ.get("LOTTORAMA_DATA_DIR", "data")
+
+# Worksheets holding rankings that a backend can read
+RANKING_WORKSHEETS = ("user-ranking", "num-ranks")
+
+# Worksheet keeping the history of the tickets played
+TICKETS_WORKSHEET = "tickets"
+
+
+def ranking_rows(name, draw_rows, user_rows=None):
+    """
+    Function to compute the rows of a rankings worksheet, as the
+    formulas of the spreadsheet do.
+
+    Args:
+    name (str): 'user-ranking' for the wins of the numbers in the
+    first row of the 'user' worksheet, or 'num-ranks' for the wins
+    of all 50 numbers.
+    draw_rows (list): The rows of the 'euro' worksheet.
+    user_rows (list): The rows of the 'user' worksheet, needed for
+    'user-ranking'.
+
+    Returns:
+    list: The rows, in the layout of the worksheet.
+    """
+    main_counts, lucky_counts = count_wins(parse_draws(draw_rows))
+
+    if name == "num-ranks":
+        return [
+            [str(num) for num in range(1, MAIN_NUMBER_MAX + 1)],
+            [str(wins) for wins in main_counts[1:]],
+            ]
+
+    numbers_row = user_rows[0][:8]
+    wins_row = ["Wins:"]
+    for column, num in enumerate(numbers_row[1:], start=1):
+        counts, maximum = (
+            (main_counts, MAIN_NUMBER_MAX) if column <= 5
+            else (lucky_counts, LUCKY_NUMBER_MAX)
+            )
+        wins = int(num)
+        wins_row.append(
+            str(counts[wins]) if 1 <= wins <= maximum else "0"
+            )
+    return [numbers_row, wins_row]
+
+
+class SheetsBackend:
+    """
+    Backend reading and writing the Google Sheets document.
+
+    Args:
+    retry_options: Optional call_with_retry() arguments used for
+    the write of the ticket, such as max_attempts.
+    """
+
+    name = "sheets"
+
+    def __init__(self, **retry_options):
+        self.retry_options = retry_options
+
+    def available(self):
+        """
+        Function to check if the backend can be used at all.
+
+        Returns:
+        bool: False when the app runs offline.
+        """
+        return not OFFLINE
+
+    def read_draws(self, start_row=1):
+        """
+        Function to read the 'euro' worksheet from a given row.
+
+        Args:
+        start_row (int): The 1-based row to start from.
+
+        Returns:
+        list: Rows of strings, the draw date followed by the five
+        main numbers and the two lucky numbers.
+        """
+        with span("backend.read_draws", backend=self.name):
+            return get_worksheet("euro").get_values(f"A{start_row}:H")
+
+    def write_ticket(self, row):
+        """
+        Function to write the user ticket to the 'user' workbook.
+
+        Args:
+        row (list): The A1:H1 row, 'Numbers:' followed by the five
+        main numbers and the two lucky numbers.
+
+        Returns:
+        WriteReport: The number of rows written, API calls and retries.
+        """
+        with span("backend.write_ticket", backend=self.name):
+            return write_rows(
+                get_spreadsheet(), [("user", 1, row)], **self.retry_options
+                )
+
+    def append_tickets(self, rows):
+        """
+        Function to append tickets to the 'tickets' workbook, added to
+        the document on first use.
+
+        Args:
+        rows (list): Rows of the time the ticket was played followed
+        by its five main numbers and two lucky numbers.
+
+        Returns:
+        WriteReport: The number of rows written, API calls and retries.
+        """
+        with span("backend.append_tickets", backend=self.name):
+            return append_rows(
+                self._tickets_worksheet(), rows, **self.retry_options
+                )
+
+    def _tickets_worksheet(self):
+        try:
+            return get_worksheet(TICKETS_WORKSHEET)
+        except WorksheetNotFound:
+            pass
+        try:
+            get_spreadsheet().add_worksheet(TICKETS_WORKSHEET, 1000, 8)
+            increment("backend_worksheets_added_total")
+        except APIError:
+            # Another process added it meanwhile, or it cannot be added
+            # and the lookup below raises
+            pass
+        return get_worksheet(TICKETS_WORKSHEET)
+
+    def read_rankings(self, name):
+        """
+        Function to read a rankings worksheet.
+
+        Args:
+        name (str): 'user-ranking' or 'num-ranks'.
+
+        Returns:
+        list: The rows of the worksheet.
+        """
+        if name not in RANKING_WORKSHEETS:
+            raise ValueError(f"Unknown rankings worksheet: {name}")
+        with span("backend.read_rankings", backend=self.name):
+            return get_worksheet(name).get_all_values()
+
+
+class LocalBackend:
+    """
+    Backend reading and writing CSV files in a local directory.
+
+    The draws are read from 'euro.csv', in the layout of the 'euro'
+    worksheet, such as a CSV download of it, or from the columnar store
+    'euro.npz' written by ingest.py when there is one. The ticket is
+    written to 'user.csv'. The 'user-ranking' and 'num-ranks' rows are
+    computed from the draws, as the formulas of the spreadsheet would.
+
+    Args:
+    directory (str): The directory holding the CSV files.
+    """
+
+    name = "local"
+
+    def __init__(self, directory=DEFAULT_DATA_DIR):
+        self.directory = directory
+        self.store = DrawStore(os.path.join(directory, "euro.npz"))
+
+    def path(self, title):
+        """
+        Function to get the path of the CSV file of a worksheet.
+
+        Args:
+        title (str): The title of the worksheet, such as 'euro'.
+
+        Returns:
+        str: The path of the file.
+        """
+        return os.path.join(self.directory, f"{title}.csv")
+
+    def _read(self, title):
+        with open(self.path(title), newline="") as source:
+            return [row for row in csv.reader(source)]
+
+    def _draw_rows(self, start_row=1):
+        if self.store.exists():
+            return self.store.rows(start_row - 1)
+        return [row[:8] for row in self._read("euro")[start_row - 1:]]
+
+    def available(self):
+        """
+        Function to check if the backend can be used at all.
+
+        Returns:
+        bool: True if the draws file or the draw store exists.
+        """
+        return os.path.exists(self.path("euro")) or self.store.exists()
+
+    def read_draws(self, start_row=1):
+        """
+        Function to read the draws from a given row, from the draw
+        store if there is one, else from 'euro.csv'.
+
+        Args:
+        start_row (int): The 1-based row to start from.
+
+        Returns:
+        list: Rows of strings in the layout of the 'euro' worksheet.
+
+        Raises:
+        FileNotFoundError: If there is no draws file.
+        """
+        with span("backend.read_draws", backend=self.name):
+            return self._draw_rows(start_row)
+
+    def write_ticket(self, row):
+        """
+        Function to write the user ticket to 'user.csv', replacing
+        the file atomically.
+
+        Args:
+        row (list): The A1:H1 row of the 'user' workbook.
+
+        Returns:
+        WriteReport: One row written, without any API call.
+        """
+        with span("backend.write_ticket", backend=self.name):
+            os.makedirs(self.directory, exist_ok=True)
+            # A temporary file of its own, sessions write at once
+            handle, temp = tempfile.mkstemp(
+                dir=self.directory, suffix=".tmp"
+                )
+            try:
+                with os.fdopen(handle, "w", newline="") as target:
+                    csv.writer(target).writerow(row)
+                os.replace(temp, self.path("user"))
+            except BaseException:
+                os.remove(temp)
+                raise
+        return WriteReport(1, 0, 0)
+
+    def append_tickets(self, rows):
+        """
+        Function to append tickets to 'tickets.csv'.
+
+        Args:
+        rows (list): Rows in the layout of the 'tickets' workbook.
+
+        Returns:
+        WriteReport: The rows written, without any API call.
+        """
+        with span("backend.append_tickets", backend=self.name):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(TICKETS_WORKSHEET), "a",
+                      newline="") as target:
+                csv.writer(target).writerows(rows)
+        return WriteReport(len(rows), 0, 0)
+
+    def read_rankings(self, name):
+        """
+        Function to compute the rows of a rankings worksheet.
+
+        Args:
+        name (str): 'user-ranking' for the wins of the numbers in
+        'user.csv', or 'num-ranks' for the wins of all 50 numbers.
+
+        Returns:
+        list: The rows, in the layout of the worksheet.
+
+        Raises:
+        FileNotFoundError: If a file the rankings need is missing.
+        """
+        if name not in RANKING_WORKSHEETS:
+            raise ValueError(f"Unknown rankings worksheet: {name}")
+        with span("backend.read_rankings", backend=self.name):
+            return ranking_rows(
+                name, self._draw_rows(),
+                self._read("user") if name == "user-ranking" else None
+                )
+
+
+class FallbackBackend:
+    """
+    Backend answering from a primary backend, or from a fallback
+    backend when the primary one fails.
+
+    Args:
+    primary: The backend tried first.
+    fallback: The backend used when the primary one raises.
+    """
+
+    name = "fallback"
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.last_error = None
+
+    def _call(self, method, *args):
+        if self.primary.available():
+            try:
+                return getattr(self.primary, method)(*args)
+            except Exception as e:
+                self.last_error = e
+                increment("backend_fallbacks_total", method=method)
+        return getattr(self.fallback, method)(*args)
+
+    def available(self):
+        """
+        Function to check if either backend can be used.
+
+        Returns:
+        bool: True if the primary or the fallback backend is available.
+        """
+        return self.primary.available() or self.fallback.available()
+
+    def read_draws(self, start_row=1):
+        return self._call("read_draws", start_row)
+
+    def write_ticket(self, row):
+        return self._call("write_ticket", row)
+
+    def append_tickets(self, rows):
+        return self._call("append_tickets", rows)
+
+    def read_rankings(self, name):
+        return self._call("read_rankings", name)
+
+
+def get_backend(name=DEFAULT_BACKEND, directory=DEFAULT_DATA_DIR):
+    """
+    Function to create a backend by name.
+
+    Args:
+    name (str): 'sheets', 'local' or 'fallback'.
+    directory (str): The directory of the local CSV files.
+
+    Returns:
+    The backend.
+
+    Raises:
+    ValueError: If the name is not a known backend.
+    """
+    if name == "sheets":
+        return SheetsBackend()
+    if name == "local":
+        return LocalBackend(directory)
+    if name == "fallback":
+        # Give up on a throttled write after one retry, the local
+        # backend then records the ticket instead
+        return FallbackBackend(
+            SheetsBackend(max_attempts=2), LocalBackend(directory)
+            )
+    raise ValueError(f"Unknown backend: {name}")
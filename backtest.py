@@ -0,0 +1,301 @@
+"""
+Historical backtest of the prediction strategy of the game.
+
+The 'euro' history is replayed draw by draw. Before each draw the
+number counts and the subset count tables hold only the earlier draws,
+and the popularity tiers are taken from them with the same thresholds
+as the game. Predictions are then made the way the 'modify' flow makes
+them: for two numbers the user keeps, the best scoring of Monte Carlo
+candidates with two popular numbers and one moderately popular number,
+see simulation.simulate(), with fewer candidates than the game. Their three
+predicted numbers are scored against the actual draw, next to the
+tier rule alone, which picks the popular and moderately popular
+numbers at random, and a random baseline that keeps the same two
+numbers and picks the other three uniformly. The counts and tables are
+updated with each draw after it is scored rather than recomputed.
+
+Usage:
+    python3 backtest.py --tickets 100 --simulations 10 --seed 7
+"""
+import argparse
+import sys
+from math import comb
+
+import numpy as np
+from tabulate import tabulate
+
+from draw_cache import DEFAULT_CACHE_PATH, DrawCache
+from draw_matrix import MAIN_TIERS
+from ranking import MAIN_NUMBER_MAX
+from simulation import add_draws, simulate
+
+ALL_NUMBERS = np.arange(1, MAIN_NUMBER_MAX + 1, dtype=np.uint8)
+
+# Candidates scored for each simulated prediction
+DEFAULT_CANDIDATES = 2000
+
+
+def random_tickets(rng, kept):
+    """
+    Function to complete tickets with uniformly random numbers.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    kept (ndarray): (n x 2) numbers kept on each ticket.
+
+    Returns:
+    ndarray: (n x 3) random numbers, distinct from the kept ones.
+    """
+    size = len(kept)
+    keys = rng.random((size, MAIN_NUMBER_MAX))
+    keys[np.arange(size)[:, np.newaxis], kept.astype(np.intp) - 1] = 2.0
+    return ALL_NUMBERS[keys.argpartition(2, axis=1)[:, :3]]
+
+
+def strategy_tickets(rng, kept, high_mask, moderate_mask):
+    """
+    Function to complete tickets under the tier rules of the game.
+
+    Each ticket gets two popular numbers and one moderately popular
+    number, or three popular numbers when no moderately popular number
+    is left once the kept numbers are removed, as in
+    simulation.tier_pools().
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    kept (ndarray): (n x 2) numbers kept on each ticket.
+    high_mask (ndarray): True at the index of every popular number.
+    moderate_mask (ndarray): True at the index of every moderate number.
+
+    Returns:
+    tuple: (n x 3) predicted numbers and a mask of the tickets that
+    could be completed, the others have too few popular numbers.
+    """
+    size = len(kept)
+    kept_mask = np.zeros((size, MAIN_NUMBER_MAX + 1), dtype=bool)
+    kept_mask[np.arange(size)[:, np.newaxis], kept] = True
+    high_ok = high_mask & ~kept_mask
+    moderate_ok = moderate_mask & ~kept_mask
+
+    take_moderate = moderate_ok.any(axis=1)
+    valid = high_ok.sum(axis=1) >= 3 - take_moderate
+
+    high_keys = np.where(high_ok, rng.random(high_ok.shape), np.inf)
+    high_picks = high_keys.argsort(axis=1)[:, :3]
+    moderate_keys = np.where(
+        moderate_ok, rng.random(moderate_ok.shape), np.inf
+        )
+    moderate_picks = moderate_keys.argmin(axis=1)
+
+    predicted = high_picks.copy()
+    predicted[take_moderate, 2] = moderate_picks[take_moderate]
+    return predicted, valid
+
+
+def simulated_tickets(rng, kept, high_mask, moderate_mask, matrix, tables,
+                      candidates=DEFAULT_CANDIDATES):
+    """
+    Function to predict tickets the way the game does, keeping the
+    best scoring Monte Carlo candidate for each pair of kept numbers.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    kept (ndarray): (n x 2) numbers kept on each ticket.
+    high_mask (ndarray): True at the index of every popular number.
+    moderate_mask (ndarray): True at the index of every moderate number.
+    matrix (ndarray): The draws counted in the tables.
+    tables (dict): Subset count tables of those draws, as from
+    simulation.build_tables().
+    candidates (int): Candidates scored for each ticket.
+
+    Returns:
+    ndarray: (n x 3) predicted numbers, besides the kept ones.
+    """
+    high = np.flatnonzero(high_mask)
+    moderate = np.flatnonzero(moderate_mask)
+    predicted = np.zeros((len(kept), 3), dtype=np.intp)
+    for row, pair in enumerate(kept.tolist()):
+        [(ticket, _)] = simulate(
+            matrix, pair, high, moderate, candidates=candidates, top_n=1,
+            seed=int(rng.integers(2 ** 63)), workers=1, tables=tables
+            )
+        predicted[row] = [num for num in ticket if num not in pair]
+    return predicted
+
+
+def match_counts(predicted, main_numbers):
+    """
+    Function to count the predicted numbers found in a draw.
+
+    Args:
+    predicted (ndarray): (n x k) predicted numbers.
+    main_numbers (ndarray): The five main numbers of the draw.
+
+    Returns:
+    ndarray: The number of matches of each row.
+    """
+    return np.isin(predicted, main_numbers).sum(axis=1)
+
+
+def backtest(matrix, tickets=100, warmup=20, thresholds=MAIN_TIERS,
+             seed=None, simulations=10, candidates=DEFAULT_CANDIDATES):
+    """
+    Function to replay the draw history and score the predictions of
+    the game and the tier rule against a random baseline.
+
+    Args:
+    matrix (ndarray): The draw matrix, in draw order.
+    tickets (int): Tier rule and baseline predictions made before
+    each draw.
+    warmup (int): Draws counted before the first prediction.
+    thresholds (tuple): Popular and moderate wins, see popularity_tiers().
+    seed (int): Seed of the random generator.
+    simulations (int): Simulated predictions made before each draw,
+    for the first pairs of kept numbers of the tier rule.
+    candidates (int): Candidates scored for each simulated prediction.
+
+    Returns:
+    dict: The number of draws predicted and skipped, and for the
+    'simulation', the 'tiers' and the 'baseline' the distribution of
+    matches of the three predicted numbers, their mean and its
+    standard error.
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(MAIN_NUMBER_MAX + 1, dtype=np.int64)
+    tables = {0: 0}
+    tables.update({
+        k: np.zeros(comb(MAIN_NUMBER_MAX, k), dtype=np.int64)
+        for k in range(1, 6)
+        })
+    simulation = np.zeros(4, dtype=np.int64)
+    strategy = np.zeros(4, dtype=np.int64)
+    baseline = np.zeros(4, dtype=np.int64)
+    predicted_draws = skipped_draws = 0
+
+    for step, draw in enumerate(matrix):
+        main_numbers = draw[:5]
+        if step >= warmup:
+            popular, moderate = thresholds
+            high_mask = counts >= popular
+            moderate_mask = counts == moderate
+            high_mask[0] = moderate_mask[0] = False
+
+            keys = rng.random((tickets, MAIN_NUMBER_MAX))
+            kept = keys.argpartition(1, axis=1)[:, :2] + 1
+            predicted, valid = strategy_tickets(
+                rng, kept, high_mask, moderate_mask
+                )
+
+            if valid.any():
+                simulation += np.bincount(
+                    match_counts(
+                        simulated_tickets(
+                            rng, kept[valid][:simulations], high_mask,
+                            moderate_mask, matrix[:step], tables, candidates
+                            ),
+                        main_numbers
+                        ),
+                    minlength=4
+                    )
+                strategy += np.bincount(
+                    match_counts(predicted[valid], main_numbers), minlength=4
+                    )
+                baseline += np.bincount(
+                    match_counts(
+                        random_tickets(rng, kept[valid]), main_numbers
+                        ),
+                    minlength=4
+                    )
+                predicted_draws += 1
+            else:
+                skipped_draws += 1
+
+        # Add the draw to the counts only once it has been predicted
+        counts[main_numbers] += 1
+        add_draws(tables, matrix[step:step + 1])
+
+    return {
+        "predicted_draws": predicted_draws,
+        "skipped_draws": skipped_draws,
+        "simulation": summarise(simulation),
+        "tiers": summarise(strategy),
+        "baseline": summarise(baseline),
+    }
+
+
+def summarise(distribution):
+    """
+    Function to summarise a distribution of matches.
+
+    Args:
+    distribution (ndarray): Predictions by number of matches, 0 to 3.
+
+    Returns:
+    dict: The distribution, the number of predictions, the mean
+    number of matches and the standard error of the mean.
+    """
+    total = int(distribution.sum())
+    matches = np.arange(len(distribution))
+    mean = float(distribution @ matches / total) if total else 0.0
+    variance = (
+        float(distribution @ (matches - mean) ** 2 / total) if total else 0.0
+        )
+    return {
+        "distribution": distribution.tolist(),
+        "predictions": total,
+        "mean": mean,
+        "stderr": (variance / total) ** 0.5 if total else 0.0,
+    }
+
+
+def main(argv=None):
+    """
+    Function to run the backtest from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Backtest the predictions over the draw history."
+        )
+    parser.add_argument("--tickets", type=int, default=100)
+    parser.add_argument("--simulations", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    matrix = DrawCache(args.cache).matrix()
+    if len(matrix) <= args.warmup:
+        print(
+            f"Not enough draws in {args.cache} for a warmup of "
+            f"{args.warmup}.", file=sys.stderr
+            )
+        return 1
+
+    result = backtest(
+        matrix, tickets=args.tickets, warmup=args.warmup, seed=args.seed,
+        simulations=args.simulations, candidates=args.candidates
+        )
+    print(
+        f"Predicted {result['predicted_draws']} draws, skipped "
+        f"{result['skipped_draws']} without enough ranked numbers."
+        )
+    rows = []
+    for name in ("simulation", "tiers", "baseline"):
+        summary = result[name]
+        rows.append(
+            [name] + summary["distribution"] +
+            [f"{summary['mean']:.4f}", f"{summary['stderr']:.4f}"]
+            )
+    print(tabulate(
+        rows,
+        headers=["", "0 hits", "1 hit", "2 hits", "3 hits", "Mean", "Error"],
+        tablefmt="pretty"
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
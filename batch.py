@@ -0,0 +1,270 @@
+"""
+Non-interactive analysis of many Euro Millions tickets.
+
+Tickets are streamed from a CSV file (five main numbers followed by
+two lucky numbers on each row) or from JSON lines (objects with
+'numbers' and 'lucky' lists, or plain lists of seven numbers), checked
+with the same rules as the game and written out one result per ticket
+with the wins and the popularity tier of every number, and the number
+of past draws in which the ticket would have won each prize tier.
+Tickets are analysed in chunks of a few thousand, so memory use stays
+the same whatever the size of the input.
+
+Usage:
+    python3 batch.py tickets.csv > results.jsonl
+    python3 batch.py tickets.jsonl --output-format csv -o results.csv
+"""
+import argparse
+import csv
+import json
+import sys
+from contextlib import ExitStack
+
+from draw_cache import DEFAULT_CACHE_PATH, DrawCache
+from draw_matrix import LUCKY_TIERS, number_counts, popularity_tiers
+from match_index import DEFAULT_CHUNK_SIZE, MatchIndex, prize_summary
+from validation import main_number_errors, lucky_number_errors
+
+CSV_FIELDS = [
+    "line", "valid", "numbers", "lucky", "wins", "lucky_wins",
+    "popular", "moderate", "least",
+    "lucky_popular", "lucky_moderate", "lucky_least", "prizes", "errors",
+]
+
+
+def read_tickets(stream, input_format="csv"):
+    """
+    Function to read tickets one at a time from a text stream.
+
+    Args:
+    stream (file): The open input file.
+    input_format (str): 'csv' or 'jsonl'.
+
+    Yields:
+    tuple: (line, main_values, lucky_values) for every ticket, where
+    the values are lists as read, before any validation. Lines that
+    cannot be parsed are yielded with None values.
+    """
+    if input_format == "csv":
+        for line, row in enumerate(csv.reader(stream), start=1):
+            row = [value.strip() for value in row]
+            if not any(row):
+                continue
+            # Skip a header row, none of its cells is a number
+            if line == 1 and not any(value.isdigit() for value in row):
+                continue
+            yield line, row[:5], row[5:]
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            ticket = json.loads(text)
+        except ValueError:
+            yield line, None, None
+            continue
+        if isinstance(ticket, dict):
+            yield line, ticket.get("numbers"), ticket.get("lucky")
+        elif isinstance(ticket, list):
+            yield line, ticket[:5], ticket[5:]
+        else:
+            yield line, None, None
+
+
+def analyse_ticket(main_values, lucky_values, main_counts, lucky_counts):
+    """
+    Function to validate and rank a single ticket.
+
+    Args:
+    main_values (list): The five main numbers as read.
+    lucky_values (list): The two lucky numbers as read.
+    main_counts (array): Main number counts from number_counts().
+    lucky_counts (array): Lucky number counts from number_counts().
+
+    Returns:
+    dict: The sorted numbers, their wins and tiers when the ticket is
+    valid, or the validation errors when it is not.
+    """
+    if not isinstance(main_values, list) or not isinstance(
+            lucky_values, list):
+        return {"valid": False, "errors": ["Error: Unreadable ticket."]}
+
+    errors = (
+        main_number_errors(main_values) + lucky_number_errors(lucky_values)
+        )
+    if errors:
+        return {"valid": False, "errors": errors}
+
+    numbers = sorted(int(num) for num in main_values)
+    lucky = sorted(int(num) for num in lucky_values)
+    wins = [int(main_counts[num]) for num in numbers]
+    lucky_wins = [int(lucky_counts[num]) for num in lucky]
+
+    popular, moderate, least = popularity_tiers(numbers, wins)
+    lucky_popular, lucky_moderate, lucky_least = popularity_tiers(
+        lucky, lucky_wins, LUCKY_TIERS
+        )
+
+    return {
+        "valid": True,
+        "numbers": numbers,
+        "lucky": lucky,
+        "wins": wins,
+        "lucky_wins": lucky_wins,
+        "popular": popular,
+        "moderate": moderate,
+        "least": least,
+        "lucky_popular": lucky_popular,
+        "lucky_moderate": lucky_moderate,
+        "lucky_least": lucky_least,
+    }
+
+
+def add_prizes(results, matches):
+    """
+    Function to add the prize tier counts to valid results.
+
+    Args:
+    results (list): Results of analyse_ticket().
+    matches (MatchIndex): The match index of the draw history.
+
+    Returns:
+    list: The same results, the valid ones with their 'prizes'
+    as returned by prize_summary().
+    """
+    valid = [result for result in results if result["valid"]]
+    if valid:
+        counts = matches.prize_counts(
+            [result["numbers"] + result["lucky"] for result in valid]
+            )
+        for result, row in zip(valid, counts):
+            result["prizes"] = prize_summary(row)
+    return results
+
+
+def analyse_tickets(tickets, draws, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Function to analyse a stream of tickets against the draw history.
+
+    Args:
+    tickets (iterable): (line, main_values, lucky_values) tuples
+    as yielded by read_tickets().
+    draws (ndarray): The draw matrix of the 'euro' workbook.
+    chunk_size (int): Tickets whose prize tiers are counted together.
+
+    Yields:
+    dict: The result of analyse_ticket() with its input line.
+    """
+    main_counts, lucky_counts = number_counts(draws)
+    matches = MatchIndex(draws)
+    chunk = []
+    for line, main_values, lucky_values in tickets:
+        result = {"line": line}
+        result.update(analyse_ticket(
+            main_values, lucky_values, main_counts, lucky_counts
+            ))
+        chunk.append(result)
+        if len(chunk) == chunk_size:
+            yield from add_prizes(chunk, matches)
+            chunk = []
+    yield from add_prizes(chunk, matches)
+
+
+def write_results(results, stream, output_format="jsonl"):
+    """
+    Function to write analysis results as they are produced.
+
+    Args:
+    results (iterable): Results as yielded by analyse_tickets().
+    stream (file): The open output file.
+    output_format (str): 'jsonl' or 'csv'.
+
+    Returns:
+    tuple: The number of valid and invalid tickets written.
+    """
+    valid = invalid = 0
+    writer = None
+    if output_format == "csv":
+        writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+
+    for result in results:
+        if result["valid"]:
+            valid += 1
+        else:
+            invalid += 1
+
+        if writer is None:
+            stream.write(json.dumps(result) + "\n")
+        else:
+            writer.writerow({
+                field: " ".join(map(str, value))
+                if isinstance(value, list) else
+                " ".join(f"{key}:{count}" for key, count in value.items())
+                if isinstance(value, dict) else value
+                for field, value in result.items()
+                })
+
+    return valid, invalid
+
+
+def main(argv=None):
+    """
+    Function to run the batch analysis from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Analyse Euro Millions tickets against the draw history."
+        )
+    parser.add_argument(
+        "input", nargs="?", default="-",
+        help="tickets file, or - to read from standard input"
+        )
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="results file, or - to write to standard output"
+        )
+    parser.add_argument(
+        "--input-format", choices=["csv", "jsonl"],
+        help="defaults to the input file extension, or csv"
+        )
+    parser.add_argument(
+        "--output-format", choices=["jsonl", "csv"], default="jsonl"
+        )
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH,
+        help="path of the local 'euro' draw cache"
+        )
+    args = parser.parse_args(argv)
+
+    input_format = args.input_format or (
+        "jsonl" if args.input.endswith((".jsonl", ".json")) else "csv"
+        )
+
+    draws = DrawCache(args.cache).matrix()
+    if not len(draws):
+        print(
+            f"No draws in {args.cache}, play a game first to sync them.",
+            file=sys.stderr
+            )
+        return 1
+
+    with ExitStack() as stack:
+        source = sys.stdin if args.input == "-" else stack.enter_context(
+            open(args.input, newline="")
+            )
+        target = sys.stdout if args.output == "-" else stack.enter_context(
+            open(args.output, "w", newline="")
+            )
+        results = analyse_tickets(read_tickets(source, input_format), draws)
+        valid, invalid = write_results(results, target, args.output_format)
+
+    print(f"{valid} valid and {invalid} invalid tickets.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+Benchmarks of the Lottorama hot paths on synthetic draw histories.
+
+Synthetic Euro Millions histories, from a thousand to millions of draws,
+and batches of random tickets are generated from a seed. Google Sheets
+is replaced by a LocalBackend reading a CSV file of the synthetic
+draws, so nothing leaves the machine. Each benchmark times one step of
+the game, keeps the best of a few runs and measures the peak memory it
+allocates with tracemalloc:
+
+    sync            DrawCache sync of the whole history from the backend
+    counts          Wins of every number over the draw matrix
+    windows         Prefix sums of the counts and a sweep of 100 windows
+    tables          Subset count tables used to score predictions
+    itemsets        Best completions of every pair of kept numbers
+    validation      validate_data() and lucky_number_errors() per ticket
+    ranking         Wins lookup of the numbers of each ticket
+    classification  Popularity tiers of each ticket, as in the game loop
+    matches         Past draws in each prize tier of each ticket
+    analysis        Full batch analysis of each ticket
+    prediction      Monte Carlo prediction of the 'modify' flow
+
+The results are written to a JSON file, and can be compared with the
+results of an earlier run.
+
+Usage:
+    python3 benchmark.py --draws 1000 100000 10000000 --tickets 1 1000000
+    python3 benchmark.py --only prediction --baseline previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from backends import LocalBackend
+from batch import analyse_tickets
+from draw_cache import DrawCache
+from draw_matrix import LUCKY_TIERS, all_number_tiers, number_counts
+from draw_matrix import popularity_tiers
+from itemsets import KEPT_PAIRS, FrequentItemsets
+from match_index import MatchIndex
+from ranking import MAIN_NUMBER_MAX, rank_ticket
+from simulation import build_tables, simulate
+from synthetic import synthetic_matrix, synthetic_tickets, write_draws_csv
+from validation import lucky_number_errors, validate_data
+from windows import FrequencyWindows
+
+DEFAULT_RESULTS_PATH = "benchmark-results.json"
+
+DRAW_BENCHMARKS = (
+    "sync", "counts", "windows", "tables", "itemsets", "prediction"
+    )
+TICKET_BENCHMARKS = (
+    "validation", "ranking", "classification", "matches", "analysis"
+    )
+BENCHMARKS = DRAW_BENCHMARKS + TICKET_BENCHMARKS
+
+
+def measure(run, repeat=3, memory=True):
+    """
+    Function to time a benchmark and measure its peak memory.
+
+    The time is the best of the runs. The memory is measured in one
+    more run, under tracemalloc, so that tracing does not slow down
+    the timed runs.
+
+    Args:
+    run (callable): The benchmark, called without arguments.
+    repeat (int): The number of timed runs.
+    memory (bool): Whether to measure the peak memory.
+
+    Returns:
+    tuple: The best time in seconds and the peak memory allocated
+    in bytes, or None if not measured.
+    """
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def draw_cases(matrix, workdir, predictions, candidates, workers, seed):
+    """
+    Function to set up the benchmarks of a draw history.
+
+    Args:
+    matrix (ndarray): The synthetic draw matrix.
+    workdir (str): A scratch directory.
+    predictions (int): Predictions made by the prediction benchmark.
+    candidates (int): Candidates scored for each prediction.
+    workers (int): Worker processes used to score them.
+    seed (int): Seed of the predictions.
+
+    Returns:
+    dict: (items, run) for each benchmark name, where run is
+    a callable processing the items.
+    """
+    backend = LocalBackend(workdir)
+    write_draws_csv(matrix, backend.path("euro"))
+    cache_path = os.path.join(workdir, "cache.sqlite3")
+
+    def sync():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        DrawCache(cache_path).sync(backend)
+
+    tables = build_tables(matrix)
+    main_counts, _ = number_counts(matrix)
+    high, moderate, _ = all_number_tiers(main_counts)
+    kept = np.random.default_rng(seed).permutation(
+        np.arange(1, MAIN_NUMBER_MAX + 1)
+        )[:2 * predictions].reshape(-1, 2).tolist()
+
+    def windows():
+        # Build the prefix sums and sweep 100 window sizes
+        FrequencyWindows(matrix).sweep(
+            np.linspace(0, len(matrix), 100).astype(np.intp)
+            )
+
+    def itemsets():
+        # Mine the completions, then complete every pair once
+        mined = FrequentItemsets(tables)
+        for pair in KEPT_PAIRS.tolist():
+            mined.complete(pair)
+
+    def predict():
+        for index, pair in enumerate(kept):
+            simulate(
+                matrix, pair, high, moderate, candidates=candidates,
+                top_n=1, seed=seed + index, workers=workers, tables=tables
+                )
+
+    return {
+        "sync": (len(matrix), sync),
+        "counts": (len(matrix), lambda: number_counts(matrix)),
+        "windows": (len(matrix), windows),
+        "tables": (len(matrix), lambda: build_tables(matrix)),
+        "itemsets": (len(KEPT_PAIRS), itemsets),
+        "prediction": (len(kept), predict),
+    }
+
+
+def ticket_cases(matrix, tickets):
+    """
+    Function to set up the benchmarks of a batch of tickets.
+
+    Args:
+    matrix (ndarray): The synthetic draw matrix to rank against.
+    tickets (list): Tickets from synthetic_tickets().
+
+    Returns:
+    dict: (items, run) for each benchmark name.
+    """
+    main_counts, lucky_counts = number_counts(matrix)
+    lotto_data = [
+        sorted(int(num) for num in main.split(",")) +
+        sorted(int(num) for num in lucky.split(","))
+        for main, lucky in tickets
+        ]
+    ranks = [
+        rank_ticket(main_counts, lucky_counts, data) for data in lotto_data
+        ]
+
+    def validation():
+        for main, lucky in tickets:
+            validate_data(main.split(","))
+            lucky_number_errors(lucky)
+
+    def ranking():
+        for data in lotto_data:
+            rank_ticket(main_counts, lucky_counts, data)
+
+    def classification():
+        for data, (main_ranks, lucky_ranks) in zip(lotto_data, ranks):
+            popularity_tiers(data[:5], main_ranks)
+            popularity_tiers(data[5:], lucky_ranks, LUCKY_TIERS)
+
+    match_index = MatchIndex(matrix)
+    sorted_tickets = np.array(lotto_data, dtype=np.uint8)
+
+    def matches():
+        match_index.prize_counts(sorted_tickets)
+
+    def analysis():
+        for _ in analyse_tickets(
+                ((line, main.split(","), lucky.split(","))
+                 for line, (main, lucky) in enumerate(tickets, start=1)),
+                matrix):
+            pass
+
+    return {
+        "validation": (len(tickets), validation),
+        "ranking": (len(tickets), ranking),
+        "classification": (len(tickets), classification),
+        "matches": (len(tickets), matches),
+        "analysis": (len(tickets), analysis),
+    }
+
+
+def run_benchmarks(draw_sizes, ticket_sizes, only=BENCHMARKS, repeat=3,
+                   memory=True, predictions=5, candidates=200000,
+                   workers=1, seed=0, report=None):
+    """
+    Function to run the benchmarks over every history and batch size.
+
+    The draw benchmarks run once for each history size. The ticket
+    benchmarks run once for each batch size, against the smallest
+    history, since their cost does not depend on its length.
+
+    Args:
+    draw_sizes (list): The numbers of draws of the histories.
+    ticket_sizes (list): The numbers of tickets of the batches.
+    only (tuple): The names of the benchmarks to run.
+    repeat (int): Timed runs of each benchmark.
+    memory (bool): Whether to measure the peak memory.
+    predictions (int): Predictions made by the prediction benchmark.
+    candidates (int): Candidates scored for each prediction.
+    workers (int): Worker processes used to score them.
+    seed (int): Seed of the synthetic data.
+    report (callable): Optional function called with each result.
+
+    Returns:
+    list: One dict per benchmark run with its 'name', 'draws',
+    'tickets', 'items', 'seconds', 'throughput' in items per second
+    and 'peak_memory_bytes'.
+    """
+    rng = np.random.default_rng(seed)
+    matrices = {draws: synthetic_matrix(rng, draws) for draws in draw_sizes}
+    results = []
+
+    def record(name, draws, tickets, items, run):
+        seconds, peak = measure(run, repeat, memory)
+        result = {
+            "name": name,
+            "draws": draws,
+            "tickets": tickets,
+            "items": items,
+            "seconds": seconds,
+            "throughput": items / seconds if seconds else None,
+            "peak_memory_bytes": peak,
+        }
+        results.append(result)
+        if report is not None:
+            report(result)
+
+    if any(name in only for name in DRAW_BENCHMARKS):
+        for draws, matrix in matrices.items():
+            with tempfile.TemporaryDirectory() as workdir:
+                cases = draw_cases(
+                    matrix, workdir, predictions, candidates, workers, seed
+                    )
+                for name in DRAW_BENCHMARKS:
+                    if name in only:
+                        items, run = cases[name]
+                        record(name, draws, None, items, run)
+
+    if any(name in only for name in TICKET_BENCHMARKS):
+        draws = min(draw_sizes)
+        for size in ticket_sizes:
+            cases = ticket_cases(
+                matrices[draws], synthetic_tickets(rng, size)
+                )
+            for name in TICKET_BENCHMARKS:
+                if name in only:
+                    items, run = cases[name]
+                    record(name, draws, size, items, run)
+
+    return results
+
+
+def result_key(result):
+    return result["name"], result["draws"], result["tickets"]
+
+
+def format_result(result, baseline=None):
+    """
+    Function to describe a result on one line.
+
+    Args:
+    result (dict): A result from run_benchmarks().
+    baseline (dict): Optional earlier results by result_key().
+
+    Returns:
+    str: The description.
+    """
+    text = (
+        f"{result['name']:<15} draws={result['draws']:<9} "
+        f"tickets={result['tickets'] if result['tickets'] else '-':<8} "
+        f"{result['seconds']:10.4f} s {result['throughput'] or 0:14,.0f}/s"
+        )
+    if result["peak_memory_bytes"] is not None:
+        text += f" {result['peak_memory_bytes'] / 2 ** 20:9.1f} MiB"
+    previous = (baseline or {}).get(result_key(result))
+    if previous and previous.get("seconds"):
+        text += f"  x{previous['seconds'] / result['seconds']:.2f}"
+    return text
+
+
+def main(argv=None):
+    """
+    Function to run the benchmarks from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark Lottorama on synthetic draw histories."
+        )
+    parser.add_argument(
+        "--draws", type=int, nargs="+", default=[1000, 10000, 100000],
+        help="numbers of draws of the synthetic histories"
+        )
+    parser.add_argument(
+        "--tickets", type=int, nargs="+", default=[1, 1000, 100000],
+        help="numbers of tickets of the synthetic batches"
+        )
+    parser.add_argument(
+        "--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS)
+        )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--predictions", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-memory", action="store_true",
+        help="skip the tracemalloc run of each benchmark"
+        )
+    parser.add_argument("-o", "--output", default=DEFAULT_RESULTS_PATH)
+    parser.add_argument(
+        "--baseline", help="earlier results file to compare the times with"
+        )
+    args = parser.parse_args(argv)
+
+    if min(args.draws) < 1 or min(args.tickets) < 1:
+        print("Sizes must be at least 1.", file=sys.stderr)
+        return 1
+    if not 1 <= args.predictions <= MAIN_NUMBER_MAX // 2:
+        print(
+            f"Between 1 and {MAIN_NUMBER_MAX // 2} predictions are "
+            "supported.", file=sys.stderr
+            )
+        return 1
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as source:
+            baseline = {
+                result_key(result): result
+                for result in json.load(source)["results"]
+                }
+
+    results = run_benchmarks(
+        args.draws, args.tickets, only=args.only, repeat=args.repeat,
+        memory=not args.no_memory, predictions=args.predictions,
+        candidates=args.candidates, workers=args.workers, seed=args.seed,
+        report=lambda result: print(format_result(result, baseline))
+        )
+
+    with open(args.output, "w") as target:
+        json.dump({
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "candidates": args.candidates,
+            "workers": args.workers,
+            "results": results,
+        }, target, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
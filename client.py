@@ -0,0 +1,88 @@
+"""
+HTTP client for the Lottorama service.
+
+HttpService answers the same calls as LottoramaService by sending them
+to a running server.py, so the terminal game can run as a thin client
+of a shared service.
+"""
+import json
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from service import ServiceError
+
+
+class HttpService:
+    """
+    Client of a remote Lottorama service.
+
+    Args:
+    base_url (str): The URL of the service, e.g. http://localhost:8080.
+    timeout (float): Seconds to wait for each response.
+    """
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = Request(
+            self.base_url + path, data=data,
+            headers={"Content-Type": "application/json"}
+            )
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return json.load(response)
+        except HTTPError as e:
+            try:
+                errors = json.load(e).get("errors", [str(e)])
+            except ValueError:
+                errors = [str(e)]
+            if e.code == 400:
+                raise ServiceError(errors)
+            raise RuntimeError("; ".join(errors))
+
+    def reload(self):
+        """
+        Function kept for compatibility, the server reloads the
+        draws on its own.
+        """
+
+    def last_draw(self):
+        return self._request("/draws/last")
+
+    def analyse(self, numbers, lucky):
+        return self._request(
+            "/analyse", {"numbers": numbers, "lucky": lucky}
+            )
+
+    def tiers(self, last=None, since=None, half_life=None):
+        window = {
+            name: value for name, value in (
+                ("last", last), ("since", since), ("half_life", half_life)
+                ) if value is not None
+            }
+        return self._request(
+            "/tiers" + (f"?{urlencode(window)}" if window else "")
+            )
+
+    def predict(self, kept, top_n=1, seed=None, high_ranks=None,
+                moderate_ranks=None):
+        payload = {"kept": kept, "top_n": top_n, "seed": seed}
+        # Tiers of the sheet rankings or of a window, else the server
+        # predicts from its own
+        if high_ranks is not None:
+            payload["high_ranks"] = list(high_ranks)
+        if moderate_ranks is not None:
+            payload["moderate_ranks"] = list(moderate_ranks)
+        return self._request("/predict", payload)
+
+    def complete(self, kept, top_n=1):
+        return self._request("/complete", {"kept": kept, "top_n": top_n})
+
+    def wheel(self, pool, lucky, guarantee=2):
+        return self._request(
+            "/wheel", {"pool": pool, "lucky": lucky, "guarantee": guarantee}
+            )
@@ -0,0 +1,292 @@
+"""
+Local persistent cache of the 'euro' draw history.
+
+Draws are stored in a SQLite file keyed by draw date, together with
+the row of the 'euro' worksheet they came from. A sync only fetches
+the rows after the last cached row, and is only needed once the
+cache is older than its time to live. Other small worksheets, such
+as 'num-ranks', can be cached whole with the same time to live.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from draw_matrix import draw_matrix
+from ranking import parse_draws
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LOTTORAMA_CACHE_PATH", "lottorama-cache.sqlite3"
+    )
+DEFAULT_TTL = float(os.environ.get("LOTTORAMA_CACHE_TTL", 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS draws (
+    draw_date TEXT PRIMARY KEY,
+    sheet_row INTEGER NOT NULL,
+    n1 INTEGER NOT NULL,
+    n2 INTEGER NOT NULL,
+    n3 INTEGER NOT NULL,
+    n4 INTEGER NOT NULL,
+    n5 INTEGER NOT NULL,
+    l1 INTEGER NOT NULL,
+    l2 INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS draws_sheet_row ON draws (sheet_row);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    last_row INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS draws_state (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    last_date TEXT
+);
+CREATE TABLE IF NOT EXISTS worksheet_values (
+    name TEXT PRIMARY KEY,
+    rows TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class DrawCache:
+    """
+    On-disk cache of the 'euro' draw history.
+
+    Args:
+    path (str): Path of the SQLite file, created if missing.
+    ttl (float): Seconds after a sync before the cache is stale.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._matrix = None
+        self._matrix_state = None
+        with closing(self._connect()) as db, db:
+            db.executescript(SCHEMA)
+            # Caches created before the draws state was kept
+            db.execute(
+                "INSERT OR IGNORE INTO draws_state SELECT 'euro', 0, "
+                "COUNT(*), (SELECT draw_date FROM draws "
+                "ORDER BY sheet_row DESC LIMIT 1) FROM draws"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def _sync_state(self, db):
+        return db.execute(
+            "SELECT last_row, synced_at FROM sync_state WHERE name = 'euro'"
+            ).fetchone() or (0, 0.0)
+
+    def _draws_state(self, db):
+        return tuple(db.execute(
+            "SELECT revision, draws, last_date FROM draws_state "
+            "WHERE name = 'euro'"
+            ).fetchone())
+
+    def state(self):
+        """
+        Function to get the state of the cached draws, which only
+        changes when a sync adds or changes draws.
+
+        Returns:
+        tuple: The revision of the draws, bumped by every such sync,
+        the number of draws and the date of the last one.
+        """
+        with closing(self._connect()) as db:
+            return self._draws_state(db)
+
+    def last_synced(self):
+        """
+        Function to get the time of the last sync.
+
+        Returns:
+        float: The epoch time of the last sync, or 0.0 if never synced.
+        """
+        with closing(self._connect()) as db:
+            return self._sync_state(db)[1]
+
+    def is_stale(self, now=None):
+        """
+        Function to check if the cache needs a sync.
+
+        Returns:
+        bool: True if the cache was never synced or is older than its ttl.
+        """
+        now = time.time() if now is None else now
+        synced_at = self.last_synced()
+        return not synced_at or now - synced_at > self.ttl
+
+    def sync(self, backend):
+        """
+        Function to fetch the rows added to the 'euro' worksheet
+        since the last sync.
+
+        The last cached row is fetched again so that an edit of the
+        worksheet above it can be detected, in which case the whole
+        history is fetched and the cache rebuilt.
+
+        Args:
+        backend: The data backend to read the draws from, see
+        backends.py.
+
+        Returns:
+        int: The number of new draws stored.
+        """
+        with closing(self._connect()) as db, db:
+            last_row, _ = self._sync_state(db)
+            last_date = db.execute(
+                "SELECT draw_date FROM draws WHERE sheet_row = ?",
+                (last_row,)
+                ).fetchone()
+
+            start_row = last_row if last_date else 1
+            rebuilt = False
+            rows = backend.read_draws(start_row)
+
+            if last_date and rows and rows[0][:1] == [last_date[0]]:
+                # Skip the last cached row fetched as an overlap check
+                new_rows = rows[1:]
+                first_new_row = start_row + 1
+            else:
+                if last_date:
+                    # The worksheet changed above the cached rows
+                    db.execute("DELETE FROM draws")
+                    rebuilt = True
+                    rows = backend.read_draws(1)
+                    start_row = 1
+                new_rows = rows
+                first_new_row = start_row
+
+            new_draws = 0
+            for sheet_row, row in enumerate(new_rows, start=first_new_row):
+                for draw_date, main_numbers, lucky_numbers in parse_draws(
+                        [row]):
+                    # A draw already stored by a concurrent sync is
+                    # left alone and not counted
+                    new_draws += db.execute(
+                        "INSERT INTO draws VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (draw_date) DO UPDATE SET "
+                        "sheet_row = excluded.sheet_row, "
+                        "n1 = excluded.n1, n2 = excluded.n2, "
+                        "n3 = excluded.n3, n4 = excluded.n4, "
+                        "n5 = excluded.n5, l1 = excluded.l1, "
+                        "l2 = excluded.l2 "
+                        "WHERE (sheet_row, n1, n2, n3, n4, n5, l1, l2) != "
+                        "(excluded.sheet_row, excluded.n1, excluded.n2, "
+                        "excluded.n3, excluded.n4, excluded.n5, "
+                        "excluded.l1, excluded.l2)",
+                        (draw_date, sheet_row) + main_numbers + lucky_numbers
+                        ).rowcount
+
+            if rows:
+                last_row = start_row + len(rows) - 1
+            if new_draws or rebuilt:
+                db.execute(
+                    "UPDATE draws_state SET revision = revision + 1, "
+                    "draws = (SELECT COUNT(*) FROM draws), "
+                    "last_date = (SELECT draw_date FROM draws "
+                    "ORDER BY sheet_row DESC LIMIT 1) WHERE name = 'euro'"
+                    )
+            db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES ('euro', ?, ?)",
+                (last_row, time.time())
+                )
+        return new_draws
+
+    def refresh(self, backend):
+        """
+        Function to sync the cache only if it is stale.
+
+        Args:
+        backend: The data backend to read the draws from.
+
+        Returns:
+        int: The number of new draws stored.
+        """
+        if not self.is_stale():
+            return 0
+        return self.sync(backend)
+
+    def rows(self, offset=0):
+        """
+        Function to read the cached draws in worksheet order.
+
+        Args:
+        offset (int): The number of draws to skip.
+
+        Returns:
+        list: Rows of strings in the same layout as the 'euro'
+        worksheet, the draw date followed by the five main numbers
+        and the two lucky numbers.
+        """
+        with closing(self._connect()) as db:
+            return [
+                [str(value) for value in row]
+                for row in db.execute(
+                    "SELECT draw_date, n1, n2, n3, n4, n5, l1, l2 "
+                    "FROM draws ORDER BY sheet_row LIMIT -1 OFFSET ?",
+                    (offset,)
+                    )
+                ]
+
+    def draws(self):
+        """
+        Function to read the cached draws in worksheet order.
+
+        Returns:
+        list: (draw_date, main_numbers, lucky_numbers) tuples
+        as returned by parse_draws().
+        """
+        return parse_draws(self.rows())
+
+    def matrix(self):
+        """
+        Function to get the cached draws as a draw matrix.
+
+        The matrix is built once and kept in memory until a sync
+        adds or changes draws, a sync that finds nothing new keeps it.
+
+        Returns:
+        ndarray: The (draws x 7) uint8 draw matrix.
+        """
+        state = self.state()
+        if self._matrix is None or state != self._matrix_state:
+            self._matrix = draw_matrix(self.draws())
+            self._matrix_state = state
+        return self._matrix
+
+    def worksheet_values(self, name, fetch, ttl=None):
+        """
+        Function to read a whole worksheet through the cache.
+
+        Args:
+        name (str): The name of the worksheet.
+        fetch (callable): Returns the worksheet rows, only called
+        when the cached copy is missing or stale.
+        ttl (float): Optional time to live, defaults to the cache ttl.
+
+        Returns:
+        list: The rows of the worksheet.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with closing(self._connect()) as db, db:
+            cached = db.execute(
+                "SELECT rows, synced_at FROM worksheet_values WHERE name = ?",
+                (name,)
+                ).fetchone()
+            if cached and time.time() - cached[1] <= ttl:
+                return json.loads(cached[0])
+
+            rows = fetch()
+            db.execute(
+                "INSERT OR REPLACE INTO worksheet_values VALUES (?, ?, ?)",
+                (name, json.dumps(rows), time.time())
+                )
+            return rows
@@ -0,0 +1,228 @@
+"""
+Vectorized draw history for Lottorama.
+
+The 'euro' history is held as a compact uint8 NumPy matrix with one
+row per draw and seven columns: the five main numbers in ascending
+order followed by the two lucky numbers in ascending order. Number
+counts, pair and triple co-occurrence counts and popularity tiers are
+all computed from it with bincount and masking instead of Python loops.
+"""
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from ranking import MAIN_NUMBER_MAX, LUCKY_NUMBER_MAX, parse_draws
+
+# Popularity thresholds used by play_lottorama_game
+MAIN_TIERS = (5, 4)
+LUCKY_TIERS = (7, 6)
+
+# Column indices of every pair and triple of the five main numbers
+PAIR_COLUMNS = np.array(list(combinations(range(5), 2)), dtype=np.intp)
+TRIPLE_COLUMNS = np.array(list(combinations(range(5), 3)), dtype=np.intp)
+
+# BINOMIAL[n, k] is n choose k, used to rank combinations of numbers
+BINOMIAL = np.array(
+    [[comb(n, k) for k in range(6)] for n in range(MAIN_NUMBER_MAX + 1)],
+    dtype=np.int64
+    )
+
+
+def draw_matrix(draws):
+    """
+    Function to build the draw matrix from parsed draws.
+
+    Args:
+    draws (list): Draws as returned by parse_draws().
+
+    Returns:
+    ndarray: A (draws x 7) uint8 matrix, main numbers sorted in
+    columns 0-4 and lucky numbers sorted in columns 5-6.
+    """
+    matrix = np.array(
+        [main + lucky for _, main, lucky in draws], dtype=np.uint8
+        ).reshape(-1, 7)
+    matrix[:, :5].sort(axis=1)
+    matrix[:, 5:].sort(axis=1)
+    return matrix
+
+
+def matrix_from_rows(rows):
+    """
+    Function to build the draw matrix from 'euro' worksheet rows.
+
+    Args:
+    rows (list): Rows as returned by get_all_values().
+
+    Returns:
+    ndarray: The (draws x 7) uint8 draw matrix.
+    """
+    return draw_matrix(parse_draws(rows))
+
+
+def number_counts(matrix):
+    """
+    Function to count the wins of every main and lucky number.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+
+    Returns:
+    tuple: Two arrays (main_counts, lucky_counts) indexed by the
+    number itself, index 0 is unused and always 0.
+    """
+    main_counts = np.bincount(
+        matrix[:, :5].ravel(), minlength=MAIN_NUMBER_MAX + 1
+        )
+    lucky_counts = np.bincount(
+        matrix[:, 5:].ravel(), minlength=LUCKY_NUMBER_MAX + 1
+        )
+    return main_counts, lucky_counts
+
+
+def pair_counts(matrix):
+    """
+    Function to count how often every two main numbers
+    were drawn together.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+
+    Returns:
+    ndarray: A symmetric (51 x 51) array where [a, b] is the number
+    of draws holding both a and b.
+    """
+    size = MAIN_NUMBER_MAX + 1
+    main = matrix[:, :5].astype(np.intp)
+    pairs = main[:, PAIR_COLUMNS]
+    codes = pairs[..., 0] * size + pairs[..., 1]
+    counts = np.bincount(codes.ravel(), minlength=size * size)
+    counts = counts.reshape(size, size)
+    return counts + counts.T
+
+
+def triple_counts(matrix):
+    """
+    Function to count how often every three main numbers
+    were drawn together.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+
+    Returns:
+    ndarray: A (51 x 51 x 51) array where [a, b, c] with a < b < c
+    is the number of draws holding all three, other entries are 0.
+    """
+    size = MAIN_NUMBER_MAX + 1
+    main = matrix[:, :5].astype(np.intp)
+    triples = main[:, TRIPLE_COLUMNS]
+    codes = (
+        triples[..., 0] * size * size +
+        triples[..., 1] * size +
+        triples[..., 2]
+        )
+    counts = np.bincount(codes.ravel(), minlength=size ** 3)
+    return counts.reshape(size, size, size)
+
+
+def popularity_tiers(numbers, counts, thresholds=MAIN_TIERS):
+    """
+    Function to sort numbers into popular, moderately popular
+    and least popular by their number of wins.
+
+    Args:
+    numbers (array): The numbers to classify.
+    counts (array): The wins of each number, in the same order.
+    thresholds (tuple): The wins needed to be popular and the wins
+    of a moderately popular number, (5, 4) for main numbers and
+    (7, 6) for lucky numbers.
+
+    Returns:
+    tuple: Three lists of numbers (popular, moderate, least).
+    """
+    numbers = np.asarray(numbers)
+    counts = np.asarray(counts)
+    popular, moderate = thresholds
+    return (
+        numbers[counts >= popular].tolist(),
+        numbers[counts == moderate].tolist(),
+        numbers[counts < moderate].tolist(),
+        )
+
+
+def all_number_tiers(counts, thresholds=MAIN_TIERS):
+    """
+    Function to sort every number 1 to N into popularity tiers.
+
+    Args:
+    counts (array): Counts indexed by number, as from number_counts().
+    thresholds (tuple): See popularity_tiers().
+
+    Returns:
+    tuple: Three lists of numbers (popular, moderate, least).
+    """
+    return popularity_tiers(
+        np.arange(1, len(counts)), counts[1:], thresholds
+        )
+
+
+def colex_rank(combos):
+    """
+    Function to number combinations of main numbers densely.
+
+    Every k-combination of the numbers 1 to 50 gets a unique rank
+    from 0 to (50 choose k) - 1 in colexicographic order.
+
+    Args:
+    combos (ndarray): Combinations of shape (..., k), each sorted
+    in ascending order.
+
+    Returns:
+    ndarray: The int64 ranks of shape (...).
+    """
+    combos = np.asarray(combos, dtype=np.int64) - 1
+    ranks = np.zeros(combos.shape[:-1], dtype=np.int64)
+    for i in range(combos.shape[-1]):
+        ranks += BINOMIAL[combos[..., i], i + 1]
+    return ranks
+
+
+def colex_unrank(ranks, k):
+    """
+    Function to get the combinations of main numbers from their
+    colex ranks, the inverse of colex_rank().
+
+    Args:
+    ranks (ndarray): Ranks of any shape.
+    k (int): The size of the combinations.
+
+    Returns:
+    ndarray: The combinations of shape (..., k), each sorted in
+    ascending order.
+    """
+    ranks = np.array(ranks, dtype=np.int64)
+    combos = np.zeros(ranks.shape + (k,), dtype=np.int64)
+    for i in range(k - 1, -1, -1):
+        # The largest number whose binomial still fits in the rank
+        numbers = np.searchsorted(BINOMIAL[:, i + 1], ranks, side="right")
+        combos[..., i] = numbers
+        ranks -= BINOMIAL[numbers - 1, i + 1]
+    return combos
+
+
+def subset_counts(matrix, k):
+    """
+    Function to count how often every k main numbers were drawn
+    together, for any k from 1 to 5.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    k (int): The size of the combinations to count.
+
+    Returns:
+    ndarray: Counts of length (50 choose k), indexed by colex_rank().
+    """
+    columns = np.array(list(combinations(range(5), k)), dtype=np.intp)
+    ranks = colex_rank(matrix[:, :5][:, columns])
+    return np.bincount(ranks.ravel(), minlength=comb(MAIN_NUMBER_MAX, k))
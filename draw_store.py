@@ -0,0 +1,118 @@
+"""
+Columnar local store of the 'euro' draw history.
+
+The draws are kept in a single uncompressed .npz file, one array per
+column: the draw dates as day ordinals (int32), the five main numbers
+(uint8) and the two lucky numbers (uint8), sorted by date with one
+draw per date. That is 11 bytes a draw, so a multi-decade history
+takes a few tens of kilobytes and is read back without any parsing.
+The file is written by ingest.py and replaced atomically.
+"""
+import os
+import tempfile
+from datetime import date
+
+import numpy as np
+
+# Version of the layout of the store file
+STORE_FORMAT = 1
+
+
+class DrawStore:
+    """
+    Draw history stored by column in a .npz file.
+
+    Args:
+    path (str): Path of the store file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        """
+        Function to check if the store file exists.
+
+        Returns:
+        bool: True if draws were stored.
+        """
+        return os.path.exists(self.path)
+
+    def load(self):
+        """
+        Function to read the stored columns.
+
+        Returns:
+        tuple: The (n,) int32 date ordinals, the (n x 5) uint8 main
+        numbers and the (n x 2) uint8 lucky numbers, empty if the
+        store file does not exist.
+
+        Raises:
+        ValueError: If the file is not in a known format.
+        """
+        if not self.exists():
+            return (
+                np.zeros(0, dtype=np.int32),
+                np.zeros((0, 5), dtype=np.uint8),
+                np.zeros((0, 2), dtype=np.uint8),
+                )
+        with np.load(self.path) as store:
+            if int(store["format"]) != STORE_FORMAT:
+                raise ValueError(f"Unknown draw store format: {self.path}")
+            return store["dates"], store["main"], store["lucky"]
+
+    def write(self, dates, main, lucky):
+        """
+        Function to replace the stored draws.
+
+        Args:
+        dates (ndarray): (n,) date ordinals, sorted and unique.
+        main (ndarray): (n x 5) main numbers, each row sorted.
+        lucky (ndarray): (n x 2) lucky numbers, each row sorted.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handle, temp = tempfile.mkstemp(dir=directory or ".", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as target:
+                np.savez(
+                    target, format=np.int32(STORE_FORMAT),
+                    dates=np.asarray(dates, dtype=np.int32),
+                    main=np.asarray(main, dtype=np.uint8),
+                    lucky=np.asarray(lucky, dtype=np.uint8)
+                    )
+            os.replace(temp, self.path)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+    def matrix(self):
+        """
+        Function to get the stored draws as a draw matrix.
+
+        Returns:
+        ndarray: The (draws x 7) uint8 draw matrix, in date order.
+        """
+        _, main, lucky = self.load()
+        return np.hstack([main, lucky])
+
+    def rows(self, start=0):
+        """
+        Function to read the stored draws in the layout of the 'euro'
+        worksheet.
+
+        Args:
+        start (int): The number of draws to skip.
+
+        Returns:
+        list: Rows of strings, the draw date as YYYY-MM-DD followed
+        by the five main numbers and the two lucky numbers.
+        """
+        dates, main, lucky = self.load()
+        numbers = np.hstack([main[start:], lucky[start:]]).tolist()
+        return [
+            [date.fromordinal(ordinal).isoformat()] +
+            [str(num) for num in draw]
+            for ordinal, draw in zip(dates[start:].tolist(), numbers)
+            ]
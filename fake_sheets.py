@@ -0,0 +1,698 @@
+"""
+Local stand-in for the Google Sheets API.
+
+FakeSheetsServer answers the subset of the Sheets and Drive APIs that
+gspread uses for the 'lottorama-data' document: opening a spreadsheet
+by name, reading its metadata and worksheets, reading values, updating
+ranges and cells, batch updates, appending rows and adding worksheets.
+It holds the 'euro', 'user', 'user-ranking' and 'num-ranks' worksheets
+in memory, as the real document has them, and computes the
+'user-ranking' and 'num-ranks' rows from the draws, as the formulas of
+the real document do. The 'tickets' worksheet is added by the game on
+its first append.
+
+Every request can be delayed by a configurable latency, and rejected
+with the 429 error of the Sheets API once a per-minute read or write
+quota is used up, or at random, so that client-side batching, caching
+and retries can be measured without network access or real quota.
+
+The game is pointed at a running fake by setting LOTTORAMA_SHEETS_URL,
+sheets.py then sends every gspread request through a RedirectSession
+instead of authorizing with Google.
+
+Usage:
+    python3 fake_sheets.py --port 8081 --latency 0.2 --read-quota 60
+    LOTTORAMA_SHEETS_URL=http://localhost:8081 python3 run.py
+"""
+import argparse
+import csv
+import json
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import requests
+
+from backends import RANKING_WORKSHEETS, ranking_rows
+from metrics import increment
+from sheets import SPREADSHEET_NAME
+from synthetic import synthetic_matrix
+
+# Hosts of the Google APIs that a RedirectSession sends elsewhere
+GOOGLE_API_URLS = (
+    "https://sheets.googleapis.com", "https://www.googleapis.com",
+    )
+
+# Worksheets of the document, in order
+WORKSHEETS = ("euro", "user", "user-ranking", "num-ranks")
+
+# Cells of an A1 range, such as 'A1:H1', 'A5:H' or 'B2'
+CELLS_PATTERN = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+
+
+class FakeApiError(Exception):
+    """
+    Raised to answer a request with an error of the Sheets API.
+    """
+
+    def __init__(self, status, message, reason="INVALID_ARGUMENT"):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+
+
+class RedirectSession(requests.Session):
+    """
+    Requests session sending the calls to the Google APIs to another
+    server, such as a FakeSheetsServer.
+
+    Args:
+    base_url (str): The URL of the server, e.g. http://localhost:8081.
+    """
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, *args, **kwargs):
+        for api_url in GOOGLE_API_URLS:
+            if url.startswith(api_url):
+                url = self.base_url + url[len(api_url):]
+                break
+        return super().request(method, url, *args, **kwargs)
+
+
+def column_number(letters):
+    """
+    Function to convert column letters to a 1-based column number.
+
+    Args:
+    letters (str): The letters, such as 'A' or 'AB'.
+
+    Returns:
+    int: The column number, 1 for 'A'.
+    """
+    number = 0
+    for letter in letters:
+        number = number * 26 + ord(letter) - ord("A") + 1
+    return number
+
+
+def parse_range(a1_range, default_title):
+    """
+    Function to read an A1 range.
+
+    Args:
+    a1_range (str): The range, such as "'euro'!A5:H", "user!A1" or
+    'A1:H1'.
+    default_title (str): The worksheet of a range without a title.
+
+    Returns:
+    tuple: The worksheet title and the 0-based (top, left, bottom,
+    right) bounds of the range, bottom and right excluded, any of
+    them None when the range is open on that side.
+
+    Raises:
+    FakeApiError: If the range cannot be read.
+    """
+    title, cells = default_title, a1_range
+    if "!" in a1_range:
+        title, _, cells = a1_range.rpartition("!")
+    elif not CELLS_PATTERN.match(a1_range):
+        title, cells = a1_range, ""
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+
+    match = CELLS_PATTERN.match(cells)
+    if match is None:
+        raise FakeApiError(
+            HTTPStatus.BAD_REQUEST, f"Unable to parse range: {a1_range}"
+            )
+    left, top, right, bottom = match.groups()
+    if right is None and bottom is None:
+        # A single cell
+        right, bottom = left, top
+    return title, (
+        int(top) - 1 if top else None,
+        column_number(left) - 1 if left else None,
+        int(bottom) if bottom else None,
+        column_number(right) if right else None,
+        )
+
+
+def format_range(title, top, left, rows, columns):
+    """
+    Function to write the A1 range of a block of cells.
+
+    Returns:
+    str: The range, such as "'user'!A1:H1".
+    """
+    def cell(row, column):
+        letters = ""
+        while column:
+            column, remainder = divmod(column - 1, 26)
+            letters = chr(ord("A") + remainder) + letters
+        return f"{letters}{row}"
+
+    return (
+        f"'{title}'!{cell(top + 1, left + 1)}:"
+        f"{cell(top + max(rows, 1), left + max(columns, 1))}"
+        )
+
+
+def trim(rows):
+    """
+    Function to drop the empty cells at the end of rows and the empty
+    rows at the end of a block, as the Sheets API does.
+
+    Returns:
+    list: The trimmed rows.
+    """
+    trimmed = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] == "":
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+def cell_value(value):
+    """
+    Function to store a value the way a cell displays it.
+
+    Returns:
+    str: The formatted value.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).upper()
+    return str(value)
+
+
+class FakeSpreadsheet:
+    """
+    In-memory 'lottorama-data' document.
+
+    Args:
+    draw_rows (list): The rows of the 'euro' worksheet.
+    name (str): The name of the document.
+    ticket (list): The seven numbers first written to the 'user'
+    worksheet.
+    """
+
+    def __init__(self, draw_rows, name=SPREADSHEET_NAME,
+                 ticket=(1, 2, 3, 4, 5, 1, 2)):
+        self.name = name
+        self.id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self.worksheets = {title: [] for title in WORKSHEETS}
+        self.worksheets["euro"] = [
+            [cell_value(value) for value in row] for row in draw_rows
+            ]
+        self.worksheets["user"] = [
+            ["Numbers:"] + [cell_value(num) for num in ticket]
+            ]
+
+    def metadata(self):
+        """
+        Function to describe the document, as spreadsheets.get does.
+
+        Returns:
+        dict: The properties of the document and of its worksheets.
+        """
+        with self._lock:
+            return {
+                "spreadsheetId": self.id,
+                "properties": {"title": self.name, "locale": "en_GB"},
+                "sheets": [
+                    {"properties": {
+                        "sheetId": index,
+                        "title": title,
+                        "index": index,
+                        "sheetType": "GRID",
+                        "gridProperties": {
+                            "rowCount": max(len(rows), 1000),
+                            "columnCount": 26,
+                        },
+                    }}
+                    for index, (title, rows) in enumerate(
+                        self.worksheets.items()
+                        )
+                ],
+            }
+
+    def add_worksheet(self, properties):
+        """
+        Function to add an empty worksheet, as an addSheet request does.
+
+        Args:
+        properties (dict): The properties of the worksheet, with its
+        'title'.
+
+        Returns:
+        dict: The properties of the worksheet added.
+
+        Raises:
+        FakeApiError: If a worksheet of that title already exists.
+        """
+        title = properties.get("title")
+        with self._lock:
+            if not title or title in self.worksheets:
+                raise FakeApiError(
+                    HTTPStatus.BAD_REQUEST,
+                    f'A sheet with the name "{title}" already exists.'
+                    )
+            self.worksheets[title] = []
+            index = len(self.worksheets) - 1
+        return {
+            "sheetId": index,
+            "title": title,
+            "index": index,
+            "sheetType": "GRID",
+            "gridProperties": properties.get("gridProperties", {}),
+        }
+
+    def _worksheet(self, title):
+        if title not in self.worksheets:
+            raise FakeApiError(
+                HTTPStatus.BAD_REQUEST, f"Unable to parse range: {title}"
+                )
+        return self.worksheets[title]
+
+    def _rows(self, title):
+        rows = self._worksheet(title)
+        if title not in RANKING_WORKSHEETS:
+            return rows
+        # Computed like the formulas of the worksheet
+        try:
+            return ranking_rows(
+                title, self.worksheets["euro"], self.worksheets["user"]
+                )
+        except (ValueError, IndexError):
+            return [["Wins:"] + ["#VALUE!"] * 7]
+
+    def get(self, a1_range):
+        """
+        Function to read the values of a range.
+
+        Returns:
+        dict: A ValueRange, as spreadsheets.values.get returns.
+        """
+        title, (top, left, bottom, right) = parse_range(a1_range, "euro")
+        with self._lock:
+            rows = self._rows(title)
+            top, left = top or 0, left or 0
+            values = trim(
+                row[left:right] for row in rows[top:bottom]
+                )
+        response = {
+            "range": format_range(
+                title, top, left, len(values),
+                max((len(row) for row in values), default=1)
+                ),
+            "majorDimension": "ROWS",
+        }
+        if values:
+            response["values"] = values
+        return response
+
+    def update(self, a1_range, values):
+        """
+        Function to write values from the top left cell of a range.
+
+        Returns:
+        dict: An UpdateValuesResponse.
+        """
+        title, (top, left, _, _) = parse_range(a1_range, "euro")
+        top, left = top or 0, left or 0
+        with self._lock:
+            rows = self._worksheet(title)
+            for offset, values_row in enumerate(values):
+                while len(rows) <= top + offset:
+                    rows.append([])
+                row = rows[top + offset]
+                while len(row) < left + len(values_row):
+                    row.append("")
+                row[left:left + len(values_row)] = [
+                    cell_value(value) for value in values_row
+                    ]
+        columns = max((len(row) for row in values), default=0)
+        return {
+            "spreadsheetId": self.id,
+            "updatedRange": format_range(
+                title, top, left, len(values), columns
+                ),
+            "updatedRows": len(values),
+            "updatedColumns": columns,
+            "updatedCells": sum(len(row) for row in values),
+        }
+
+    def append(self, a1_range, values):
+        """
+        Function to write values after the last row of a worksheet.
+
+        Returns:
+        dict: An AppendValuesResponse.
+        """
+        title, _ = parse_range(a1_range, "euro")
+        with self._lock:
+            top = len(trim(self._worksheet(title)))
+        updates = self.update(format_range(title, top, 0, 1, 1), values)
+        return {
+            "spreadsheetId": self.id,
+            "tableRange": format_range(title, 0, 0, max(top, 1), 8),
+            "updates": updates,
+        }
+
+
+class QuotaWindow:
+    """
+    Requests allowed per minute, as the per-user quotas of the
+    Sheets API.
+
+    Args:
+    per_minute (int): Requests allowed in any minute, None for no
+    limit.
+    """
+
+    def __init__(self, per_minute=None):
+        self.per_minute = per_minute
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def allow(self, now=None):
+        """
+        Function to count a request against the quota.
+
+        Returns:
+        bool: False if the quota of the last minute is used up, the
+        request is then not counted.
+        """
+        if self.per_minute is None:
+            return True
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._times and self._times[0] <= now - 60:
+                self._times.popleft()
+            if len(self._times) >= self.per_minute:
+                return False
+            self._times.append(now)
+            return True
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    """
+    Answers the Sheets and Drive API requests from the document of
+    the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.answer("GET")
+
+    def do_PUT(self):
+        self.answer("PUT")
+
+    def do_POST(self):
+        self.answer("POST")
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, error):
+        self.send_json(error.status, {"error": {
+            "code": error.status.value,
+            "message": str(error),
+            "status": error.reason,
+            }})
+
+    def answer(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        delay = server.latency + server.random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+
+        quota = server.reads if method == "GET" else server.writes
+        kind = "read" if method == "GET" else "write"
+        try:
+            if (server.random.random() < server.error_rate or
+                    not quota.allow()):
+                raise FakeApiError(
+                    HTTPStatus.TOO_MANY_REQUESTS,
+                    f"Quota exceeded for quota metric '{kind.title()} "
+                    f"requests' and limit '{kind.title()} requests per "
+                    "minute per user'.", "RESOURCE_EXHAUSTED"
+                    )
+            payload = self.route(method, unquote(url.path), query, body)
+        except FakeApiError as e:
+            server.count(kind, e.status)
+            self.send_error_json(e)
+            return
+        server.count(kind, HTTPStatus.OK)
+        self.send_json(HTTPStatus.OK, payload)
+
+    def route(self, method, path, query, body):
+        """
+        Function to answer one API call.
+
+        Returns:
+        dict: The JSON response.
+
+        Raises:
+        FakeApiError: If the call fails or is not supported.
+        """
+        sheet = self.server.spreadsheet
+        if method == "GET" and path == "/drive/v3/files":
+            names = re.findall(r'name = "([^"]*)"', query.get("q", [""])[0])
+            files = [] if names and sheet.name not in names else [{
+                "id": sheet.id, "name": sheet.name,
+                "createdTime": "2024-01-01T00:00:00.000Z",
+                "modifiedTime": "2024-01-01T00:00:00.000Z",
+            }]
+            return {"kind": "drive#fileList", "files": files}
+
+        prefix = f"/v4/spreadsheets/{sheet.id}"
+        if not path.startswith(prefix):
+            raise FakeApiError(
+                HTTPStatus.NOT_FOUND, "Requested entity was not found.",
+                "NOT_FOUND"
+                )
+        path = path[len(prefix):]
+
+        if method == "GET" and path == "":
+            return sheet.metadata()
+        if method == "GET" and path == "/values:batchGet":
+            return {
+                "spreadsheetId": sheet.id,
+                "valueRanges": [
+                    sheet.get(a1_range) for a1_range in query.get("ranges", [])
+                    ],
+            }
+        if method == "POST" and path == ":batchUpdate":
+            updates = body.get("requests", [])
+            if not all("addSheet" in update for update in updates):
+                raise FakeApiError(
+                    HTTPStatus.BAD_REQUEST,
+                    "Only addSheet requests are supported by the fake."
+                    )
+            return {
+                "spreadsheetId": sheet.id,
+                "replies": [
+                    {"addSheet": {"properties": sheet.add_worksheet(
+                        update["addSheet"].get("properties", {})
+                        )}}
+                    for update in updates
+                    ],
+            }
+        if method == "POST" and path == "/values:batchUpdate":
+            responses = [
+                sheet.update(data["range"], data["values"])
+                for data in body.get("data", [])
+                ]
+            return {
+                "spreadsheetId": sheet.id,
+                "totalUpdatedRows": sum(
+                    response["updatedRows"] for response in responses
+                    ),
+                "totalUpdatedCells": sum(
+                    response["updatedCells"] for response in responses
+                    ),
+                "totalUpdatedSheets": len(responses),
+                "responses": responses,
+            }
+        if path.startswith("/values/"):
+            a1_range = path[len("/values/"):]
+            if method == "POST" and a1_range.endswith(":append"):
+                return sheet.append(
+                    a1_range[:-len(":append")], body.get("values", [])
+                    )
+            if method == "GET":
+                return sheet.get(a1_range)
+            if method == "PUT":
+                return sheet.update(
+                    a1_range, body.get("values", [])
+                    )
+        raise FakeApiError(
+            HTTPStatus.NOT_FOUND,
+            f"{method} {path} is not supported by the fake.", "NOT_FOUND"
+            )
+
+
+class FakeSheetsServer(ThreadingHTTPServer):
+    """
+    HTTP server of a FakeSpreadsheet.
+
+    Args:
+    address (tuple): The (host, port) to listen on, port 0 for any
+    free port.
+    spreadsheet (FakeSpreadsheet): The document served.
+    latency (float): Seconds added to every request.
+    jitter (float): Most seconds added at random on top of it.
+    read_quota (int): Read requests allowed per minute, None for no
+    limit.
+    write_quota (int): Write requests allowed per minute, likewise.
+    error_rate (float): Share of requests rejected with a 429 error
+    regardless of the quotas.
+    seed (int): Optional seed of the jitter and random errors.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, spreadsheet, latency=0.0, jitter=0.0,
+                 read_quota=None, write_quota=None, error_rate=0.0,
+                 seed=None):
+        super().__init__(address, FakeSheetsHandler)
+        self.spreadsheet = spreadsheet
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reads = QuotaWindow(read_quota)
+        self.writes = QuotaWindow(write_quota)
+        self.random = random.Random(seed)
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, kind, status):
+        """
+        Function to count an answered request by kind and status.
+        """
+        with self._lock:
+            key = (kind, int(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+        increment("fake_sheets_requests_total", kind=kind, status=int(status))
+
+    def start(self):
+        """
+        Function to serve requests on a background thread.
+
+        Returns:
+        FakeSheetsServer: The server, to chain with the constructor.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    """
+    Function to run the fake from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in of the Google Sheets API."
+        )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--draws-file",
+        help="CSV file of the 'euro' worksheet, synthetic draws by default"
+        )
+    parser.add_argument("--draws", type=int, default=1800)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--read-quota", type=int, help="read requests allowed per minute"
+        )
+    parser.add_argument(
+        "--write-quota", type=int, help="write requests allowed per minute"
+        )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0,
+        help="share of requests rejected with a 429 error at random"
+        )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.draws_file:
+        with open(args.draws_file, newline="") as source:
+            draw_rows = list(csv.reader(source))
+    else:
+        # Laid out as synthetic.write_draws_csv() writes them
+        matrix = synthetic_matrix(np.random.default_rng(args.seed), args.draws)
+        draw_rows = [["Date", "N1", "N2", "N3", "N4", "N5", "L1", "L2"]] + [
+            [f"D{index:08d}"] + draw
+            for index, draw in enumerate(matrix.tolist())
+            ]
+
+    server = FakeSheetsServer(
+        (args.host, args.port), FakeSpreadsheet(draw_rows),
+        latency=args.latency, jitter=args.jitter,
+        read_quota=args.read_quota, write_quota=args.write_quota,
+        error_rate=args.error_rate, seed=args.seed
+        )
+    print(
+        f"Serving '{server.spreadsheet.name}' on {server.url}, "
+        f"set LOTTORAMA_SHEETS_URL={server.url}", file=sys.stderr
+        )
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Stop as on Ctrl+C when run in the background of a test script
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    for (kind, status), count in sorted(server.requests.items()):
+        print(f"{kind} {status}: {count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Bulk import of the draw history from CSV exports.
+
+Exports in the layout of the 'euro' worksheet (the draw date, the five
+main numbers and the two lucky numbers on each row) are streamed row by
+row, so files of any size are read with a small, constant amount of
+memory. Every draw is checked with the same range and uniqueness rules
+as a ticket, and its date must be in one of the formats of
+windows.DATE_FORMATS. Valid draws are packed into fixed-size NumPy
+chunks of 11 bytes a draw.
+
+The draws are then merged with those already in the columnar store,
+sorted by date and deduplicated by date: the first draw of a date is
+kept, draws already stored first. A later draw of the same date with
+other numbers is counted as a conflict. The store is written once, at
+the end, without any Google Sheets call. The local backend reads the
+draws from it from then on, see backends.py.
+
+Usage:
+    python3 ingest.py euromillions-2004-2014.csv euromillions-2015.csv
+    python3 ingest.py history.csv --store data/euro.npz
+"""
+import argparse
+import csv
+import sys
+from collections import namedtuple
+from contextlib import ExitStack
+from datetime import datetime
+
+import numpy as np
+
+from backends import DEFAULT_DATA_DIR, LocalBackend
+from draw_store import DrawStore
+from validation import lucky_number_errors, main_number_errors
+from windows import DATE_FORMATS
+
+# Draws packed per chunk while streaming
+DEFAULT_CHUNK_SIZE = 65536
+
+# Invalid rows reported one by one, the others are only counted
+MAX_REPORTED_ERRORS = 20
+
+IngestReport = namedtuple(
+    "IngestReport",
+    ["rows", "invalid", "duplicates", "conflicts", "imported", "draws",
+     "errors"]
+    )
+
+
+def parse_day(text, formats=DATE_FORMATS):
+    """
+    Function to read a draw date, trying the formats in turn.
+
+    Args:
+    text (str): The date.
+    formats (tuple): The formats to try, the most likely first.
+
+    Returns:
+    tuple: The date and the format it was in, or (None, None).
+    """
+    for date_format in formats:
+        try:
+            return datetime.strptime(text, date_format).date(), date_format
+        except ValueError:
+            continue
+    return None, None
+
+
+def parse_draw(row, formats=DATE_FORMATS):
+    """
+    Function to read and validate one draw of an export.
+
+    Args:
+    row (list): The cells of the row, in the layout of the 'euro'
+    worksheet.
+    formats (tuple): The date formats to try, the most likely first.
+
+    Returns:
+    tuple: (ordinal, numbers, date_format, errors) where ordinal is
+    the day ordinal of the draw date, numbers the seven sorted numbers
+    and date_format the format of the date, or None values and the
+    error messages when the draw is not valid.
+    """
+    row = [value.strip() for value in row]
+    if len(row) < 8:
+        return None, None, None, ["Error: A date and 7 numbers required!"]
+
+    errors = main_number_errors(row[1:6]) + lucky_number_errors(row[6:8])
+    day, date_format = parse_day(row[0], formats)
+    if day is None:
+        errors.append(f"Error: Unknown date format: {row[0]}")
+    if errors:
+        return None, None, None, errors
+
+    numbers = sorted(int(num) for num in row[1:6]) + sorted(
+        int(num) for num in row[6:8]
+        )
+    return day.toordinal(), numbers, date_format, []
+
+
+def read_draws(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Function to stream the valid draws of a CSV export in chunks.
+
+    Args:
+    stream (file): The open CSV file.
+    chunk_size (int): The most draws in a chunk.
+
+    Yields:
+    tuple: (dates, numbers, invalid) for each chunk, the (n,) int32
+    date ordinals and (n x 7) uint8 numbers of its valid draws, and
+    a list of (line, errors) for its invalid rows.
+    """
+    dates = np.empty(chunk_size, dtype=np.int32)
+    numbers = np.empty((chunk_size, 7), dtype=np.uint8)
+    size = 0
+    invalid = []
+    formats = DATE_FORMATS
+    for line, row in enumerate(csv.reader(stream), start=1):
+        if not any(value.strip() for value in row):
+            continue
+        # Skip a header row, its first cell is not a date
+        if line == 1 and parse_day(row[0].strip())[0] is None:
+            continue
+        ordinal, draw, date_format, errors = parse_draw(row, formats)
+        if errors:
+            invalid.append((line, errors))
+            if len(invalid) == chunk_size:
+                yield dates[:size].copy(), numbers[:size].copy(), invalid
+                size, invalid = 0, []
+            continue
+        # An export keeps to one date format, try it first
+        if date_format != formats[0]:
+            formats = (date_format,) + tuple(
+                other for other in DATE_FORMATS if other != date_format
+                )
+        dates[size] = ordinal
+        numbers[size] = draw
+        size += 1
+        if size == chunk_size:
+            yield dates[:size].copy(), numbers[:size].copy(), invalid
+            size, invalid = 0, []
+    if size or invalid:
+        yield dates[:size].copy(), numbers[:size].copy(), invalid
+
+
+def deduplicate(dates, numbers):
+    """
+    Function to sort draws by date and keep the first draw of each
+    date.
+
+    Args:
+    dates (ndarray): (n,) date ordinals.
+    numbers (ndarray): (n x 7) numbers of each draw.
+
+    Returns:
+    tuple: The sorted unique dates, their numbers, the number of
+    duplicates dropped and how many of them had other numbers than
+    the draw kept.
+    """
+    order = np.argsort(dates, kind="stable")
+    dates, numbers = dates[order], numbers[order]
+    first = np.ones(len(dates), dtype=bool)
+    first[1:] = dates[1:] != dates[:-1]
+    kept = numbers[first][np.cumsum(first) - 1]
+    conflicts = int((~first & (numbers != kept).any(axis=1)).sum())
+    return dates[first], numbers[first], int((~first).sum()), conflicts
+
+
+def ingest(streams, store, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Function to import CSV exports into the columnar draw store.
+
+    Args:
+    streams (list): The open CSV files, in order of precedence.
+    store (DrawStore): The store to merge the draws into.
+    chunk_size (int): Draws packed per chunk while streaming.
+
+    Returns:
+    IngestReport: The rows read, the invalid rows, the duplicates
+    dropped and the conflicting ones among them, the draws imported
+    and the draws in the store, and the first errors as
+    (file, line, errors) tuples.
+    """
+    stored_dates, main, lucky = store.load()
+    date_chunks = [stored_dates]
+    number_chunks = [np.hstack([main, lucky])]
+    rows = invalid = 0
+    errors = []
+    for source, stream in enumerate(streams):
+        for dates, numbers, bad_rows in read_draws(stream, chunk_size):
+            date_chunks.append(dates)
+            number_chunks.append(numbers)
+            rows += len(dates) + len(bad_rows)
+            invalid += len(bad_rows)
+            room = MAX_REPORTED_ERRORS - len(errors)
+            errors += [
+                (source, line, messages)
+                for line, messages in bad_rows[:max(room, 0)]
+                ]
+
+    dates, numbers, duplicates, conflicts = deduplicate(
+        np.concatenate(date_chunks), np.concatenate(number_chunks)
+        )
+    store.write(dates, numbers[:, :5], numbers[:, 5:])
+    return IngestReport(
+        rows=rows, invalid=invalid, duplicates=duplicates,
+        conflicts=conflicts, imported=len(dates) - len(stored_dates),
+        draws=len(dates), errors=errors
+        )
+
+
+def main(argv=None):
+    """
+    Function to run the import from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Import Euro Millions draws from CSV exports."
+        )
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="CSV exports, or - to read from standard input"
+        )
+    parser.add_argument(
+        "--store", default=LocalBackend(DEFAULT_DATA_DIR).store.path,
+        help="path of the columnar draw store"
+        )
+    args = parser.parse_args(argv)
+
+    with ExitStack() as stack:
+        streams = [
+            sys.stdin if name == "-" else stack.enter_context(
+                open(name, newline="")
+                )
+            for name in args.inputs
+            ]
+        report = ingest(streams, DrawStore(args.store))
+
+    for source, line, messages in report.errors:
+        print(
+            f"{args.inputs[source]}:{line}: {' '.join(messages)}",
+            file=sys.stderr
+            )
+    print(
+        f"{report.rows} rows read, {report.invalid} invalid, "
+        f"{report.duplicates} duplicate dates "
+        f"({report.conflicts} with other numbers), "
+        f"{report.imported} draws imported, "
+        f"{report.draws} draws in {args.store}.",
+        file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
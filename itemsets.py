@@ -0,0 +1,280 @@
+"""
+Frequent itemsets of main numbers over the draw history.
+
+An itemset is a combination of main numbers and its support is the
+number of draws holding all of them. Supports come from the subset
+count tables of simulation.build_tables(), one dense array per size
+indexed by colex rank, so the support of any itemset is one lookup.
+As in Apriori, itemsets drawn fewer than min_support times are not
+frequent and count as 0; every subset of a frequent itemset is
+frequent too.
+
+The best completions of every two kept numbers into a ticket are
+mined once per version of the draw history, and again only for the
+pairs of the draws added since. A completion of the kept
+pair P by the numbers E scores the supports of P together with every
+non-empty subset of E, each extra number worth ten times more:
+
+    score(E) = sum over S in E of 10 ** (|S| - 1) * support(P + S)
+
+The three numbers are added one at a time, keeping the best partial
+completions of all 1,225 pairs at once (a beam search), and the best
+completions are stored by the colex rank of the pair. Completing two
+kept numbers is then a single indexed lookup.
+"""
+import os
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from draw_matrix import colex_rank, colex_unrank
+from ranking import MAIN_NUMBER_MAX
+
+# Draws an itemset needs to be frequent
+DEFAULT_MIN_SUPPORT = int(os.environ.get("LOTTORAMA_ITEMSET_MIN_SUPPORT", 2))
+
+# Completions kept for every pair of kept numbers
+DEFAULT_COMPLETIONS = 5
+
+# Partial completions kept for every pair while adding numbers
+BEAM_WIDTH = 10
+
+# Each extra number in a subset is worth ten times more
+SUBSET_WEIGHT = 10
+
+# KEPT_PAIRS[rank] is the pair of main numbers of that colex rank
+KEPT_PAIRS = colex_unrank(np.arange(comb(MAIN_NUMBER_MAX, 2)), 2)
+
+NUMBERS = np.arange(1, MAIN_NUMBER_MAX + 1)
+
+# Column indices of the ten pairs of main numbers of a draw
+PAIR_COLUMNS = np.array(list(combinations(range(5), 2)), dtype=np.intp)
+
+
+class FrequentItemsets:
+    """
+    Frequent itemsets of main numbers and the best completions of
+    every pair of kept numbers.
+
+    Args:
+    tables (dict): Subset count tables from simulation.build_tables().
+    min_support (int): Draws an itemset needs to be frequent.
+    completions (int): Completions kept for every pair.
+    """
+
+    def __init__(self, tables, min_support=DEFAULT_MIN_SUPPORT,
+                 completions=DEFAULT_COMPLETIONS):
+        self.tables = tables
+        self.min_support = max(int(min_support), 1)
+        self.completions = completions
+        self.extra, self.scores = self._mine(KEPT_PAIRS)
+
+    def arrays(self):
+        """
+        Function to get the mined completions, to save them.
+
+        Returns:
+        dict: The arrays by name.
+        """
+        return {
+            "extra": self.extra,
+            "scores": self.scores,
+            "min_support": np.array(self.min_support),
+        }
+
+    @classmethod
+    def from_arrays(cls, tables, arrays):
+        """
+        Function to rebuild the itemsets from their saved arrays,
+        without mining them again or copying them.
+
+        Args:
+        tables (dict): The subset count tables they were mined from.
+        arrays (dict): The arrays from arrays().
+
+        Returns:
+        FrequentItemsets: The itemsets.
+        """
+        itemsets = cls.__new__(cls)
+        itemsets.tables = tables
+        itemsets.min_support = int(arrays["min_support"])
+        itemsets.extra = arrays["extra"]
+        itemsets.scores = arrays["scores"]
+        itemsets.completions = itemsets.extra.shape[1]
+        return itemsets
+
+    def _supports(self, combos):
+        """
+        Function to look up the supports of itemsets, 0 for those that
+        are not frequent.
+
+        Args:
+        combos (ndarray): Sorted itemsets of shape (..., k). Itemsets
+        with a repeated number get a meaningless support.
+
+        Returns:
+        ndarray: The int64 supports of shape (...).
+        """
+        supports = np.take(
+            self.tables[combos.shape[-1]], colex_rank(combos), mode="clip"
+            )
+        supports[supports < self.min_support] = 0
+        return supports
+
+    def _score(self, pairs, extra):
+        """
+        Function to score completions of kept pairs.
+
+        Args:
+        pairs (ndarray): Kept pairs of shape (..., 2).
+        extra (ndarray): Extra numbers of shape (..., j).
+
+        Returns:
+        ndarray: The int64 scores of shape (...).
+        """
+        scores = np.zeros(extra.shape[:-1], dtype=np.int64)
+        for size in range(1, extra.shape[-1] + 1):
+            for columns in combinations(range(extra.shape[-1]), size):
+                itemsets = np.sort(np.concatenate(
+                    [pairs, extra[..., list(columns)]], axis=-1
+                    ), axis=-1)
+                scores += SUBSET_WEIGHT ** (size - 1) * self._supports(
+                    itemsets
+                    )
+        return scores
+
+    def _mine(self, kept_pairs):
+        """
+        Function to find the best completions of kept pairs.
+
+        Args:
+        kept_pairs (ndarray): (pairs x 2) kept pairs, such as
+        KEPT_PAIRS.
+
+        Returns:
+        tuple: (pairs x completions x 3) extra numbers, sorted, and
+        (pairs x completions) scores, best first.
+        """
+        count = len(kept_pairs)
+        extra = np.zeros((count, 1, 0), dtype=np.int64)
+        for step in range(3):
+            beam = extra.shape[1]
+            # Every state extended by every number, one row per pair
+            grown = np.concatenate([
+                np.broadcast_to(
+                    extra[:, :, np.newaxis, :],
+                    (count, beam, MAIN_NUMBER_MAX, step)
+                    ),
+                np.broadcast_to(
+                    NUMBERS[np.newaxis, np.newaxis, :, np.newaxis],
+                    (count, beam, MAIN_NUMBER_MAX, 1)
+                    ),
+                ], axis=-1).reshape(count, beam * MAIN_NUMBER_MAX, step + 1)
+            grown = np.sort(grown, axis=-1)
+            pairs = np.broadcast_to(
+                kept_pairs[:, np.newaxis, :], grown.shape[:2] + (2,)
+                )
+
+            # Numbers already kept or added do not complete a pair
+            valid = (np.diff(grown, axis=-1) > 0).all(axis=-1)
+            valid &= ~(
+                grown[..., :, np.newaxis] == pairs[..., np.newaxis, :]
+                ).any(axis=(-1, -2))
+            scores = np.where(valid, self._score(pairs, grown), -1)
+
+            # The same numbers added in another order are dropped
+            ids = np.where(valid, colex_rank(grown), -1)
+            order = np.argsort(ids, axis=-1, kind="stable")
+            ids = np.take_along_axis(ids, order, axis=-1)
+            scores = np.take_along_axis(scores, order, axis=-1)
+            grown = np.take_along_axis(grown, order[..., np.newaxis], axis=1)
+            scores[:, 1:][ids[:, 1:] == ids[:, :-1]] = -1
+
+            width = self.completions if step == 2 else BEAM_WIDTH
+            best = np.lexsort((ids, -scores), axis=-1)[:, :width]
+            extra = np.take_along_axis(grown, best[..., np.newaxis], axis=1)
+            best_scores = np.take_along_axis(scores, best, axis=-1)
+        return extra, best_scores
+
+    def with_draws(self, tables, matrix):
+        """
+        Function to mine the completions again once draws were added
+        to the tables. A draw only changes the supports of the
+        itemsets it holds, and those only score the completions of the
+        pairs it holds, so only the completions of the pairs of the
+        added draws are mined again.
+
+        Args:
+        tables (dict): The subset count tables with the draws added.
+        matrix (ndarray): The added draws.
+
+        Returns:
+        FrequentItemsets: The itemsets of the tables.
+        """
+        itemsets = self.__class__.__new__(self.__class__)
+        itemsets.tables = tables
+        itemsets.min_support = self.min_support
+        itemsets.completions = self.completions
+        itemsets.extra = np.array(self.extra)
+        itemsets.scores = np.array(self.scores)
+        ranks = np.unique(colex_rank(matrix[:, :5][:, PAIR_COLUMNS]))
+        if len(ranks):
+            itemsets.extra[ranks], itemsets.scores[ranks] = itemsets._mine(
+                KEPT_PAIRS[ranks]
+                )
+        return itemsets
+
+    def support(self, numbers):
+        """
+        Function to get the support of an itemset.
+
+        Args:
+        numbers (list): One to five different main numbers.
+
+        Returns:
+        int: The number of draws holding all of them.
+        """
+        combo = np.array(sorted(numbers))
+        return int(self.tables[len(combo)][colex_rank(combo)])
+
+    def frequent(self, k, top_n=None):
+        """
+        Function to list the frequent itemsets of a size.
+
+        Args:
+        k (int): The size of the itemsets, 1 to 5.
+        top_n (int): Optional number of itemsets to return.
+
+        Returns:
+        list: Tuples (numbers, support), most frequent first.
+        """
+        table = self.tables[k]
+        ranks = np.flatnonzero(table >= self.min_support)
+        ranks = ranks[np.lexsort((ranks, -table[ranks]))][:top_n]
+        return [
+            (combo, int(table[rank]))
+            for combo, rank in zip(colex_unrank(ranks, k).tolist(), ranks)
+            ]
+
+    def complete(self, kept, top_n=1):
+        """
+        Function to get the best completions of two kept numbers.
+
+        Args:
+        kept (list): Two different main numbers.
+        top_n (int): The number of completions, at most the number
+        kept for every pair.
+
+        Returns:
+        list: Tuples (extra, score) of the three extra numbers, sorted,
+        and their score, best first.
+        """
+        rank = colex_rank(sorted(kept))
+        return [
+            (extra, int(score))
+            for extra, score in zip(
+                self.extra[rank, :top_n].tolist(),
+                self.scores[rank, :top_n]
+                )
+            ]
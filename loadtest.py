@@ -0,0 +1,472 @@
+"""
+Load test of the terminal game with concurrent scripted sessions.
+
+Every session plays run.play_lottorama_game() on its own thread, with
+input() answered from a script of answers, such as the five numbers,
+the two lucky numbers, then 'm', the two numbers to keep and 'n', and
+print() discarded. input() and print() are replaced by functions that
+look up the session of the calling thread, so the game code runs
+unchanged. A session ends when the game returns or its script runs out.
+
+The game talks to a StandInBackend instead of Google Sheets: the draws
+of a synthetic history in CSV files, with a configurable latency added
+to every call and a configurable share of calls rejected with the
+429 quota error of the Sheets API, retried as SheetsBackend retries
+them. The report gives the sessions completed per second and the p50
+and p99 latencies of every game phase and backend call, taken from the
+spans of metrics.py.
+
+Usage:
+    python3 loadtest.py --sessions 500 --concurrency 50 --latency 0.3
+    python3 loadtest.py --scripts sessions.jsonl --quota-errors 0.05
+"""
+import argparse
+import builtins
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from gspread.exceptions import APIError
+
+from metrics import METRICS, increment, span
+from sheet_writer import call_with_retry
+
+# Phases reported, by span name prefix
+REPORTED_SPANS = ("loadtest.", "game.", "backend.", "write_behind.")
+
+
+class ScriptEnded(BaseException):
+    """
+    Raised by input() when the script of a session has no answers
+    left. It is not an Exception so that no handler of the game
+    catches it.
+    """
+
+
+def quota_error():
+    """
+    Function to build the error gspread raises when a Sheets API
+    quota is exceeded.
+
+    Returns:
+    APIError: An error with a 429 response.
+    """
+    response = requests.Response()
+    response.status_code = 429
+    response._content = json.dumps({
+        "error": {
+            "code": 429,
+            "message": "Quota exceeded for quota metric 'Read requests'.",
+            "status": "RESOURCE_EXHAUSTED",
+        },
+    }).encode()
+    return APIError(response)
+
+
+class StandInBackend:
+    """
+    Backend standing in for Google Sheets, answering from a
+    LocalBackend with injected latency and quota errors.
+
+    Args:
+    backend (LocalBackend): The backend answering the calls.
+    latency (float): Seconds added to every call.
+    jitter (float): Most seconds added at random on top of it.
+    quota_errors (float): Share of calls rejected with a 429 error.
+    seed (int): Optional seed of the injected jitter and errors.
+    retry_options: call_with_retry() arguments used to retry the
+    rejected calls, as SheetsBackend does.
+    """
+
+    name = "stand-in"
+
+    def __init__(self, backend, latency=0.0, jitter=0.0, quota_errors=0.0,
+                 seed=None, **retry_options):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_errors = quota_errors
+        self.retry_options = retry_options
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _request(self, method, *args):
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            rejected = self._random.random() < self.quota_errors
+        time.sleep(delay)
+        if rejected:
+            increment("loadtest_quota_errors_total", method=method)
+            raise quota_error()
+        return getattr(self.backend, method)(*args)
+
+    def _call(self, method, *args):
+        with span(f"backend.{method}", backend=self.name):
+            result, _ = call_with_retry(
+                lambda: self._request(method, *args), **self.retry_options
+                )
+            return result
+
+    def available(self):
+        return True
+
+    def read_draws(self, start_row=1):
+        return self._call("read_draws", start_row)
+
+    def write_ticket(self, row):
+        return self._call("write_ticket", row)
+
+    def append_tickets(self, rows):
+        return self._call("append_tickets", rows)
+
+    def read_rankings(self, name):
+        return self._call("read_rankings", name)
+
+
+def random_script(rng):
+    """
+    Function to make up the answers of a session.
+
+    The session plays one to three tickets. After each ticket it may
+    wheel a pool of numbers ('w'), then it either starts over ('r'),
+    or keeps two numbers for a prediction ('m') and plays again ('y'),
+    and after the last one it quits ('q'), or asks for a prediction
+    and does not play again ('n').
+
+    Args:
+    rng (Random): The random generator.
+
+    Returns:
+    list: The answers, in the order the game asks for them.
+    """
+    answers = []
+    tickets = rng.randint(1, 3)
+    for ticket in range(tickets):
+        numbers = sorted(rng.sample(range(1, 51), 5))
+        lucky = sorted(rng.sample(range(1, 13), 2))
+        answers += [
+            ",".join(map(str, numbers)), ",".join(map(str, lucky))
+            ]
+        if rng.random() < 0.25:
+            pool = rng.sample(range(1, 51), rng.randint(8, 15))
+            answers += ["w", ",".join(map(str, pool)), rng.choice("23")]
+        last = ticket == tickets - 1
+        action = rng.choice(["q", "m"] if last else ["r", "m"])
+        answers.append(action)
+        if action == "m":
+            answers += [
+                ",".join(map(str, rng.sample(numbers, 2))),
+                "n" if last else "y",
+                ]
+    return answers
+
+
+def read_scripts(path):
+    """
+    Function to read session scripts, one JSON list of answers per
+    line.
+
+    Args:
+    path (str): The JSON lines file.
+
+    Returns:
+    list: The scripts.
+    """
+    with open(path) as source:
+        return [json.loads(line) for line in source if line.strip()]
+
+
+class SessionConsole:
+    """
+    Replacement of input() and print() routing them to the session
+    of the calling thread. Threads without a session keep the real
+    input() and print().
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._input = builtins.input
+        self._print = builtins.print
+
+    def input(self, prompt=""):
+        answers = getattr(self._local, "answers", None)
+        if answers is None:
+            return self._input(prompt)
+        try:
+            return next(answers)
+        except StopIteration:
+            raise ScriptEnded()
+
+    def print(self, *args, **kwargs):
+        if getattr(self._local, "answers", None) is None:
+            self._print(*args, **kwargs)
+        elif any("Error" in str(arg) for arg in args):
+            self._local.rejected += 1
+
+    def __enter__(self):
+        builtins.input = self.input
+        builtins.print = self.print
+        return self
+
+    def __exit__(self, *exc_info):
+        builtins.input = self._input
+        builtins.print = self._print
+
+    def play(self, game, script):
+        """
+        Function to play one session on the calling thread.
+
+        Args:
+        game (callable): The game, run.play_lottorama_game.
+        script (list): The answers of the session.
+
+        Returns:
+        str: 'ok', 'derailed' if the game rejected an answer of the
+        script, such as kept numbers missing from the ranking read
+        back, or 'error' if the game raised an error.
+        """
+        self._local.answers = iter(script)
+        self._local.rejected = 0
+        try:
+            with span("loadtest.session"):
+                game()
+        except ScriptEnded:
+            pass
+        except Exception as e:
+            increment("loadtest_session_errors_total", error=type(e).__name__)
+            return "error"
+        finally:
+            self._local.answers = None
+        return "derailed" if self._local.rejected else "ok"
+
+
+def configure_environment(workdir):
+    """
+    Function to keep the game modules from touching Google Sheets or
+    the working directory. They read the environment when imported,
+    so it is set before any of them is.
+
+    Args:
+    workdir (str): The directory of the draws and caches.
+    """
+    os.environ["LOTTORAMA_OFFLINE"] = "1"
+    os.environ["LOTTORAMA_BACKEND"] = "local"
+    os.environ["LOTTORAMA_DATA_DIR"] = workdir
+    os.environ["LOTTORAMA_CACHE_PATH"] = os.path.join(
+        workdir, "cache.sqlite3"
+        )
+    os.environ.pop("LOTTORAMA_RESULT_CACHE_PATH", None)
+    os.environ.pop("LOTTORAMA_API_URL", None)
+
+
+def setup_game(workdir, backend, ranking_mode, candidates, cache_ttl):
+    """
+    Function to point the game module at the stand-in backend.
+
+    Args:
+    workdir (str): The directory of the draws and caches, as given
+    to configure_environment().
+    backend (StandInBackend): The backend of the game.
+    ranking_mode (str): 'local' or 'sheet', see run.RANKING_MODE.
+    candidates (int): Candidate tickets scored for each prediction.
+    cache_ttl (float): Seconds before the draw cache is synced again.
+
+    Returns:
+    module: The game module.
+    """
+    import run
+    from draw_cache import DrawCache
+    from result_cache import ResultCache
+    from service import LottoramaService
+
+    run.BACKEND = backend
+    run.RANKING_MODE = ranking_mode
+    run.DRAW_CACHE = DrawCache(
+        os.environ["LOTTORAMA_CACHE_PATH"], ttl=cache_ttl
+        )
+    run.RESULT_CACHE = ResultCache()
+    run.SERVICE = LottoramaService(
+        run.DRAW_CACHE, backend=backend, candidates=candidates, workers=1,
+        results=run.RESULT_CACHE
+        )
+    # The ticket log started when run.py was imported writes there too
+    run.TICKET_LOG.write = backend.append_tickets
+    return run
+
+
+def run_load_test(scripts, concurrency, backend, workdir,
+                  ranking_mode="local", candidates=20000, cache_ttl=3600):
+    """
+    Function to play the sessions concurrently and measure them.
+
+    Args:
+    scripts (list): The answers of every session.
+    concurrency (int): Sessions played at the same time.
+    backend (StandInBackend): The backend of the game.
+    workdir (str): The directory of the draws and caches.
+    ranking_mode (str): 'local' or 'sheet'.
+    candidates (int): Candidate tickets scored for each prediction.
+    cache_ttl (float): Seconds before the draw cache is synced again,
+    0 for every reload to read the new draws from the backend.
+
+    Returns:
+    dict: The 'sessions' played, the 'errors' and 'derailed' sessions
+    as returned by SessionConsole.play(), the 'seconds' taken,
+    'sessions_per_second', the 'quota_errors' injected and the
+    'phases' as {span: {'count', 'p50', 'p99'}} in seconds.
+    """
+    run = setup_game(workdir, backend, ranking_mode, candidates, cache_ttl)
+    # Load the draws before the clock starts, as a running dyno has
+    run.SERVICE.reload()
+    METRICS.reset()
+
+    with SessionConsole() as console:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            outcomes = list(pool.map(
+                lambda script: console.play(run.play_lottorama_game, script),
+                scripts
+                ))
+        seconds = time.perf_counter() - started
+    run.TICKET_LOG.close()
+
+    counters, spans = METRICS.snapshot()
+    phases = {}
+    for (name, labels), (count, _, quantiles) in sorted(spans.items()):
+        if name.startswith(REPORTED_SPANS):
+            label = name + "".join(f"[{value}]" for _, value in labels)
+            phases[label] = {
+                "count": count, "p50": quantiles[0.5], "p99": quantiles[0.99],
+            }
+    return {
+        "sessions": len(scripts),
+        "errors": outcomes.count("error"),
+        "derailed": outcomes.count("derailed"),
+        "seconds": seconds,
+        "sessions_per_second": len(scripts) / seconds if seconds else 0.0,
+        "quota_errors": sum(
+            value for (name, _), value in counters.items()
+            if name == "loadtest_quota_errors_total"
+            ),
+        "phases": phases,
+    }
+
+
+def format_report(report):
+    """
+    Function to format the result of run_load_test() as a table.
+
+    Args:
+    report (dict): The result of run_load_test().
+
+    Returns:
+    str: The report.
+    """
+    lines = [
+        f"{report['sessions']} sessions in {report['seconds']:.2f} s: "
+        f"{report['sessions_per_second']:.2f} sessions/s, "
+        f"{report['errors']} errors, {report['derailed']} derailed, "
+        f"{report['quota_errors']} quota errors injected",
+        "",
+        f"{'phase':<40}{'count':>8}{'p50 ms':>12}{'p99 ms':>12}",
+    ]
+    for label, phase in report["phases"].items():
+        lines.append(
+            f"{label:<40}{phase['count']:>8}"
+            f"{phase['p50'] * 1000:>12.1f}{phase['p99'] * 1000:>12.1f}"
+            )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Function to run the load test from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Load test the game with concurrent scripted sessions."
+        )
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--scripts",
+        help="JSON lines file of session answers, random ones by default"
+        )
+    parser.add_argument("--draws", type=int, default=1800)
+    parser.add_argument(
+        "--latency", type=float, default=0.2,
+        help="seconds added to every backend call"
+        )
+    parser.add_argument(
+        "--jitter", type=float, default=0.1,
+        help="most seconds added at random on top of the latency"
+        )
+    parser.add_argument(
+        "--quota-errors", type=float, default=0.0,
+        help="share of backend calls rejected with a 429 error"
+        )
+    parser.add_argument(
+        "--retry-delay", type=float, default=1.0,
+        help="seconds before the first retry of a rejected call"
+        )
+    parser.add_argument(
+        "--ranking-mode", choices=("local", "sheet"), default="local"
+        )
+    parser.add_argument("--candidates", type=int, default=20000)
+    parser.add_argument(
+        "--cache-ttl", type=float, default=3600,
+        help="seconds before the draw cache is synced again"
+        )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.sessions < 1 or args.concurrency < 1:
+        print("Sessions and concurrency must be at least 1.", file=sys.stderr)
+        return 1
+
+    if args.scripts:
+        scripts = read_scripts(args.scripts)
+    else:
+        rng = random.Random(args.seed)
+        scripts = [random_script(rng) for _ in range(args.sessions)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        from backends import LocalBackend
+        from synthetic import synthetic_matrix, write_draws_csv
+
+        local = LocalBackend(workdir)
+        write_draws_csv(
+            synthetic_matrix(np.random.default_rng(args.seed), args.draws),
+            local.path("euro")
+            )
+        backend = StandInBackend(
+            local, latency=args.latency, jitter=args.jitter,
+            quota_errors=args.quota_errors, seed=args.seed,
+            base_delay=args.retry_delay
+            )
+        report = run_load_test(
+            scripts, args.concurrency, backend, workdir,
+            ranking_mode=args.ranking_mode, candidates=args.candidates,
+            cache_ttl=args.cache_ttl
+            )
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w") as target:
+            json.dump(report, target, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Lucky number predictions from tables of the draw history.
+
+The tables are built once per version of the draw history:
+
+- How often each lucky number was drawn.
+- How often each of the 66 lucky pairs was drawn, indexed by the colex
+  rank of the pair.
+- How often each lucky pair was drawn with a given tier profile of the
+  main numbers: how many of the five were in the popular tier and how
+  many in the moderate tier.
+
+For each of the 6 x 6 tier profiles, the 66 pairs are then sorted once,
+by how often they came with that profile, then by how often they were
+drawn at all, then by the counts of their two numbers. Predicting the
+lucky numbers of a ticket is then a lookup of its profile and a slice
+of the sorted pairs, whatever the length of the history.
+"""
+import numpy as np
+
+from draw_matrix import colex_rank
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX
+from ticket_index import LUCKY_PAIRS
+
+# LUCKY_PAIR_NUMBERS[rank] is the lucky pair of that colex rank
+LUCKY_PAIR_NUMBERS = np.array(
+    [[low, high] for high in range(2, LUCKY_NUMBER_MAX + 1)
+     for low in range(1, high)],
+    dtype=np.uint8
+    )
+
+
+def tier_profile(numbers, popular_mask, moderate_mask):
+    """
+    Function to count the main numbers of each tier.
+
+    Args:
+    numbers (ndarray): Main numbers of shape (..., 5).
+    popular_mask (ndarray): Bool array indexed by number, True for
+    the popular tier.
+    moderate_mask (ndarray): Likewise for the moderate tier.
+
+    Returns:
+    tuple: The numbers in the popular tier and in the moderate tier,
+    each of shape (...).
+    """
+    numbers = np.asarray(numbers, dtype=np.intp)
+    return (
+        popular_mask[numbers].sum(axis=-1),
+        moderate_mask[numbers].sum(axis=-1),
+        )
+
+
+class LuckyTables:
+    """
+    Lucky number and lucky pair counts of the draw history, joint
+    with the tier profile of the main numbers.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    high_ranks (list): Main numbers of the popular tier.
+    moderate_ranks (list): Main numbers of the moderate tier.
+    """
+
+    def __init__(self, matrix, high_ranks, moderate_ranks):
+        self.popular_mask = np.zeros(MAIN_NUMBER_MAX + 1, dtype=bool)
+        self.popular_mask[list(high_ranks)] = True
+        self.moderate_mask = np.zeros(MAIN_NUMBER_MAX + 1, dtype=bool)
+        self.moderate_mask[list(moderate_ranks)] = True
+        self.moderate_mask &= ~self.popular_mask
+
+        self.number_counts = np.bincount(
+            matrix[:, 5:7].ravel(), minlength=LUCKY_NUMBER_MAX + 1
+            )
+        pairs = colex_rank(matrix[:, 5:7])
+        self.pair_counts = np.bincount(pairs, minlength=LUCKY_PAIRS)
+
+        popular, moderate = tier_profile(
+            matrix[:, :5], self.popular_mask, self.moderate_mask
+            )
+        cells = (popular * 6 + moderate) * LUCKY_PAIRS + pairs
+        self.joint = np.bincount(
+            cells, minlength=6 * 6 * LUCKY_PAIRS
+            ).reshape(6, 6, LUCKY_PAIRS)
+
+        # The pairs of each profile from most to least likely, ties
+        # broken by the overall pair counts, then the number counts
+        shape = self.joint.shape
+        number_sums = self.number_counts[LUCKY_PAIR_NUMBERS].sum(axis=1)
+        self.order = np.lexsort((
+            np.broadcast_to(np.arange(LUCKY_PAIRS), shape),
+            np.broadcast_to(-number_sums, shape),
+            np.broadcast_to(-self.pair_counts, shape),
+            -self.joint,
+            ))
+
+    def arrays(self):
+        """
+        Function to get the tables, to save them.
+
+        Returns:
+        dict: The arrays by name.
+        """
+        return {
+            name: getattr(self, name) for name in (
+                "popular_mask", "moderate_mask", "number_counts",
+                "pair_counts", "joint", "order"
+                )
+            }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Function to rebuild the tables from their saved arrays,
+        without copying them.
+
+        Args:
+        arrays (dict): The arrays from arrays().
+
+        Returns:
+        LuckyTables: The tables.
+        """
+        tables = cls.__new__(cls)
+        for name, array in arrays.items():
+            setattr(tables, name, array)
+        return tables
+
+    def pair_count(self, pair):
+        """
+        Function to get how often a lucky pair was drawn.
+
+        Args:
+        pair (list): Two different lucky numbers.
+
+        Returns:
+        int: The number of draws with both numbers.
+        """
+        return int(self.pair_counts[colex_rank(sorted(pair))])
+
+    def predict(self, numbers, top_n=1):
+        """
+        Function to predict the lucky numbers of a ticket.
+
+        Args:
+        numbers (list): The five main numbers of the ticket.
+        top_n (int): The number of lucky pairs to return.
+
+        Returns:
+        list: The top_n most likely lucky pairs, best first, each in
+        ascending order.
+        """
+        popular, moderate = tier_profile(
+            numbers, self.popular_mask, self.moderate_mask
+            )
+        best = self.order[popular, moderate, :max(top_n, 0)]
+        return LUCKY_PAIR_NUMBERS[best].tolist()
@@ -0,0 +1,211 @@
+"""
+Inverted index of the draw history for whole-ticket match counts.
+
+Each main number and each lucky number maps to a bitset of the draws
+it appeared in, one bit per draw packed into 64-bit words. The number
+of main numbers a ticket matched in every past draw is the sum of the
+bitsets of its five numbers, computed for all draws at once with a
+bit-sliced adder: three bit planes hold the count of each draw in
+binary, and the draws that matched exactly k numbers are selected by
+combining the planes. A popcount of that selection, ANDed with the
+lucky number planes, gives the number of past draws in each
+Euro Millions prize tier.
+
+The cost of a ticket is a few dozen word operations per 64 draws, and
+tickets are processed in vectorized chunks.
+"""
+import numpy as np
+
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX
+from ticket_index import popcount
+
+# Euro Millions prize tiers as (main matches, lucky matches), best first
+PRIZE_TIERS = [
+    (5, 2), (5, 1), (5, 0), (4, 2), (4, 1), (3, 2), (4, 0),
+    (2, 2), (3, 1), (3, 0), (1, 2), (2, 1), (2, 0),
+]
+
+# Tickets processed at a time, small enough for the planes of a chunk
+# to stay in the processor cache
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def draw_bitsets(columns, maximum, words):
+    """
+    Function to build the bitset of the draws of every number.
+
+    Args:
+    columns (ndarray): (draws x k) numbers of each draw.
+    maximum (int): The largest number.
+    words (int): 64-bit words per bitset.
+
+    Returns:
+    ndarray: (maximum + 1) x words uint64 bitsets, where bit d of
+    row n is set if number n was drawn in draw d.
+    """
+    bitsets = np.zeros((maximum + 1, words), dtype=np.uint64)
+    draws = np.repeat(np.arange(len(columns)), columns.shape[1])
+    np.bitwise_or.at(
+        bitsets,
+        (columns.astype(np.intp).ravel(), draws >> 6),
+        np.left_shift(np.uint64(1), (draws & 63).astype(np.uint64))
+        )
+    return bitsets
+
+
+class MatchIndex:
+    """
+    Bitsets of the draws of every number, for counting how many
+    numbers tickets matched in each past draw.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    """
+
+    def __init__(self, matrix):
+        self.draws = len(matrix)
+        self.words = max((self.draws + 63) // 64, 1)
+        self.main = draw_bitsets(matrix[:, :5], MAIN_NUMBER_MAX, self.words)
+        self.lucky = draw_bitsets(
+            matrix[:, 5:7], LUCKY_NUMBER_MAX, self.words
+            )
+
+        # Bits of the last word past the final draw are never counted
+        self.valid = np.full(self.words, np.uint64(2 ** 64 - 1))
+        if self.draws % 64:
+            self.valid[-1] = np.uint64((1 << (self.draws % 64)) - 1)
+        if not self.draws:
+            self.valid[:] = 0
+
+    def arrays(self):
+        """
+        Function to get the arrays of the index, to save them.
+
+        Returns:
+        dict: The arrays by name.
+        """
+        return {"main": self.main, "lucky": self.lucky, "valid": self.valid}
+
+    @classmethod
+    def from_arrays(cls, matrix, arrays):
+        """
+        Function to rebuild an index from its saved arrays, without
+        copying them.
+
+        Args:
+        matrix (ndarray): The draw matrix the index was built from.
+        arrays (dict): The arrays from arrays().
+
+        Returns:
+        MatchIndex: The index.
+        """
+        index = cls.__new__(cls)
+        index.draws = len(matrix)
+        index.main = arrays["main"]
+        index.lucky = arrays["lucky"]
+        index.valid = arrays["valid"]
+        index.words = index.main.shape[1]
+        return index
+
+    def _match_planes(self, tickets):
+        """
+        Function to add up the bitsets of the numbers of tickets.
+
+        Returns:
+        tuple: The three planes of the main match counts and the two
+        planes of the lucky match counts, each (tickets x words).
+        """
+        main = self.main[tickets[:, :5].astype(np.intp)]
+        s0 = main[:, 0].copy()
+        s1 = np.zeros_like(s0)
+        s2 = np.zeros_like(s0)
+        for number in range(1, 5):
+            bits = main[:, number]
+            carry = s0 & bits
+            s0 ^= bits
+            carry, s1 = s1 & carry, s1 ^ carry
+            s2 |= carry
+
+        lucky = self.lucky[tickets[:, 5:7].astype(np.intp)]
+        l0 = lucky[:, 0] ^ lucky[:, 1]
+        l1 = lucky[:, 0] & lucky[:, 1]
+        return (s0, s1, s2), (l0, l1)
+
+    @staticmethod
+    def _equal(planes, inverted, value):
+        """
+        Function to select the draws whose bit-sliced count equals
+        a value, given the planes and their complements.
+        """
+        selected = None
+        for bit in range(len(planes)):
+            term = planes[bit] if value >> bit & 1 else inverted[bit]
+            selected = term if selected is None else selected & term
+        return selected
+
+    def match_table(self, tickets, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Function to count past draws by main and lucky numbers matched.
+
+        Args:
+        tickets (ndarray): (n x 7) tickets, five main numbers followed
+        by two lucky numbers.
+        chunk_size (int): Tickets processed at a time.
+
+        Returns:
+        ndarray: (n x 6 x 3) counts, where [t, m, l] is the number of
+        draws in which ticket t matched m main and l lucky numbers.
+        """
+        tickets = np.asarray(tickets).reshape(-1, 7)
+        table = np.zeros((len(tickets), 6, 3), dtype=np.int64)
+        for start in range(0, len(tickets), chunk_size):
+            chunk = tickets[start:start + chunk_size]
+            main_planes, lucky_planes = self._match_planes(chunk)
+            main_inverted = [~plane for plane in main_planes]
+            lucky_inverted = [~plane for plane in lucky_planes]
+            lucky_equal = [
+                self._equal(lucky_planes, lucky_inverted, lucky) & self.valid
+                for lucky in range(3)
+                ]
+            for matched in range(6):
+                main_equal = self._equal(main_planes, main_inverted, matched)
+                for lucky in range(3):
+                    table[start:start + len(chunk), matched, lucky] = (
+                        popcount(main_equal & lucky_equal[lucky]).sum(
+                            axis=1, dtype=np.int64
+                            )
+                        )
+        return table
+
+    def prize_counts(self, tickets, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Function to count the past draws in which tickets would have
+        won each prize tier.
+
+        Args:
+        tickets (ndarray): (n x 7) tickets.
+        chunk_size (int): Tickets processed at a time.
+
+        Returns:
+        ndarray: (n x 13) counts in the order of PRIZE_TIERS.
+        """
+        table = self.match_table(tickets, chunk_size)
+        mains, luckies = zip(*PRIZE_TIERS)
+        return table[:, list(mains), list(luckies)]
+
+
+def prize_summary(counts):
+    """
+    Function to label the prize counts of one ticket.
+
+    Args:
+    counts (ndarray): A row of prize_counts().
+
+    Returns:
+    dict: The count of each prize tier keyed by 'main+lucky',
+    such as '5+2' for the jackpot, best tier first.
+    """
+    return {
+        f"{main}+{lucky}": int(count)
+        for (main, lucky), count in zip(PRIZE_TIERS, counts)
+        }
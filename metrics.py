@@ -0,0 +1,259 @@
+"""
+In-process metrics for Lottorama.
+
+Timing spans measure how long each game phase, backend call and Sheets
+API request takes, and counters track the API calls, the bytes sent and
+received and the quota errors. A span keeps the total count and time of
+its calls and the latencies of the most recent ones, from which the
+p50, p95 and p99 latencies are reported.
+
+The metrics are exposed in the Prometheus text format on the /metrics
+endpoint of the web service, and can be written as a periodic log line
+to standard error by setting LOTTORAMA_METRICS_INTERVAL to a number of
+seconds, for example with `python3 run.py 2> metrics.log`.
+"""
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+METRICS_INTERVAL = float(os.environ.get("LOTTORAMA_METRICS_INTERVAL", 0))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Latencies kept for each span to compute the quantiles
+WINDOW_SIZE = 1024
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+def quantile(values, q):
+    """
+    Function to get a quantile of sorted values by the nearest rank.
+
+    Args:
+    values (list): The values, in ascending order.
+    q (float): The quantile, between 0 and 1.
+
+    Returns:
+    float: The value at that quantile, or 0.0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    rank = max(math.ceil(q * len(values)), 1)
+    return values[rank - 1]
+
+
+class Metrics:
+    """
+    Registry of counters and timing spans.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._spans = {}
+
+    def increment(self, name, value=1, **labels):
+        """
+        Function to add to a counter.
+
+        Args:
+        name (str): The name of the counter.
+        value (float): The amount to add.
+        labels: Labels of the counter, such as status=429.
+        """
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Function to record the duration of one call of a span.
+
+        Args:
+        name (str): The name of the span.
+        seconds (float): The duration of the call.
+        labels: Labels of the span.
+        """
+        key = (name, label_key(labels))
+        with self._lock:
+            span = self._spans.get(key)
+            if span is None:
+                span = self._spans[key] = [0, 0.0, deque(maxlen=WINDOW_SIZE)]
+            span[0] += 1
+            span[1] += seconds
+            span[2].append(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Context manager timing the code it wraps as a span, whether
+        it returns or raises.
+
+        Args:
+        name (str): The name of the span, such as 'refresh_draws'.
+        labels: Labels of the span.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Function to get the current value of every metric.
+
+        Returns:
+        tuple: The counters as {(name, labels): value} and the spans as
+        {(name, labels): (count, total_seconds, quantiles)}, where the
+        quantiles are {q: seconds} over the most recent calls.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            spans = {
+                key: (count, total, sorted(window))
+                for key, (count, total, window) in self._spans.items()
+                }
+        return counters, {
+            key: (count, total, {q: quantile(window, q) for q in QUANTILES})
+            for key, (count, total, window) in spans.items()
+            }
+
+    def render_prometheus(self):
+        """
+        Function to render every metric in the Prometheus text format.
+
+        Counters are prefixed with 'lottorama_' and spans are rendered
+        as the 'lottorama_span_seconds' summary, labelled by span name.
+
+        Returns:
+        str: The exposition text.
+        """
+        counters, spans = self.snapshot()
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE lottorama_{name} counter")
+            for (counter, key), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(
+                        f"lottorama_{name}{format_labels(key)} {value}"
+                        )
+
+        if spans:
+            lines.append("# TYPE lottorama_span_seconds summary")
+        for (name, key), (count, total, quantiles) in sorted(spans.items()):
+            labels = (("span", name),) + key
+            for q, seconds in quantiles.items():
+                lines.append(
+                    "lottorama_span_seconds"
+                    f"{format_labels(labels + (('quantile', q),))} {seconds}"
+                    )
+            lines.append(
+                f"lottorama_span_seconds_count{format_labels(labels)} {count}"
+                )
+            lines.append(
+                f"lottorama_span_seconds_sum{format_labels(labels)} {total}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def summary_line(self):
+        """
+        Function to summarise every metric on a single log line.
+
+        Returns:
+        str: The spans with their count and p50, p95 and p99 latencies
+        in milliseconds, followed by the counters.
+        """
+        counters, spans = self.snapshot()
+        parts = []
+        for (name, key), (count, _, quantiles) in sorted(spans.items()):
+            latencies = "/".join(
+                f"{quantiles[q] * 1000:.1f}" for q in QUANTILES
+                )
+            parts.append(f"{name}{format_labels(key)} n={count} {latencies}ms")
+        for (name, key), value in sorted(counters.items()):
+            parts.append(f"{name}{format_labels(key)}={value}")
+        return "metrics " + (" ".join(parts) or "none")
+
+    def reset(self):
+        """
+        Function to clear every metric.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._spans.clear()
+
+
+# Registry shared by the whole process
+METRICS = Metrics()
+increment = METRICS.increment
+span = METRICS.span
+
+
+def log_periodically(interval=METRICS_INTERVAL, stream=None,
+                     registry=METRICS):
+    """
+    Function to write the summary line of the metrics at a regular
+    interval from a daemon thread.
+
+    Args:
+    interval (float): Seconds between lines, nothing is logged if 0.
+    stream (file): Where to write, standard error by default.
+    registry (Metrics): The metrics to summarise.
+
+    Returns:
+    Thread: The logging thread, or None if nothing is logged.
+    """
+    if not interval:
+        return None
+
+    def log():
+        while True:
+            time.sleep(interval)
+            print(registry.summary_line(), file=stream or sys.stderr,
+                  flush=True)
+
+    thread = threading.Thread(target=log, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+def instrument_session(session, registry=METRICS):
+    """
+    Function to count the requests a requests.Session sends to the
+    Google Sheets API, with their latency, size and status.
+
+    Args:
+    session (Session): The session of the gspread client.
+    registry (Metrics): The metrics to record into.
+    """
+    def record(response, *args, **kwargs):
+        body = response.request.body or b""
+        registry.increment(
+            "sheets_requests_total", status=response.status_code
+            )
+        registry.increment("sheets_bytes_sent_total", len(body))
+        registry.increment(
+            "sheets_bytes_received_total", len(response.content)
+            )
+        if response.status_code == 429:
+            registry.increment("sheets_quota_errors_total")
+        registry.observe(
+            "sheets_request", response.elapsed.total_seconds(),
+            method=response.request.method
+            )
+
+    session.hooks.setdefault("response", []).append(record)
@@ -0,0 +1,85 @@
+"""
+Local ranking engine for Lottorama.
+
+Counts how many times each main number (1 to 50) and each lucky
+number (1 to 12) appears in the 'euro' draw history, so the wins
+for a ticket can be looked up directly instead of being written to
+the 'user' workbook and read back from the 'user-ranking' formulas.
+"""
+
+MAIN_NUMBER_MAX = 50
+LUCKY_NUMBER_MAX = 12
+
+
+def parse_draws(rows):
+    """
+    Function to convert raw 'euro' worksheet rows into draws.
+
+    Rows that do not hold five main numbers and two lucky numbers,
+    such as a header row or an empty trailing row, are skipped.
+
+    Args:
+    rows (list): Rows as returned by get_all_values(), with the draw
+    date in column 0, main numbers in columns 1-5 and lucky numbers
+    in columns 6-7.
+
+    Returns:
+    list: A list of (draw_date, main_numbers, lucky_numbers) tuples
+    where the numbers are tuples of integers.
+    """
+    draws = []
+    for row in rows:
+        if len(row) < 8:
+            continue
+        try:
+            main_numbers = tuple(int(num) for num in row[1:6])
+            lucky_numbers = tuple(int(num) for num in row[6:8])
+        except ValueError:
+            continue
+        draws.append((row[0], main_numbers, lucky_numbers))
+    return draws
+
+
+def count_wins(draws):
+    """
+    Function to count the wins of every main and lucky number.
+
+    Args:
+    draws (list): Draws as returned by parse_draws().
+
+    Returns:
+    tuple: Two lists (main_counts, lucky_counts) indexed by the
+    number itself, so main_counts[7] is the number of wins of 7.
+    Index 0 is unused and always 0.
+    """
+    main_counts = [0] * (MAIN_NUMBER_MAX + 1)
+    lucky_counts = [0] * (LUCKY_NUMBER_MAX + 1)
+
+    for _, main_numbers, lucky_numbers in draws:
+        for num in main_numbers:
+            if 1 <= num <= MAIN_NUMBER_MAX:
+                main_counts[num] += 1
+        for num in lucky_numbers:
+            if 1 <= num <= LUCKY_NUMBER_MAX:
+                lucky_counts[num] += 1
+
+    return main_counts, lucky_counts
+
+
+def rank_ticket(main_counts, lucky_counts, lotto_data):
+    """
+    Function to look up the wins of each number on a ticket.
+
+    Args:
+    main_counts (list): Main number counts from count_wins().
+    lucky_counts (list): Lucky number counts from count_wins().
+    lotto_data (list): Five main numbers followed by two lucky
+    numbers, as returned by user_lotto_data().
+
+    Returns:
+    tuple: Two lists (main_ranks, lucky_ranks) holding the wins of
+    each main number and each lucky number in ticket order.
+    """
+    main_ranks = [main_counts[int(num)] for num in lotto_data[:5]]
+    lucky_ranks = [lucky_counts[int(num)] for num in lotto_data[5:7]]
+    return main_ranks, lucky_ranks
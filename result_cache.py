@@ -0,0 +1,234 @@
+"""
+Versioned cache of ticket analyses and predictions.
+
+Results are keyed by the kind of result, the canonical ticket (sorted
+numbers) and the version of the draw data they were computed from, so
+that a result is never served once a new draw has landed. The cache
+keeps the most recently used results in memory, up to a bounded number,
+and can share them with other processes through an optional SQLite
+file, such as the worker processes of the web service.
+
+Hits and misses are counted on the cache and in the process metrics.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+from metrics import increment
+
+DEFAULT_MAX_SIZE = int(os.environ.get("LOTTORAMA_RESULT_CACHE_SIZE", 1024))
+DEFAULT_SHARED_PATH = os.environ.get("LOTTORAMA_RESULT_CACHE_PATH")
+
+# Most results kept in the shared file
+DEFAULT_MAX_SHARED_SIZE = 100000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at);
+"""
+
+
+class ResultCache:
+    """
+    Bounded least recently used cache of results, with an optional
+    shared tier on disk.
+
+    Args:
+    max_size (int): Results kept in memory, 0 to keep none.
+    path (str): Optional SQLite file shared between processes.
+    max_shared_size (int): Results kept in the shared file.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, path=DEFAULT_SHARED_PATH,
+                 max_shared_size=DEFAULT_MAX_SHARED_SIZE):
+        self.max_size = max_size
+        self.path = path
+        self.max_shared_size = max_shared_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        if path:
+            with closing(self._connect()) as db, db:
+                db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @staticmethod
+    def make_key(kind, key):
+        """
+        Function to build the key of a result.
+
+        Args:
+        kind (str): The kind of result, such as 'analyse'.
+        key: JSON-serializable canonical input, such as the sorted
+        ticket.
+
+        Returns:
+        str: The cache key.
+        """
+        return json.dumps([kind, key], separators=(",", ":"))
+
+    @staticmethod
+    def kind_prefix(kind):
+        """
+        Function to get the start shared by the keys of one kind.
+
+        Args:
+        kind (str): The kind of result.
+
+        Returns:
+        str: The start of every key of that kind.
+        """
+        return f"[{json.dumps(kind)},"
+
+    def get(self, kind, version, key):
+        """
+        Function to look up a result.
+
+        Args:
+        kind (str): The kind of result.
+        version (str): The version of the draw data.
+        key: The canonical input.
+
+        Returns:
+        tuple: Whether the result was found, and a copy of it.
+        """
+        cache_key = self.make_key(kind, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                increment("result_cache_hits_total", kind=kind, tier="memory")
+                return True, copy.deepcopy(entry[1])
+
+        if self.path:
+            with closing(self._connect()) as db, db:
+                row = db.execute(
+                    "SELECT value FROM results WHERE key = ? AND version = ?",
+                    (cache_key, version)
+                    ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE results SET used_at = ? WHERE key = ?",
+                        (time.time(), cache_key)
+                        )
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(cache_key, version, value)
+                with self._lock:
+                    self.hits += 1
+                increment("result_cache_hits_total", kind=kind, tier="shared")
+                return True, copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        increment("result_cache_misses_total", kind=kind)
+        return False, None
+
+    def put(self, kind, version, key, value):
+        """
+        Function to store a result.
+
+        Results of the same kind but of another version are dropped
+        from the shared file as newer ones are stored. Other kinds may
+        be versioned differently, such as by the date of the last
+        draw, and are left alone.
+
+        Args:
+        kind (str): The kind of result.
+        version (str): The version of the draw data.
+        key: The canonical input.
+        value: The JSON-serializable result.
+        """
+        cache_key = self.make_key(kind, key)
+        self._remember(cache_key, version, copy.deepcopy(value))
+        if not self.path:
+            return
+
+        with closing(self._connect()) as db, db:
+            prefix = self.kind_prefix(kind)
+            db.execute(
+                "DELETE FROM results WHERE substr(key, 1, ?) = ? "
+                "AND version != ?", (len(prefix), prefix, version)
+                )
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (cache_key, version, json.dumps(value), time.time())
+                )
+            excess = db.execute(
+                "SELECT COUNT(*) FROM results"
+                ).fetchone()[0] - self.max_shared_size
+            if excess > 0:
+                db.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM "
+                    "results ORDER BY used_at LIMIT ?)", (excess,)
+                    )
+
+    def _remember(self, cache_key, version, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = (version, value)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, kind, version, key, compute):
+        """
+        Function to look up a result, computing and storing it on
+        a miss.
+
+        Args:
+        kind (str): The kind of result.
+        version (str): The version of the draw data.
+        key: The canonical input.
+        compute (callable): Returns the result, only called on a miss.
+
+        Returns:
+        The result.
+        """
+        found, value = self.get(kind, version, key)
+        if found:
+            return value
+        value = compute()
+        self.put(kind, version, key, value)
+        return value
+
+    def stats(self):
+        """
+        Function to get the counters of the cache.
+
+        Returns:
+        dict: The 'hits', 'misses' and results held in memory ('size').
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def clear(self):
+        """
+        Function to drop every result, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            with closing(self._connect()) as db, db:
+                db.execute("DELETE FROM results")
@@ -1,140 +1,128 @@
 # Import required libraries
-import gspread
-from google.oauth2.service_account import Credentials
+import atexit
+import os
 import time
-import random
+from datetime import datetime, timezone
 from tabulate import tabulate
 import colorama
 from colorama import Fore, Back, Style
+from validation import validate_data, lucky_number_errors, pool_errors
+from draw_matrix import LUCKY_TIERS, popularity_tiers
+from backends import get_backend
+from draw_cache import DrawCache
+from service import LottoramaService
+from client import HttpService
+from metrics import log_periodically, span
+from result_cache import ResultCache
+from write_behind import WriteBehindQueue
 colorama.init(autoreset=True)
 
-# Define the required Google Sheets API scope permissions
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file",
-    "https://www.googleapis.com/auth/drive"
-]
+# Data backend chosen by LOTTORAMA_BACKEND, Google Sheets by default
+BACKEND = get_backend()
 
 """
-Load the credentials from the service account JSON
-file 'creds.json'and specify the scope
+Rank the user numbers locally from the 'euro' draw history, or set
+LOTTORAMA_RANKING_MODE=sheet to use the legacy round trip through
+the 'user' and 'user-ranking' worksheets of the data backend
 """
-CREDS = Credentials.from_service_account_file('creds.json', scopes=SCOPE)
+RANKING_MODE = os.environ.get(
+    "LOTTORAMA_RANKING_MODE", "local"
+    ) if BACKEND.available() else "local"
 
-# Create a new credentials object with the specified scope
-SCOPED_CREDS = CREDS.with_scopes(SCOPE)
-
-# Authorise the gspread client with the scoped credentials
-GSPREAD_CLIENT = gspread.authorize(SCOPED_CREDS)
-
-# Open the Google Sheets document named 'lottorama-data'
-SHEET = GSPREAD_CLIENT.open('lottorama-data')
+# Candidate tickets scored for each prediction, and worker processes
+SIMULATION_CANDIDATES = int(
+    os.environ.get("LOTTORAMA_SIMULATION_CANDIDATES", 200000)
+    )
+SIMULATION_WORKERS = int(os.environ.get("LOTTORAMA_SIMULATION_WORKERS", 0))
 
+"""
+Classify the numbers by their counts over the last LOTTORAMA_TIER_WINDOW
+draws, or with counts halving every LOTTORAMA_TIER_HALF_LIFE draws,
+instead of over the whole draw history
+"""
+TIER_WINDOW = {
+    name: os.environ[variable] for name, variable in (
+        ("last", "LOTTORAMA_TIER_WINDOW"),
+        ("half_life", "LOTTORAMA_TIER_HALF_LIFE"),
+        ) if os.environ.get(variable)
+    }
 
-def validate_data(values):
-    """
-    Function to validate user-entered data for
-    Euro Millions ticket numbers of user.
+# Local copy of the 'euro' draw history, synced incrementally when stale
+DRAW_CACHE = DrawCache()
 
-    Args:
-    values (str or list): The user-entered numbers
-    as a comma-separated string or list.
+# Rankings and predictions already computed for the latest draw
+RESULT_CACHE = ResultCache()
 
-    Returns:
-    bool: True if the data is valid, False otherwise.
-    """
-
-    errors_five_nums = []
+"""
+History of the tickets played, appended to the 'tickets' workbook in
+the background and written out when the game exits
+"""
+TICKET_LOG = None
+if BACKEND.available():
+    TICKET_LOG = WriteBehindQueue(BACKEND.append_tickets)
+    atexit.register(TICKET_LOG.close)
 
-    # If the input is a list, convert it to a comma-separated string
-    if isinstance(values, list):
-        values = ','.join(map(str, values))
+"""
+Answer from a shared Lottorama service when LOTTORAMA_API_URL is set,
+otherwise from a service running inside the game process
+"""
+API_URL = os.environ.get("LOTTORAMA_API_URL")
+if API_URL:
+    SERVICE = HttpService(API_URL)
+else:
+    SERVICE = LottoramaService(
+        DRAW_CACHE, backend=BACKEND,
+        candidates=SIMULATION_CANDIDATES, workers=SIMULATION_WORKERS,
+        results=RESULT_CACHE
+        )
 
-    # Check if there are spaces between values and commas
-    if any(' ' in value for value in values.split(',')):
-        errors_five_nums.append(
-            Fore.RED + Style.BRIGHT +
-            "Error: Spaces not allowed between values and commas."
-            )
 
+def refresh_draws():
     """
-    Convert each value to an integer and check if they are within
-    the range of 1 to 50
+    Function to make sure the service answers from the latest draws,
+    fetching only the new rows of the 'euro' workbook when the local
+    cache is stale.
     """
-    int_values = []
-    for value in values.split(','):
-        try:
-            int_value = int(value)
-            int_values.append(int_value)
-        except ValueError as ve:
-            errors_five_nums.append(
-                f"{Fore.RED}{Style.BRIGHT}Error: {ve}"
-                )
-
-    # Check if exactly 5 values are provided
-    if len(int_values) != 5:
-        errors_five_nums.append(
-            Fore.RED + Style.BRIGHT + "Error: Exactly 5 values required."
-            )
+    try:
+        with span("game.refresh_draws"):
+            SERVICE.reload()
+    except Exception as e:
         print(
-            Fore.RED + Style.BRIGHT +
-            "Error: Exactly 5 whole numbers required! \n"
-            )
-        return False
-
-    for value in int_values:
-        if not 1 <= value <= 50:
-            errors_five_nums.append(
-                Fore.RED + Style.BRIGHT +
-                "Error: Values should be between 1 and 50."
-                )
-
-    # Check if the numbers are unique
-    if len(set(int_values)) != 5:
-        errors_five_nums.append(
-            Fore.RED + Style.BRIGHT +
-            "Error: The 5 numbers should be unique."
+            Fore.RED +
+            "Could not refresh the 'euro' workbook, using cached draws:"
             )
-
-    if errors_five_nums:
-        """
-        Print the errors, if any, and return False
-        indicating data is not valid
-        """
-        for num in errors_five_nums:
-            print(num)
-        print("\n" + Fore.YELLOW + "* Please try again!")
-        return False
-
-    # Return True if the data is valid
-    return True
+        print(e)
 
 
-def user_lotto_data():
+def user_lotto_data(last_draw=None):
     """
     Function to get lotto figures input from the user.
     Runs a while loop until correct data is entered.
 
+    Args:
+    last_draw (dict): Optional most recent draw, as returned by
+    the service, fetched from it when not provided.
+
     Returns:
     list: A list of user-entered Euro Millions ticket numbers
     and lucky numbers.
     """
     # Print the last draw date and winning numbers only once at the start
-    euro = SHEET.worksheet("euro").get_all_values()
-    last_draw = euro[-1]
-    print(f"{Fore.YELLOW}{Style.BRIGHT}Last draw date: {last_draw[0]}")
+    if last_draw is None:
+        last_draw = SERVICE.last_draw()
+    print(f"{Fore.YELLOW}{Style.BRIGHT}Last draw date: {last_draw['date']}")
 
     winning_numbers_str = ""
-    for number in last_draw[1:6]:
-        winning_numbers_str += number + ' '
+    for number in last_draw["numbers"]:
+        winning_numbers_str += str(number) + ' '
     print(
         f"{Fore.YELLOW}{Style.BRIGHT}{Back.CYAN}Winning numbers: " +
         f"{winning_numbers_str}"
         )
 
     winning_lucky_numbers_str = ""
-    for number in last_draw[6:8]:
-        winning_lucky_numbers_str += number + ' '
+    for number in last_draw["lucky"]:
+        winning_lucky_numbers_str += str(number) + ' '
     print(
         f"{Fore.YELLOW}{Style.BRIGHT}{Back.CYAN}Lucky numbers: " +
         f"{winning_lucky_numbers_str}"
@@ -157,7 +145,11 @@ def user_lotto_data():
         "analysis of your " +
         "\nticket in a table follwed by a brief summary and options to " +
         "either quit, " +
-        "\nrepeat or modify."
+        "\nrepeat, modify or wheel."
+        "\nShould you decide to wheel, the app will ask for 8 to 20 " +
+        "numbers and give " +
+        "\nyou the fewest tickets it finds holding every pair or " +
+        "triple of them."
         "\nShould you decide to modify, the app will ask you to " +
         "enter two numbers to " +
         "\nkeep from your ticket and it will predict the remaining " +
@@ -192,49 +184,16 @@ def user_lotto_data():
             Fore.YELLOW + Style.BRIGHT
             )
 
-        # Check if the input contains spaces
-        if " " in lucky_numbers_str:
-            print(
-                Fore.RED + Style.BRIGHT +
-                "Error: Spaces are not allowed. " +
-                "Please re-enter lucky numbers without spaces."
-                )
+        # Validate the user-entered data for lucky numbers
+        errors_lucky_nums = lucky_number_errors(lucky_numbers_str)
+        if errors_lucky_nums:
+            for error in errors_lucky_nums:
+                print(Fore.RED + Style.BRIGHT + error)
             continue
 
-        # Remove spaces from the input string
-        lucky_numbers_str = lucky_numbers_str.replace(" ", "")
-
-        # Split the input by commas
-        lucky_numbers = lucky_numbers_str.split(",")
-
-        # Validate the user-entered data for lucky numbers
-        try:
-            lucky_numbers = [int(num) for num in lucky_numbers]
-            if all(
-                1 <= num <= 12 for num in lucky_numbers
-                    ) and len(lucky_numbers) == 2:
-                # Check if lucky_numbers are unique
-                if len(set(lucky_numbers)) == 2:
-                    print(Back.GREEN + Fore.WHITE + "Lucky numbers accepted!")
-                    break
-                else:
-                    print(
-                        Fore.RED + Style.BRIGHT +
-                        "Error: Lucky numbers should " +
-                        "be two unique integers between 1 and 12."
-                        )
-            else:
-                print(
-                    Fore.RED + Style.BRIGHT +
-                    "Error: Lucky numbers should be two integers " +
-                    "between 1 and 12."
-                    )
-        except ValueError:
-            print(
-                Fore.RED + Style.BRIGHT +
-                "Error: Please enter only two " +
-                "integers for lucky numbers."
-                )
+        lucky_numbers = [int(num) for num in lucky_numbers_str.split(",")]
+        print(Back.GREEN + Fore.WHITE + "Lucky numbers accepted!")
+        break
 
     """
     Combine lotto_data_five_nums and lucky_numbers into a single list
@@ -248,6 +207,27 @@ def user_lotto_data():
     return lotto_data
 
 
+def record_ticket(lotto_data):
+    """
+    Function to queue a ticket for the 'tickets' workbook, with the
+    time it was played. The ticket is written in the background, the
+    game does not wait for Google Sheets.
+
+    Args:
+    lotto_data (list): A list of user-entered Euro Millions ticket
+    numbers and lucky numbers.
+    """
+    if TICKET_LOG is None:
+        return
+    played_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if not TICKET_LOG.submit([played_at] + lotto_data[:7]):
+        print(
+            Fore.RED +
+            "The ticket could not be recorded, too many are waiting " +
+            "to be written."
+            )
+
+
 def push_to_user_workbook(lotto_data):
     """
     Function to push user-entered Euro Millions ticket
@@ -256,21 +236,23 @@ def push_to_user_workbook(lotto_data):
     Args:
     lotto_data_five_nums (list): A list of user-entered
     Euro Millions ticket numbers.
+
+    Returns:
+    WriteReport: The number of API calls the write cost,
+    or None if the write failed or the backend is not available.
     """
+    if not BACKEND.available():
+        return None
 
     try:
-        # Access the 'user' worksheet
-        user_workbook = SHEET.worksheet("user")
-
         # Slice the lotto_data list to get the data for cells B1 to H1
         data_for_cells_B1_to_H1 = lotto_data[:7]
 
         # Insert data to B1 to F1 cells preceded by the string 'Numbers:' at A1
         data_for_cells_B1_to_H1.insert(0, "Numbers:")
 
-        # Update the individual cells within the range B1:H1 with the new data
-        for col_index, value in enumerate(data_for_cells_B1_to_H1, start=1):
-            user_workbook.update_cell(1, col_index, value)
+        # Update the whole range A1:H1 of the 'user' workbook in one call
+        return BACKEND.write_ticket(data_for_cells_B1_to_H1)
 
     except Exception as e:
         print(
@@ -280,6 +262,175 @@ def push_to_user_workbook(lotto_data):
         print(e)
 
 
+def fetch_user_ranking(lotto_data):
+    """
+    Function to rank the user numbers with the legacy round trip
+    through the 'user-ranking' workbook formulas, or from the result
+    cache when the same ticket was already ranked since the last draw.
+
+    Args:
+    lotto_data (list): A list of user-entered Euro Millions ticket
+    numbers and lucky numbers.
+
+    Returns:
+    list: The rows of the 'user-ranking' workbook.
+    """
+    return RESULT_CACHE.get_or_compute(
+        "user-ranking", SERVICE.last_draw()["date"], lotto_data[:7],
+        lambda: sheet_round_trip(lotto_data)
+        )
+
+
+def sheet_round_trip(lotto_data):
+    """
+    Function to write the user numbers to the 'user' workbook and
+    read their rankings back from the 'user-ranking' workbook.
+
+    Args:
+    lotto_data (list): A list of user-entered Euro Millions ticket
+    numbers and lucky numbers.
+
+    Returns:
+    list: The rows of the 'user-ranking' workbook.
+    """
+    # Push the data to the 'user' workbook
+    push_to_user_workbook(lotto_data)
+
+    # Delay execution by 5 seconds to allow workbook updates
+    if BACKEND.name != "local":
+        print(
+            Fore.YELLOW + Style.BRIGHT +
+            "\nGathering data! Please wait 5 seconds..."
+            )
+        with span("game.wait"):
+            time.sleep(5)
+
+    return BACKEND.read_rankings("user-ranking")
+
+
+def rank_user_numbers(lotto_data):
+    """
+    Function to rank the user numbers with the service, from
+    the 'euro' draw history.
+
+    Args:
+    lotto_data (list): A list of user-entered Euro Millions ticket
+    numbers and lucky numbers.
+
+    Returns:
+    list: Rows in the same layout as the 'user-ranking' workbook.
+    """
+    with span("game.rank"):
+        analysis = SERVICE.analyse(lotto_data[:5], lotto_data[5:7])
+    numbers_row = ["Numbers:"] + [
+        str(num) for num in analysis["numbers"] + analysis["lucky"]
+        ]
+    rankings_row = ["Wins:"] + [
+        str(wins) for wins in analysis["wins"] + analysis["lucky_wins"]
+        ]
+    return [numbers_row, rankings_row]
+
+
+def predict_numbers(preferred_numbers, high_ranks, moderate_ranks):
+    """
+    Function to predict a full ticket from the two numbers
+    the user keeps.
+
+    Args:
+    preferred_numbers (list): The two numbers to keep.
+    high_ranks (list): Numbers of the popular tier.
+    moderate_ranks (list): Numbers of the moderately popular tier.
+
+    Returns:
+    tuple: The five predicted numbers and the two predicted lucky
+    numbers, each in ascending order.
+    """
+    with span("game.predict"):
+        prediction = SERVICE.predict(
+            [int(num) for num in preferred_numbers],
+            high_ranks=high_ranks, moderate_ranks=moderate_ranks
+            )
+    ticket = prediction["tickets"][0]
+    return ticket["numbers"], ticket["lucky"]
+
+
+def complete_numbers(preferred_numbers):
+    """
+    Function to complete the two numbers the user keeps with the
+    numbers most often drawn together with them.
+
+    Args:
+    preferred_numbers (list): The two numbers to keep.
+
+    Returns:
+    list: The five numbers of the completed ticket in ascending order.
+    """
+    with span("game.complete"):
+        completion = SERVICE.complete(
+            [int(num) for num in preferred_numbers]
+            )
+    return completion["completions"][0]["numbers"]
+
+
+def wheel_numbers(lucky_numbers):
+    """
+    Function to wheel a pool of numbers chosen by the user into
+    tickets covering every pair or triple of the pool, and print them.
+
+    Args:
+    lucky_numbers (list): The two lucky numbers of every ticket.
+    """
+    while True:
+        pool_input = input(
+            Fore.GREEN + Style.BRIGHT +
+            "\nEnter 8 to 20 numbers to play, separated by commas:\n " +
+            Fore.YELLOW + Style.BRIGHT
+            )
+        pool = pool_input.split(",")
+        errors = pool_errors(pool)
+        if not errors:
+            break
+        for error in errors:
+            print(Fore.RED + Style.BRIGHT + error)
+
+    while True:
+        guarantee_input = input(
+            Fore.GREEN + Style.BRIGHT +
+            "Enter 2 to cover every pair of your numbers " +
+            "or 3 to cover every triple:\n " +
+            Fore.YELLOW + Style.BRIGHT
+            )
+        if guarantee_input.strip() in ("2", "3"):
+            break
+        print(Fore.RED + Style.BRIGHT + "Error: Enter 2 or 3.")
+
+    with span("game.wheel"):
+        wheel = SERVICE.wheel(
+            [int(num) for num in pool], lucky_numbers,
+            guarantee=int(guarantee_input)
+            )
+
+    headers = [
+        Fore.YELLOW + Style.BRIGHT + "Ticket",
+        Fore.YELLOW + Style.BRIGHT + "Numbers",
+        Fore.YELLOW + Style.BRIGHT + "Lucky Numbers"
+        ]
+    data = [
+        [index, ticket["numbers"], ticket["lucky"]]
+        for index, ticket in enumerate(wheel["tickets"], start=1)
+        ]
+    print(
+        Fore.CYAN + Style.BRIGHT +
+        f"\nThese {len(data)} tickets hold every " +
+        ("pair" if wheel["guarantee"] == 2 else "triple") +
+        " of your numbers:"
+        )
+    print(
+        Fore.YELLOW + Style.BRIGHT +
+        tabulate(data, headers=headers, tablefmt="pretty")
+        )
+
+
 def play_lottorama_game():
     while True:
         # Main program execution starts here
@@ -298,20 +449,15 @@ def play_lottorama_game():
 
         while True:
             # Get user-entered Euro Millions ticket numbers
+            refresh_draws()
             lotto_data = user_lotto_data()
-
-            # Push the data to the 'user' workbook if it is valid
-            push_to_user_workbook(lotto_data)
-
-            # Delay execution by 5 seconds to allow workbook updates
-            print(
-                Fore.YELLOW + Style.BRIGHT +
-                "\nGathering data! Please wait 5 seconds..."
-                )
-            time.sleep(5)
+            record_ticket(lotto_data)
 
             # Get user numbers lotto_data_five_nums and lucky_numbers
-            user_ranking = SHEET.worksheet("user-ranking").get_all_values()
+            if RANKING_MODE == "sheet":
+                user_ranking = fetch_user_ranking(lotto_data)
+            else:
+                user_ranking = rank_user_numbers(lotto_data)
 
             # split into three sublist before creating a table
             numbers_row = user_ranking[0]
@@ -356,33 +502,22 @@ def play_lottorama_game():
             table = tabulate(data, headers=headers, tablefmt="pretty")
             print(Fore.YELLOW + Style.BRIGHT + table)
 
-            # Convert lists to integers and transpose the results
+            # Convert lists to integers
             num_list = [int(num) for num in num_list]
             rank_list = [int(rank) for rank in rank_list]
-            transpose_nums = list(zip(num_list, rank_list))
 
             lucky_list = [int(num) for num in numbers_row[6:8]]
             rank_lucky = [int(rank) for rank in rankings_row[6:8]]
-            transpose_lucky = list(zip(lucky_list, rank_lucky))
 
             """
-            Filter out the pairs by index 1 and store
-            the corresponding index 0 numbers
+            Sort the numbers into tiers by their wins:
+            5 or more is popular, 4 is moderate and 3 or less is least
             """
-            popular_numbers = []
-            moderately_popular_numbers = []
-            least_popular_numbers = []
-
-            try:
-                for pair in transpose_nums:
-                    if pair[1] >= 5:
-                        popular_numbers.append(pair[0])
-                    elif pair[1] == 4:
-                        moderately_popular_numbers.append(pair[0])
-                    elif pair[1] <= 3:
-                        least_popular_numbers.append(pair[0])
-            except IndexError:
-                pass
+            (
+                popular_numbers,
+                moderately_popular_numbers,
+                least_popular_numbers
+            ) = popularity_tiers(num_list, rank_list)
 
             # Count the length of these lists
             count_popular = len(popular_numbers)
@@ -405,24 +540,14 @@ def play_lottorama_game():
                 cp_numbers = "numbers"
 
             """
-            Count the numbers that are greater than or equal to 5
-            Count the numbers that are equal to 4
-            Count the numbers that are less than or equal to 3
+            Sort the lucky numbers into tiers by their wins:
+            7 or more is popular, 6 is moderate and 5 or less is least
             """
-            popular_lucky_nums = []
-            moderately_popular_lucky_nums = []
-            least_popular_lucky_nums = []
-
-            try:
-                for pair in transpose_lucky:
-                    if pair[1] >= 7:
-                        popular_lucky_nums.append(pair[0])
-                    elif pair[1] == 6:
-                        moderately_popular_lucky_nums.append(pair[0])
-                    elif pair[1] <= 5:
-                        least_popular_lucky_nums.append(pair[0])
-            except IndexError:
-                pass
+            (
+                popular_lucky_nums,
+                moderately_popular_lucky_nums,
+                least_popular_lucky_nums
+            ) = popularity_tiers(lucky_list, rank_lucky, LUCKY_TIERS)
 
             count_popular_lucky = len(popular_lucky_nums)
             count_moderately_popular_lucky = len(moderately_popular_lucky_nums)
@@ -503,8 +628,8 @@ def play_lottorama_game():
             while True:
                 user_input = input(
                     Fore.CYAN + Style.BRIGHT +
-                    "Enter 'Q' to quit, 'M' to modify or 'R' to start " +
-                    "allover!\n" +
+                    "Enter 'Q' to quit, 'M' to modify, 'W' to wheel " +
+                    "a pool of numbers or 'R' to start allover!\n" +
                     Fore.YELLOW + Style.BRIGHT
                     )
                 # Validate user input for quit, modify, or repeat
@@ -569,38 +694,27 @@ def play_lottorama_game():
                                 )
 
                             # get the 50 lotto numbers and their rankings
-                            num_ranks = SHEET.worksheet(
-                                "num-ranks"
-                                ).get_all_values()
-                            all_nums = num_ranks[0]
-                            all_num_stats = num_ranks[1]
-
-                            """
-                            Convert lists to integers and
-                            transpose the results
-                            """
-                            all_nums = [int(num) for num in all_nums]
-                            all_num_stats = [
-                                int(rank) for rank in all_num_stats
-                                ]
-                            transpose_all_nums = list(
-                                zip(all_nums, all_num_stats)
-                                )
-
-                            high_ranks = []
-                            moderate_ranks = []
-                            least_ranks = []
-
-                            try:
-                                for pair in transpose_all_nums:
-                                    if pair[1] >= 5:
-                                        high_ranks.append(pair[0])
-                                    elif pair[1] == 4:
-                                        moderate_ranks.append(pair[0])
-                                    elif pair[1] <= 3:
-                                        least_ranks.append(pair[0])
-                            except IndexError:
-                                pass
+                            if RANKING_MODE == "sheet":
+                                with span("game.num_ranks"):
+                                    num_ranks = DRAW_CACHE.worksheet_values(
+                                        "num-ranks",
+                                        lambda: BACKEND.read_rankings(
+                                            "num-ranks"
+                                            )
+                                        )
+                                all_nums = [int(num) for num in num_ranks[0]]
+                                all_num_stats = [
+                                    int(rank) for rank in num_ranks[1]
+                                    ]
+                                (
+                                    high_ranks,
+                                    moderate_ranks,
+                                    least_ranks
+                                ) = popularity_tiers(all_nums, all_num_stats)
+                            else:
+                                tiers = SERVICE.tiers(**TIER_WINDOW)
+                                high_ranks = tiers["popular"]
+                                moderate_ranks = tiers["moderate"]
 
                             print(
                                 Fore.CYAN + Style.BRIGHT +
@@ -610,60 +724,17 @@ def play_lottorama_game():
                                 "Wishing you the best of luck!"
                                 )
 
-                            # Convert preferred_numbers to a set
-                            preferred_numbers_set = set(
-                                int(num) for num in preferred_numbers
-                                )
-
-                            """
-                            Pick 2 random numbers from high ranking and
-                            1 random number from moderate ranking listed
-                            imported from Google sheets
-                            """
-                            available_numbers_high_ranks = [
-                                num for num in high_ranks if num not in
-                                preferred_numbers_set
-                                ]
-                            random_numbers_high_ranks = random.sample(
-                                available_numbers_high_ranks, 2
-                                )
-
-                            available_numbers_moderate_ranks = [
-                                num for num in moderate_ranks if num not in
-                                preferred_numbers_set and num not in
-                                random_numbers_high_ranks
-                                ]
-
-                            """
-                            Ensure that random_number_moderate_ranks is None
-                            if available_numbers_moderate_ranks is empty
-                            """
-                            random_number_moderate_ranks = random.choice(
-                                available_numbers_moderate_ranks
-                                ) if available_numbers_moderate_ranks else None
-
-                            """
-                            Combine all five numbers into a list named
-                            initial_predicted_numbers
-                            """
-                            initial_predicted_numbers = (
-                                preferred_numbers + random_numbers_high_ranks
-                                )
-                            if random_number_moderate_ranks is not None:
-                                initial_predicted_numbers.append(
-                                    random_number_moderate_ranks
-                                    )
-
                             """
-                            Convert all elements to integers
-                            using list comprehension
+                            Score candidate tickets made of the two kept
+                            numbers, 2 numbers from high ranking and
+                            1 number from moderate ranking against all
+                            previous draws and keep the best one
                             """
-                            predicted_numbers = [
-                                int(num) for num in initial_predicted_numbers
-                                ]
-                            # Sort predicted numbers
-                            sorted_predicted_numbers = sorted(
-                                predicted_numbers
+                            (
+                                sorted_predicted_numbers,
+                                predicted_lucky_numbers
+                            ) = predict_numbers(
+                                preferred_numbers, high_ranks, moderate_ranks
                                 )
                             print(
                                 "\n" +
@@ -674,9 +745,22 @@ def play_lottorama_game():
                                 )
                             print(
                                 "\n" +
-                                Fore.BLUE + Style.BRIGHT +
-                                "This version of the App does not provide " +
-                                "predictions for lucky numbers."
+                                Fore.GREEN + Style.BRIGHT +
+                                "Your Predicted lucky numbers are: " +
+                                f"{Fore.YELLOW}{Style.BRIGHT}" +
+                                f"{predicted_lucky_numbers}"
+                                )
+
+                            """
+                            Complete the two kept numbers with the three
+                            numbers most often drawn together with them
+                            """
+                            print(
+                                "\n" +
+                                Fore.GREEN + Style.BRIGHT +
+                                "Numbers most often drawn with yours: " +
+                                f"{Fore.YELLOW}{Style.BRIGHT}" +
+                                f"{complete_numbers(preferred_numbers)}"
                                 )
 
                             while True:
@@ -727,6 +811,8 @@ def play_lottorama_game():
                                 )
                     break
 
+                elif user_input_lower == 'w':
+                    wheel_numbers(lotto_data[5:7])
                 elif user_input_lower == 'r':
                     print(
                         Fore.BLUE + Style.BRIGHT +
@@ -741,4 +827,6 @@ def play_lottorama_game():
 
 
 if __name__ == "__main__":
+    # Log the metrics when LOTTORAMA_METRICS_INTERVAL is set
+    log_periodically()
     play_lottorama_game()
@@ -0,0 +1,323 @@
+"""
+Asynchronous HTTP/JSON service for Lottorama.
+
+A single asyncio process serves every connection from one shared
+LottoramaService, so the draw data is loaded once and requests never
+wait on Google Sheets. Ticket analysis is answered inline, predictions
+run in a thread pool so that they do not block other connections, and
+the draws are reloaded in the background when the cache goes stale.
+
+Endpoints:
+    GET  /draws/last  The most recent draw.
+    GET  /tiers       The popularity tiers of all 50 numbers, optionally
+                      over a window: ?last=100, ?since=2024-01-31 or
+                      ?half_life=50.
+    POST /analyse     {"numbers": [5 numbers], "lucky": [2 numbers]}
+    POST /predict     {"kept": [2 numbers], "top_n": 1, "seed": null},
+                      optionally with the "high_ranks" and
+                      "moderate_ranks" tiers to predict from.
+    POST /complete    {"kept": [2 numbers], "top_n": 1}
+    POST /wheel       {"pool": [8 to 20 numbers], "lucky": [2 numbers],
+                      "guarantee": 2}
+    GET  /health      Liveness check.
+    GET  /metrics     Request and backend metrics, Prometheus text format.
+
+Usage:
+    python3 server.py --port 8080
+"""
+import argparse
+import asyncio
+import json
+import os
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+
+from backends import get_backend
+from metrics import METRICS
+from service import LottoramaService, ServiceError
+
+# Largest request body accepted, tickets are tiny
+MAX_BODY_SIZE = 64 * 1024
+
+# Most tickets a single prediction request can ask for
+MAX_TOP_N = 100
+
+
+class HttpError(Exception):
+    """
+    Raised to answer a request with an HTTP error status.
+    """
+
+    def __init__(self, status, errors):
+        super().__init__(status)
+        self.status = status
+        self.errors = errors
+
+
+def json_body(body):
+    """
+    Function to decode the JSON object of a request body.
+
+    Args:
+    body (bytes): The request body.
+
+    Returns:
+    dict: The decoded object.
+
+    Raises:
+    HttpError: If the body is not a JSON object.
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, ["Error: Invalid JSON."])
+    if not isinstance(payload, dict):
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST, ["Error: Expected a JSON object."]
+            )
+    return payload
+
+
+class LottoramaServer:
+    """
+    Routes HTTP requests to a shared LottoramaService.
+
+    Args:
+    service (LottoramaService): The service answering the requests.
+    reload_interval (float): Seconds between background reloads of
+    the draws, or None to never reload.
+    """
+
+    def __init__(self, service, reload_interval=None):
+        self.service = service
+        self.reload_interval = reload_interval
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/draws/last"): self.last_draw,
+            ("GET", "/tiers"): self.tiers,
+            ("POST", "/analyse"): self.analyse,
+            ("POST", "/predict"): self.predict,
+            ("POST", "/complete"): self.complete,
+            ("POST", "/wheel"): self.wheel,
+        }
+
+    async def health(self, body, query):
+        return {"status": "ok"}
+
+    async def metrics(self, body, query):
+        return METRICS.render_prometheus()
+
+    async def last_draw(self, body, query):
+        try:
+            return self.service.last_draw()
+        except LookupError as e:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, [str(e)])
+
+    async def tiers(self, body, query):
+        return self.service.tiers(
+            last=query.get("last"), since=query.get("since"),
+            half_life=query.get("half_life")
+            )
+
+    async def analyse(self, body, query):
+        payload = json_body(body)
+        return self.service.analyse(
+            payload.get("numbers"), payload.get("lucky")
+            )
+
+    async def predict(self, body, query):
+        payload = json_body(body)
+        top_n = min(max(int(payload.get("top_n", 1)), 1), MAX_TOP_N)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.service.predict(
+                payload.get("kept"), top_n=top_n, seed=payload.get("seed"),
+                high_ranks=payload.get("high_ranks"),
+                moderate_ranks=payload.get("moderate_ranks")
+                )
+            )
+
+    async def complete(self, body, query):
+        payload = json_body(body)
+        top_n = min(max(int(payload.get("top_n", 1)), 1), MAX_TOP_N)
+        return self.service.complete(payload.get("kept"), top_n=top_n)
+
+    async def wheel(self, body, query):
+        payload = json_body(body)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: self.service.wheel(
+                payload.get("pool"), payload.get("lucky"),
+                guarantee=payload.get("guarantee", 2)
+                )
+            )
+
+    async def dispatch(self, method, path, body, query=None):
+        """
+        Function to answer one request.
+
+        Args:
+        method (str): The HTTP method.
+        path (str): The request path, without any query string.
+        body (bytes): The request body.
+        query (dict): The parameters of the query string.
+
+        Returns:
+        tuple: The HTTP status and the JSON-serializable response, or
+        the response text for the metrics.
+        """
+        handler = self.routes.get((method, path))
+        route = path if handler is not None else "unmatched"
+        with METRICS.span("http.request", route=route):
+            status, response = await self._dispatch(
+                handler, method, path, body, query or {}
+                )
+        METRICS.increment("http_responses_total", status=status.value)
+        return status, response
+
+    async def _dispatch(self, handler, method, path, body, query):
+        try:
+            if handler is None:
+                if any(route_path == path for _, route_path in self.routes):
+                    raise HttpError(
+                        HTTPStatus.METHOD_NOT_ALLOWED,
+                        [f"Error: {method} is not allowed on {path}."]
+                        )
+                raise HttpError(
+                    HTTPStatus.NOT_FOUND, [f"Error: {path} not found."]
+                    )
+            return HTTPStatus.OK, await handler(body, query)
+        except HttpError as e:
+            return e.status, {"errors": e.errors}
+        except ServiceError as e:
+            return HTTPStatus.BAD_REQUEST, {"errors": e.errors}
+        except (TypeError, ValueError) as e:
+            return HTTPStatus.BAD_REQUEST, {"errors": [f"Error: {e}"]}
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"errors": [str(e)]}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Function to serve the requests of one connection, keeping it
+        open between requests unless the client asks to close it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = (
+                        request_line.decode("latin-1").split()
+                        )
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY_SIZE:
+                    status, response = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                        "errors": ["Error: Request body too large."]
+                        }
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    path, _, query = target.partition("?")
+                    status, response = await self.dispatch(
+                        method.upper(), path, body, dict(parse_qsl(query))
+                        )
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = (
+                        connection != "close" if version == "HTTP/1.1"
+                        else connection == "keep-alive"
+                        )
+
+                if isinstance(response, str):
+                    payload = response.encode()
+                    content_type = "text/plain; version=0.0.4"
+                else:
+                    payload = json.dumps(response).encode()
+                    content_type = "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"
+                    "\r\n\r\n".encode("latin-1") + payload
+                    )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def reload_forever(self):
+        """
+        Function to reload the draws at every reload interval.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await loop.run_in_executor(None, self.service.reload)
+            except Exception as e:
+                print(f"Could not reload the draws: {e}")
+
+    async def serve(self, host, port):
+        """
+        Function to serve requests until the process is stopped.
+
+        Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+        """
+        server = await asyncio.start_server(
+            self.handle_connection, host, port, backlog=1024
+            )
+        if self.reload_interval:
+            reloader = asyncio.create_task(self.reload_forever())
+        print(f"Lottorama service listening on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.reload_interval:
+                reloader.cancel()
+
+
+def main(argv=None):
+    """
+    Function to start the service from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Run the Lottorama API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument(
+        "--port", type=int, default=int(os.environ.get("PORT", 8080))
+        )
+    parser.add_argument(
+        "--reload-interval", type=float, default=300.0,
+        help="seconds between checks for new draws"
+        )
+    args = parser.parse_args(argv)
+
+    service = LottoramaService(backend=get_backend())
+    service.reload()
+    server = LottoramaServer(service, reload_interval=args.reload_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+"""
+Ticket analysis and prediction service for Lottorama.
+
+One LottoramaService holds a single in-memory copy of the draw data,
+loaded from the local draw cache, with everything derived from it: the
+draw matrix, the number counts, the popularity tiers and the tables
+used to score predictions. The web service and the terminal game both
+answer from it. A reload swaps the whole copy at once, so requests
+being answered at the time keep a consistent view. When draws were
+appended, the number and pair statistics, the count tables, the
+windows and the completions are updated with the new draws only.
+
+With a snapshot path configured, the draw data is mapped from the
+snapshot built from the same draws instead of being rebuilt, and a
+service that rebuilds it writes the snapshot for the other processes,
+see snapshot.py. A sync that finds no new draw changes nothing.
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from batch import analyse_ticket
+from draw_cache import DrawCache
+from draw_matrix import all_number_tiers, draw_matrix, subset_counts
+from itemsets import FrequentItemsets
+from lucky_tables import LuckyTables
+from match_index import MatchIndex, prize_summary
+from metrics import increment
+from result_cache import ResultCache
+from ranking import parse_draws
+from simulation import add_draws, simulate
+from snapshot import DEFAULT_SNAPSHOT_PATH, load_data, save_data
+from stats_store import StatsStore
+from ticket_index import TicketIndex
+from validation import lucky_number_errors, pool_errors
+from wheel import GUARANTEES, wheel
+from windows import FrequencyWindows
+
+DrawData = namedtuple(
+    "DrawData",
+    ["version", "last_row", "matrix", "main_counts", "lucky_counts",
+     "draws_since", "tiers", "tables", "index", "matches", "windows",
+     "lucky", "itemsets"]
+    )
+
+
+class ServiceError(ValueError):
+    """
+    Raised when a request to the service is invalid, with the
+    messages to report back.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def parse_kept(kept):
+    """
+    Function to validate the two main numbers a user keeps.
+
+    Args:
+    kept (list): The numbers to keep.
+
+    Returns:
+    list: The numbers as integers.
+
+    Raises:
+    ServiceError: If they are not two unique numbers from 1 to 50.
+    """
+    try:
+        kept = [int(num) for num in kept]
+    except (TypeError, ValueError):
+        raise ServiceError(["Error: Numbers to keep must be integers."])
+    if len(kept) != 2 or len(set(kept)) != 2 or not all(
+            1 <= num <= 50 for num in kept):
+        raise ServiceError([
+            "Error: Enter two unique numbers between 1 and 50 to keep."
+            ])
+    return kept
+
+
+def parse_tier(tier, name):
+    """
+    Function to validate a popularity tier given instead of the one
+    of the cached draws.
+
+    Args:
+    tier (list): The main numbers of the tier.
+    name (str): The name of the tier, for the error message.
+
+    Returns:
+    list: The numbers as integers, sorted.
+
+    Raises:
+    ServiceError: If they are not unique numbers from 1 to 50.
+    """
+    try:
+        tier = sorted(int(num) for num in tier)
+    except (TypeError, ValueError):
+        raise ServiceError([f"Error: The {name} tier must be numbers."])
+    if len(set(tier)) != len(tier) or not all(
+            1 <= num <= 50 for num in tier):
+        raise ServiceError([
+            f"Error: The {name} tier must be unique numbers between 1 "
+            "and 50."
+            ])
+    return tier
+
+
+class LottoramaService:
+    """
+    In-process ticket analysis and prediction.
+
+    Args:
+    cache (DrawCache): The local draw cache to read draws from.
+    backend: Optional data backend, see backends.py, used to sync
+    the cache when it is stale.
+    candidates (int): Candidate tickets scored for each prediction.
+    workers (int): Worker processes used to score them.
+    results (ResultCache): Cache of analyses and predictions, a new
+    one configured from the environment by default.
+    stats (StatsStore): Incremental number statistics, checkpointed
+    next to the draw cache by default.
+    snapshot (str): Optional memory-mapped snapshot of the draw data,
+    LOTTORAMA_SNAPSHOT_PATH by default.
+    """
+
+    def __init__(self, cache=None, backend=None, candidates=200000,
+                 workers=1, results=None, stats=None,
+                 snapshot=DEFAULT_SNAPSHOT_PATH):
+        self.cache = cache or DrawCache()
+        self.backend = backend
+        self.candidates = candidates
+        self.workers = workers
+        self.results = ResultCache() if results is None else results
+        self.stats = stats or StatsStore(f"{self.cache.path}.stats.npz")
+        self.snapshot = snapshot
+        self._data = None
+        self._state = None
+        # Requests reloading at once build new draws only once
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """
+        Function to sync the draw cache when it is stale and load the
+        draws into memory when they changed. A sync that finds no new
+        draw keeps the draw data in place.
+
+        The draws already cached are loaded even if the sync fails,
+        the error is then raised once they are in place. Nothing is
+        synced when the backend is not available, such as Google Sheets
+        while running offline.
+        """
+        try:
+            if self.backend is not None and self.backend.available():
+                self.cache.refresh(self.backend)
+        finally:
+            with self._lock:
+                if self._data is None or self.cache.state() != self._state:
+                    self._open()
+
+    def _open(self):
+        state = self.cache.state()
+        data = None
+        if self.snapshot:
+            data = load_data(self.snapshot, state)
+        if data is None:
+            # Draws appended since the last load are only added
+            data = self._extend(self._data) or self._load(
+                self.cache.matrix()
+                )
+            if self.snapshot:
+                try:
+                    save_data(self.snapshot, data, state)
+                except OSError:
+                    increment("snapshot_errors_total")
+        self._data, self._state = data, state
+
+    def _checkpoint(self):
+        if self.stats.path:
+            try:
+                self.stats.save()
+            except OSError:
+                increment("stats_checkpoint_errors_total")
+
+    def _load(self, matrix):
+        rows = self.cache.rows()
+        if len(rows) != len(matrix):
+            # The cache was synced meanwhile
+            matrix = draw_matrix(parse_draws(rows))
+
+        # Only the draws cached since the last checkpoint are counted
+        added = self.stats.catch_up(self.cache)
+        if self.stats.draws != len(rows) or (
+                rows and self.stats.last_date != rows[-1][0]):
+            self.stats.reset()
+            added = self.stats.add_draws(parse_draws(rows))
+        if added:
+            self._checkpoint()
+
+        # The number and pair counts come from the statistics
+        tables = {
+            0: len(matrix),
+            1: self.stats.main_counts[1:].copy(),
+            2: self.stats.pair_table(),
+            }
+        tables.update({k: subset_counts(matrix, k) for k in range(3, 6)})
+        return self._draw_data(
+            matrix, rows[-1] if rows else None, tables,
+            FrequencyWindows(matrix, [row[0] for row in rows]),
+            FrequentItemsets(tables)
+            )
+
+    def _extend(self, data):
+        """
+        Function to add the draws cached since the draw data was
+        loaded to it, updating the statistics, the count tables, the
+        windows and the completions with the new draws only.
+
+        Args:
+        data (DrawData): The draw data served so far, or None.
+
+        Returns:
+        DrawData: The draw data of the cached draws, or None if they do
+        not start with the draws of the data.
+        """
+        if data is None or data.last_row is None:
+            return None
+        count = len(data.matrix)
+        matrix = self.cache.matrix()
+        rows = self.cache.rows(offset=count)
+        if (not rows or len(matrix) != count + len(rows)
+                or not np.array_equal(matrix[:count], data.matrix)):
+            return None
+
+        self.stats.catch_up(self.cache)
+        if (self.stats.draws != len(matrix)
+                or self.stats.last_date != rows[-1][0]):
+            return None
+        self._checkpoint()
+
+        added = matrix[count:]
+        tables = {0: data.tables[0]}
+        tables.update({k: np.array(data.tables[k]) for k in range(1, 6)})
+        add_draws(tables, added)
+        return self._draw_data(
+            matrix, rows[-1], tables,
+            data.windows.extended(matrix, [row[0] for row in rows]),
+            data.itemsets.with_draws(tables, added)
+            )
+
+    def _draw_data(self, matrix, last_row, tables, windows, itemsets):
+        main_counts = self.stats.main_counts.copy()
+        lucky_counts = self.stats.lucky_counts.copy()
+        tiers = all_number_tiers(main_counts)
+        return DrawData(
+            # Results are cached per version, a new draw changes it
+            version=f"{len(matrix)}:{last_row[0] if last_row else ''}",
+            last_row=last_row,
+            matrix=matrix,
+            main_counts=main_counts,
+            lucky_counts=lucky_counts,
+            draws_since=self.stats.draws_since(),
+            tiers=tiers,
+            tables=tables,
+            index=TicketIndex(matrix, tables),
+            matches=MatchIndex(matrix),
+            windows=windows,
+            lucky=LuckyTables(matrix, tiers[0], tiers[1]),
+            itemsets=itemsets,
+            )
+
+    @property
+    def data(self):
+        """
+        The draw data currently served, loaded on first use.
+        """
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._open()
+        return self._data
+
+    def last_draw(self):
+        """
+        Function to get the most recent draw.
+
+        Returns:
+        dict: The draw 'date', its five main 'numbers' in draw order
+        and its two 'lucky' numbers.
+
+        Raises:
+        LookupError: If no draws are cached.
+        """
+        row = self.data.last_row
+        if row is None:
+            raise LookupError("No draws are available yet.")
+        return {
+            "date": row[0],
+            "numbers": [int(num) for num in row[1:6]],
+            "lucky": [int(num) for num in row[6:8]],
+        }
+
+    def analyse(self, numbers, lucky):
+        """
+        Function to rank the numbers of a ticket.
+
+        Args:
+        numbers (list): The five main numbers.
+        lucky (list): The two lucky numbers.
+
+        Returns:
+        dict: The result of batch.analyse_ticket(), with the draws
+        since each main and lucky number last appeared
+        ('draws_since' and 'lucky_draws_since'), the
+        'best_match' of the main numbers in any past draw and
+        whether the whole ticket ever won the 'jackpot', and the
+        past draws in which it would have won each prize tier as
+        returned by match_index.prize_summary().
+
+        Raises:
+        ServiceError: If the ticket is not valid.
+        """
+        data = self.data
+        result = analyse_ticket(
+            numbers, lucky, data.main_counts, data.lucky_counts
+            )
+        if not result["valid"]:
+            raise ServiceError(result["errors"])
+
+        ticket = result["numbers"] + result["lucky"]
+        main_since, lucky_since = data.draws_since
+        result["draws_since"] = [
+            int(main_since[num]) for num in result["numbers"]
+            ]
+        result["lucky_draws_since"] = [
+            int(lucky_since[num]) for num in result["lucky"]
+            ]
+        result.update(self.results.get_or_compute(
+            "analyse", data.version, ticket,
+            lambda: {
+                "best_match": int(data.index.best_match([ticket])[0]),
+                "jackpot": bool(data.index.has_won([ticket])[0]),
+                "prizes": prize_summary(
+                    data.matches.prize_counts([ticket])[0]
+                    ),
+            }
+            ))
+        return result
+
+    def tiers(self, last=None, since=None, half_life=None):
+        """
+        Function to get the popularity tiers of all 50 main numbers,
+        over the whole draw history or over a window of it.
+
+        The tiers of a window use the same thresholds as the whole
+        history, applied to the counts of the window. Decayed counts
+        are rounded to the nearest whole number first.
+
+        Args:
+        last (int): Optional number of most recent draws to count.
+        since (str): Optional first date to count, such as
+        '2024-01-31'.
+        half_life (float): Optional half-life, in draws, of
+        exponentially decaying counts.
+
+        Returns:
+        dict: The 'popular', 'moderate' and 'least' popular numbers.
+
+        Raises:
+        ServiceError: If more than one window is given or the window
+        is not valid.
+        """
+        data = self.data
+        windows = [
+            window for window in (last, since, half_life) if window is not None
+            ]
+        if len(windows) > 1:
+            raise ServiceError([
+                "Error: Give at most one of last, since and half_life."
+                ])
+        try:
+            if last is not None:
+                counts = data.windows.last(int(last))[0]
+            elif since is not None:
+                counts = data.windows.since(since)[0]
+            elif half_life is not None:
+                counts = np.rint(data.windows.decayed(float(half_life))[0])
+            else:
+                counts = None
+        except ValueError as e:
+            raise ServiceError([f"Error: {e}"])
+
+        if counts is None:
+            popular, moderate, least = data.tiers
+        else:
+            popular, moderate, least = all_number_tiers(counts)
+        return {"popular": popular, "moderate": moderate, "least": least}
+
+    def predict(self, kept, top_n=1, seed=None, high_ranks=None,
+                moderate_ranks=None):
+        """
+        Function to predict full tickets from the numbers a user keeps.
+
+        Args:
+        kept (list): The two main numbers to keep.
+        top_n (int): The number of tickets to return.
+        seed (int): Optional seed for reproducible predictions.
+        high_ranks (list): Optional popular tier to use instead of
+        the one of the cached draws.
+        moderate_ranks (list): Optional moderate tier, likewise.
+
+        Returns:
+        dict: The best 'tickets', each with its 'numbers', the
+        predicted 'lucky' numbers and its 'score'.
+
+        Raises:
+        ServiceError: If the kept numbers or the tiers are not valid.
+        """
+        kept = parse_kept(kept)
+        data = self.data
+        high, moderate, _ = data.tiers
+        high = sorted(int(num) for num in high)
+        moderate = sorted(int(num) for num in moderate)
+        if high_ranks is not None:
+            high = parse_tier(high_ranks, "popular")
+        if moderate_ranks is not None:
+            moderate = parse_tier(moderate_ranks, "moderate")
+
+        def score(tables):
+            return simulate(
+                data.matrix, kept, high, moderate,
+                candidates=self.candidates, top_n=top_n, seed=seed,
+                workers=self.workers, tables=tables
+                )
+
+        def predict():
+            try:
+                try:
+                    best = score(data.tables)
+                except BrokenProcessPool:
+                    # The workers could not map a snapshot replaced by
+                    # another process meanwhile, send them the tables
+                    best = score(dict(data.tables))
+            except ValueError as e:
+                raise ServiceError([f"Error: {e}"])
+            # The tables of the cached tiers are built with the draws,
+            # other tiers need their own
+            lucky = data.lucky
+            if (high, moderate) != (list(data.tiers[0]),
+                                    list(data.tiers[1])):
+                lucky = LuckyTables(data.matrix, high, moderate)
+            return {
+                "tickets": [
+                    {
+                        "numbers": numbers,
+                        "lucky": lucky.predict(numbers)[0],
+                        "score": score,
+                    }
+                    for numbers, score in best
+                    ],
+            }
+
+        # Predictions without a seed are cached too, the same kept
+        # numbers get the same best tickets until the next draw
+        return self.results.get_or_compute(
+            "predict", data.version,
+            [sorted(kept), top_n, seed, high, moderate, self.candidates],
+            predict
+            )
+
+    def complete(self, kept, top_n=1):
+        """
+        Function to complete the numbers a user keeps with the numbers
+        most often drawn together with them.
+
+        Args:
+        kept (list): The two main numbers to keep.
+        top_n (int): The number of completions to return.
+
+        Returns:
+        dict: The best 'completions', each with its 'numbers', the
+        'extra' numbers added to the kept ones, the 'draws' in which
+        each extra number came with both kept ones and its 'score'.
+
+        Raises:
+        ServiceError: If the kept numbers are not valid.
+        """
+        kept = parse_kept(kept)
+        itemsets = self.data.itemsets
+        return {
+            "completions": [
+                {
+                    "numbers": sorted(kept + extra),
+                    "extra": extra,
+                    "draws": [
+                        itemsets.support(kept + [num]) for num in extra
+                        ],
+                    "score": score,
+                }
+                for extra, score in itemsets.complete(kept, top_n)
+                ],
+        }
+
+    def wheel(self, pool, lucky, guarantee=2):
+        """
+        Function to wheel a pool of main numbers into tickets.
+
+        Args:
+        pool (list): 8 to 20 unique main numbers.
+        lucky (list): The two lucky numbers of every ticket.
+        guarantee (int): 2 to cover every pair of the pool, 3 for
+        every triple.
+
+        Returns:
+        dict: The sorted 'pool', the 'guarantee' and the 'tickets',
+        each with its 'numbers' and 'lucky' numbers.
+
+        Raises:
+        ServiceError: If the pool, the lucky numbers or the guarantee
+        are not valid.
+        """
+        if not isinstance(pool, list) or not isinstance(lucky, list):
+            raise ServiceError(["Error: Unreadable pool."])
+        errors = pool_errors(pool) + lucky_number_errors(lucky)
+        if guarantee not in GUARANTEES:
+            errors.append("Error: The guarantee should be 2 or 3.")
+        if errors:
+            raise ServiceError(errors)
+
+        lucky = sorted(int(num) for num in lucky)
+        return {
+            "pool": sorted(int(num) for num in pool),
+            "guarantee": guarantee,
+            "tickets": [
+                {"numbers": numbers, "lucky": lucky}
+                for numbers in wheel(pool, guarantee)
+                ],
+        }
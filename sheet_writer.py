@@ -0,0 +1,161 @@
+"""
+Batched writes to the 'lottorama-data' Google Sheets document.
+
+Each write sends a whole row, or the rows of many users, in a single
+ranged or batch update instead of one update_cell() call per cell.
+Requests rejected by the Sheets API quota are retried with an
+exponential backoff, and every write reports how many API calls it
+cost so that quota usage can be followed.
+"""
+import random
+import time
+from collections import namedtuple
+
+from gspread.exceptions import APIError
+from gspread.utils import rowcol_to_a1
+
+# HTTP status codes returned by the Sheets API when a quota is exceeded
+QUOTA_STATUS_CODES = (429,)
+
+# Other transient server errors that are also worth retrying
+RETRY_STATUS_CODES = QUOTA_STATUS_CODES + (500, 503)
+
+WriteReport = namedtuple("WriteReport", ["rows", "api_calls", "retries"])
+
+
+def is_retryable(error):
+    """
+    Function to check if an API error is worth retrying.
+
+    Args:
+    error (APIError): The error raised by gspread.
+
+    Returns:
+    bool: True if the error is a quota or transient server error.
+    """
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in RETRY_STATUS_CODES
+
+
+def call_with_retry(
+        request, max_attempts=5, base_delay=1.0, max_delay=32.0,
+        sleep=time.sleep):
+    """
+    Function to call the Sheets API and retry quota errors
+    with an exponential backoff.
+
+    Args:
+    request (callable): Function making exactly one API call.
+    max_attempts (int): Number of attempts before giving up.
+    base_delay (float): Delay in seconds before the first retry.
+    max_delay (float): Upper bound of the delay between retries.
+    sleep (callable): Function used to wait between retries.
+
+    Returns:
+    tuple: The result of the request and the number of API calls made.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return request(), attempt + 1
+        except APIError as e:
+            if not is_retryable(e) or attempt == max_attempts - 1:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            sleep(delay + random.uniform(0, base_delay))
+
+
+def row_range(row_number, row_length, title=None):
+    """
+    Function to get the A1 notation of a row starting at column A.
+
+    Args:
+    row_number (int): The 1-based row number.
+    row_length (int): The number of cells in the row.
+    title (str): Optional worksheet title to prefix the range with.
+
+    Returns:
+    str: The A1 range, for example 'A1:H1' or "'user'!A1:H1".
+    """
+    cells = (
+        rowcol_to_a1(row_number, 1) + ":" +
+        rowcol_to_a1(row_number, max(row_length, 1))
+        )
+    if title is None:
+        return cells
+    return f"'{title}'!{cells}"
+
+
+def write_row(worksheet, row, row_number=1, **retry_options):
+    """
+    Function to write a whole row to a worksheet in one API call.
+
+    Args:
+    worksheet (Worksheet): The gspread worksheet to write to.
+    row (list): The values of the row, starting at column A.
+    row_number (int): The 1-based row number to write.
+
+    Returns:
+    WriteReport: The number of rows written, API calls and retries.
+    """
+    _, api_calls = call_with_retry(
+        lambda: worksheet.update(
+            row_range(row_number, len(row)), [row],
+            value_input_option="USER_ENTERED"
+            ),
+        **retry_options
+        )
+    return WriteReport(1, api_calls, api_calls - 1)
+
+
+def write_rows(spreadsheet, updates, **retry_options):
+    """
+    Function to write the rows of many users, possibly to several
+    worksheets, in one batch update.
+
+    Args:
+    spreadsheet (Spreadsheet): The gspread spreadsheet to write to.
+    updates (list): (worksheet_title, row_number, row) tuples.
+
+    Returns:
+    WriteReport: The number of rows written, API calls and retries.
+    """
+    if not updates:
+        return WriteReport(0, 0, 0)
+
+    body = {
+        "valueInputOption": "USER_ENTERED",
+        "data": [
+            {
+                "range": row_range(row_number, len(row), title),
+                "values": [row],
+            }
+            for title, row_number, row in updates
+        ],
+    }
+    _, api_calls = call_with_retry(
+        lambda: spreadsheet.values_batch_update(body=body),
+        **retry_options
+        )
+    return WriteReport(len(updates), api_calls, api_calls - 1)
+
+
+def append_rows(worksheet, rows, **retry_options):
+    """
+    Function to append many rows after the last row of a worksheet
+    in one API call.
+
+    Args:
+    worksheet (Worksheet): The gspread worksheet to append to.
+    rows (list): The rows, each starting at column A.
+
+    Returns:
+    WriteReport: The number of rows written, API calls and retries.
+    """
+    if not rows:
+        return WriteReport(0, 0, 0)
+
+    _, api_calls = call_with_retry(
+        lambda: worksheet.append_rows(rows, value_input_option="RAW"),
+        **retry_options
+        )
+    return WriteReport(len(rows), api_calls, api_calls - 1)
@@ -0,0 +1,131 @@
+"""
+Lazy connection to the 'lottorama-data' Google Sheets document.
+
+Nothing is loaded or authorized when this module is imported. The
+credentials are read, the gspread client authorized and the spreadsheet
+opened on the first call that needs them, and the spreadsheet and
+worksheet handles are then kept for the life of the process, so each
+of them costs its network round trip only once.
+
+Setting LOTTORAMA_OFFLINE=1 disables the connection altogether, the
+app then runs from the local draw cache only. Setting
+LOTTORAMA_SHEETS_URL sends every request to that server instead of
+Google, such as a local fake_sheets.py, without any credentials.
+"""
+import os
+import threading
+
+from metrics import instrument_session
+
+# Define the required Google Sheets API scope permissions
+SCOPE = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file",
+    "https://www.googleapis.com/auth/drive"
+]
+
+CREDS_FILE = os.environ.get("LOTTORAMA_CREDS_FILE", "creds.json")
+SPREADSHEET_NAME = "lottorama-data"
+OFFLINE = os.environ.get("LOTTORAMA_OFFLINE", "").lower() in (
+    "1", "true", "yes"
+    )
+SHEETS_URL = os.environ.get("LOTTORAMA_SHEETS_URL")
+
+_lock = threading.RLock()
+_client = None
+_spreadsheets = {}
+_worksheets = {}
+
+
+class OfflineError(RuntimeError):
+    """
+    Raised when Google Sheets is needed while running offline.
+    """
+
+
+def get_client():
+    """
+    Function to get the authorized gspread client, created on
+    first use.
+
+    Returns:
+    Client: The gspread client.
+
+    Raises:
+    OfflineError: If the app runs offline.
+    """
+    global _client
+    if OFFLINE:
+        raise OfflineError("Google Sheets is not available offline.")
+    with _lock:
+        if _client is None:
+            import gspread
+
+            if SHEETS_URL:
+                # A local stand-in needs no credentials
+                from fake_sheets import RedirectSession
+
+                _client = gspread.Client(
+                    None, session=RedirectSession(SHEETS_URL)
+                    )
+            else:
+                from google.oauth2.service_account import Credentials
+
+                """
+                Load the credentials from the service account JSON
+                file 'creds.json' and specify the scope
+                """
+                creds = Credentials.from_service_account_file(
+                    CREDS_FILE, scopes=SCOPE
+                    )
+                _client = gspread.authorize(creds.with_scopes(SCOPE))
+            instrument_session(_client.session)
+        return _client
+
+
+def get_spreadsheet(name=SPREADSHEET_NAME):
+    """
+    Function to get a spreadsheet by name, opened on first use.
+
+    Args:
+    name (str): The name of the Google Sheets document.
+
+    Returns:
+    Spreadsheet: The gspread spreadsheet.
+    """
+    with _lock:
+        if name not in _spreadsheets:
+            _spreadsheets[name] = get_client().open(name)
+        return _spreadsheets[name]
+
+
+def get_worksheet(title, spreadsheet_name=SPREADSHEET_NAME):
+    """
+    Function to get a worksheet by title, looked up on first use.
+
+    Args:
+    title (str): The title of the worksheet, such as 'euro'.
+    spreadsheet_name (str): The name of the Google Sheets document.
+
+    Returns:
+    Worksheet: The gspread worksheet.
+    """
+    key = (spreadsheet_name, title)
+    with _lock:
+        if key not in _worksheets:
+            _worksheets[key] = get_spreadsheet(spreadsheet_name).worksheet(
+                title
+                )
+        return _worksheets[key]
+
+
+def reset():
+    """
+    Function to forget the client and every cached handle, so the
+    next call connects again.
+    """
+    global _client
+    with _lock:
+        _client = None
+        _spreadsheets.clear()
+        _worksheets.clear()
@@ -0,0 +1,343 @@
+"""
+Monte Carlo prediction engine for the 'modify' flow.
+
+Candidate tickets are generated under the same tier rules as the game:
+the numbers the user keeps, two numbers from the popular tier and one
+from the moderately popular tier. Every candidate is scored against the
+whole draw history and the best distinct tickets are returned.
+
+Scoring does not loop over the draws. For a ticket, the sum over all
+draws of (matches choose k) equals the sum of the co-occurrence counts
+of its k-number subsets, so the exact number of draws it matched on 0
+to 5 main numbers follows from the subset count tables by binomial
+inversion. The cost of a ticket is 31 table lookups, whatever the
+length of the history.
+
+Work is split into fixed-size chunks, each with its own random
+generator spawned from the seed, and spread over a process pool.
+The results for a given seed are the same for any number of workers.
+The pool is started on first use and kept for the later predictions
+until the tables or the number of workers change, so a prediction does
+not pay for starting processes and sending them the tables.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from draw_matrix import colex_rank, subset_counts
+
+# Score of a past draw by the number of main numbers matched, 0 to 5:
+# each extra match is worth ten times more than the one before
+PRIZE_WEIGHTS = np.array([0, 0, 1, 10, 100, 1000], dtype=np.int64)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# SUBSET_COLUMNS[k] holds the column indices of every k-subset of 5
+SUBSET_COLUMNS = {
+    k: np.array(list(combinations(range(5), k)), dtype=np.intp)
+    for k in range(1, 6)
+}
+
+# INVERSION[j, k] turns subset sums S_k into exact match counts E_j
+INVERSION = np.array(
+    [[(-1) ** (k - j) * comb(k, j) if k >= j else 0 for k in range(6)]
+     for j in range(6)],
+    dtype=np.int64
+    )
+
+# Count tables shared by the tasks of a worker process, only ever set
+# in the processes of the pool
+_worker_tables = None
+
+# Process pool kept between predictions, with its workers and tables
+_pool = None
+_pool_workers = None
+_pool_tables = None
+_pool_lock = threading.Lock()
+
+
+def build_tables(matrix):
+    """
+    Function to build the subset count tables used for scoring.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+
+    Returns:
+    dict: The number of draws under key 0 and, for k from 1 to 5,
+    the counts of every k-subset of main numbers by colex rank.
+    """
+    tables = {0: len(matrix)}
+    for k in range(1, 6):
+        tables[k] = subset_counts(matrix, k)
+    return tables
+
+
+def add_draws(tables, matrix):
+    """
+    Function to count more draws in subset count tables, in place.
+
+    Args:
+    tables (dict): Tables as from build_tables().
+    matrix (ndarray): The draws to add, main numbers sorted.
+    """
+    tables[0] += len(matrix)
+    for k in range(1, 6):
+        np.add.at(
+            tables[k], colex_rank(matrix[:, :5][:, SUBSET_COLUMNS[k]]), 1
+            )
+
+
+def match_distribution(tickets, tables):
+    """
+    Function to count the past draws each ticket matched on
+    0, 1, 2, 3, 4 and 5 main numbers.
+
+    Args:
+    tickets (ndarray): (n x 5) tickets, numbers sorted ascending.
+    tables (dict): Tables from build_tables().
+
+    Returns:
+    ndarray: (n x 6) int64 counts of draws by number of matches.
+    """
+    tickets = np.asarray(tickets)
+    sums = np.empty((len(tickets), 6), dtype=np.int64)
+    sums[:, 0] = tables[0]
+    for k in range(1, 6):
+        ranks = colex_rank(tickets[:, SUBSET_COLUMNS[k]])
+        sums[:, k] = tables[k][ranks].sum(axis=1)
+    return sums @ INVERSION.T
+
+
+def score_tickets(tickets, tables):
+    """
+    Function to score tickets against the draw history.
+
+    Args:
+    tickets (ndarray): (n x 5) tickets, numbers sorted ascending.
+    tables (dict): Tables from build_tables().
+
+    Returns:
+    ndarray: The int64 score of every ticket, see PRIZE_WEIGHTS.
+    """
+    return match_distribution(tickets, tables) @ PRIZE_WEIGHTS
+
+
+def tier_pools(kept, high_ranks, moderate_ranks):
+    """
+    Function to work out which numbers can fill a ticket.
+
+    The numbers kept by the user are removed from both tiers. When no
+    moderately popular number is left, the last number is taken from
+    the popular tier instead.
+
+    Args:
+    kept (list): The numbers the user keeps.
+    high_ranks (list): Numbers of the popular tier.
+    moderate_ranks (list): Numbers of the moderately popular tier.
+
+    Returns:
+    tuple: The arrays of available popular and moderate numbers and
+    how many of each a ticket takes.
+
+    Raises:
+    ValueError: If the tiers do not hold enough numbers.
+    """
+    kept = set(int(num) for num in kept)
+    high = set(int(num) for num in high_ranks) - kept
+    moderate = set(int(num) for num in moderate_ranks) - kept - high
+    high = np.array(sorted(high), dtype=np.uint8)
+    moderate = np.array(sorted(moderate), dtype=np.uint8)
+
+    missing = 5 - len(kept)
+    take_moderate = 1 if len(moderate) and missing else 0
+    take_high = missing - take_moderate
+    if take_high > len(high):
+        raise ValueError(
+            f"Only {len(high)} popular numbers available, {take_high} needed."
+            )
+    return high, moderate, take_high, take_moderate
+
+
+def generate_candidates(rng, kept, high, moderate, take_high, take_moderate,
+                        size):
+    """
+    Function to draw random candidate tickets under the tier rules.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    kept (list): The numbers the user keeps.
+    high (ndarray): Available popular numbers.
+    moderate (ndarray): Available moderate numbers.
+    take_high (int): Popular numbers per ticket.
+    take_moderate (int): Moderate numbers per ticket, 0 or 1.
+    size (int): The number of candidates.
+
+    Returns:
+    ndarray: (size x 5) uint8 tickets with numbers sorted ascending.
+    """
+    columns = [np.tile(np.array(kept, dtype=np.uint8), (size, 1))]
+    if take_high:
+        """
+        Draw distinct indices one column at a time: the k-th pick is
+        a position among the numbers not taken yet, shifted past the
+        earlier picks in ascending order
+        """
+        picks = np.empty((size, take_high), dtype=np.intp)
+        for k in range(take_high):
+            pick = rng.integers(0, len(high) - k, size)
+            for taken in np.sort(picks[:, :k], axis=1).T:
+                pick += pick >= taken
+            picks[:, k] = pick
+        columns.append(high[picks])
+    if take_moderate:
+        columns.append(
+            moderate[rng.integers(0, len(moderate), size)][:, np.newaxis]
+            )
+    tickets = np.concatenate(columns, axis=1)
+    tickets.sort(axis=1)
+    return tickets
+
+
+def top_tickets(tickets, scores, top_n):
+    """
+    Function to keep the best distinct tickets.
+
+    Args:
+    tickets (ndarray): (n x 5) tickets.
+    scores (ndarray): The score of every ticket.
+    top_n (int): The number of tickets to keep.
+
+    Returns:
+    tuple: The best tickets and their scores, best first.
+    """
+    _, first = np.unique(colex_rank(tickets), return_index=True)
+    tickets, scores = tickets[first], scores[first]
+    if len(scores) > top_n:
+        best = np.argpartition(-scores, top_n - 1)[:top_n]
+        tickets, scores = tickets[best], scores[best]
+    order = np.lexsort((colex_rank(tickets), -scores))
+    return tickets[order], scores[order]
+
+
+def _init_worker(tables):
+    global _worker_tables
+    _worker_tables = tables
+
+
+def get_pool(workers, tables):
+    """
+    Function to get the process pool scoring with given tables,
+    starting it on first use or when the tables changed.
+
+    Args:
+    workers (int): The number of worker processes.
+    tables (dict): Tables from build_tables().
+
+    Returns:
+    ProcessPoolExecutor: The pool.
+    """
+    global _pool, _pool_workers, _pool_tables
+    with _pool_lock:
+        if (_pool is None or _pool_workers != workers
+                or _pool_tables is not tables):
+            if _pool is not None:
+                # Tasks already submitted still complete
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker,
+                initargs=(tables,)
+                )
+            _pool_workers, _pool_tables = workers, tables
+        return _pool
+
+
+def drop_pool(pool):
+    """
+    Function to forget a broken process pool, the next prediction
+    starts a new one.
+
+    Args:
+    pool (ProcessPoolExecutor): The pool that broke.
+    """
+    global _pool, _pool_tables
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_tables = None, None
+    pool.shutdown(wait=False)
+
+
+def _simulate_chunk(task, tables):
+    seed, size, pools, top_n = task
+    rng = np.random.default_rng(seed)
+    tickets = generate_candidates(rng, *pools, size)
+    scores = score_tickets(tickets, tables)
+    return top_tickets(tickets, scores, top_n)
+
+
+def _worker_chunk(task):
+    return _simulate_chunk(task, _worker_tables)
+
+
+def simulate(matrix, kept, high_ranks, moderate_ranks, candidates=1000000,
+             top_n=10, seed=None, workers=None,
+             chunk_size=DEFAULT_CHUNK_SIZE, tables=None):
+    """
+    Function to generate and score candidate tickets and return
+    the best ones.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    kept (list): The numbers the user keeps.
+    high_ranks (list): Numbers of the popular tier.
+    moderate_ranks (list): Numbers of the moderately popular tier.
+    candidates (int): The number of random candidates to score.
+    top_n (int): The number of tickets to return.
+    seed (int): Seed of the random generators, random if None.
+    workers (int): Worker processes, all cores if None and the work
+    runs in this process if 1.
+    chunk_size (int): Candidates per task.
+    tables (dict): Prebuilt tables from build_tables(), optional.
+
+    Returns:
+    list: Up to top_n (ticket, score) tuples, best first, where the
+    ticket is a list of five sorted numbers.
+    """
+    if tables is None:
+        tables = build_tables(matrix)
+    kept = sorted(int(num) for num in kept)
+    pools = (kept,) + tier_pools(kept, high_ranks, moderate_ranks)
+
+    sizes = [chunk_size] * (candidates // chunk_size)
+    if candidates % chunk_size:
+        sizes.append(candidates % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, size, pools, top_n) for s, size in zip(seeds, sizes)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) == 1:
+        # Threads of the service may score with other tables at once
+        results = [_simulate_chunk(task, tables) for task in tasks]
+    else:
+        pool = get_pool(workers, tables)
+        try:
+            results = list(pool.map(_worker_chunk, tasks))
+        except BrokenProcessPool:
+            drop_pool(pool)
+            raise
+
+    if not results:
+        return []
+    tickets, scores = top_tickets(
+        np.concatenate([tickets for tickets, _ in results]),
+        np.concatenate([scores for _, scores in results]),
+        top_n
+        )
+    return [
+        (ticket.tolist(), int(score)) for ticket, score in zip(tickets, scores)
+        ]
@@ -0,0 +1,377 @@
+"""
+Memory-mapped snapshot of the draw data served by LottoramaService.
+
+Everything derived from the draw history is written to one file: the
+draw matrix, the number counts, the subset count tables, the draw
+bitsets of every number, the ticket index, the window prefix sums, the
+lucky number tables and the mined completions. The file starts with a
+JSON header, holding the format, the state of the draws in the draw
+cache the data was built from and the offset, type and shape of every
+array. Each array is aligned on a page boundary.
+
+Opening a snapshot maps the file read-only and wraps each array around
+the mapping without copying it, so a process starts serving without
+parsing or counting anything. Every process mapping the same file
+shares its pages in the page cache. Worker processes of the prediction
+pool receive the path of the snapshot instead of a copy of the tables.
+
+A snapshot is built with:
+    python3 snapshot.py -o lottorama.snapshot
+
+and used by the game and the web service when LOTTORAMA_SNAPSHOT_PATH
+points to it. A snapshot built from other draws than those of the draw
+cache is ignored. A service that rebuilds its data after a sync added
+draws replaces the snapshot, atomically, for the other processes.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Path of the snapshot, none unless configured
+DEFAULT_SNAPSHOT_PATH = os.environ.get("LOTTORAMA_SNAPSHOT_PATH")
+
+# First bytes of every snapshot file
+MAGIC = b"LOTTOSNP"
+
+# Version of the layout of the snapshot file
+SNAPSHOT_FORMAT = 1
+
+# Alignment of every array in the file
+ALIGNMENT = mmap.PAGESIZE
+
+# Magic, format and header length
+PREFIX = struct.Struct("<8sII")
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path, arrays, meta):
+    """
+    Function to write arrays to a snapshot file, replacing it
+    atomically.
+
+    Args:
+    path (str): The snapshot file.
+    arrays (dict): NumPy arrays by name.
+    meta (dict): JSON-serializable values stored in the header.
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, list(array.shape), offset]
+        offset = align(offset + array.nbytes)
+    header = json.dumps({
+        "meta": meta, "arrays": layout
+        }).encode()
+    start = align(PREFIX.size + len(header))
+
+    # Each process writes its own file, a mapped snapshot is never
+    # truncated or rewritten, only replaced
+    handle, temp = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", suffix=".tmp"
+        )
+    try:
+        with os.fdopen(handle, "wb") as target:
+            target.write(PREFIX.pack(MAGIC, SNAPSHOT_FORMAT, len(header)))
+            target.write(header)
+            for name, array in arrays.items():
+                target.seek(start + layout[name][2])
+                target.write(np.ascontiguousarray(array).data)
+            target.truncate(start + offset)
+            target.flush()
+            os.fsync(target.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+
+class Snapshot:
+    """
+    Read-only mapping of a snapshot file.
+
+    Args:
+    path (str): The snapshot file.
+
+    Raises:
+    ValueError: If the file is not a complete snapshot in a known
+    format.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as source:
+            self._map = mmap.mmap(
+                source.fileno(), 0, access=mmap.ACCESS_READ
+                )
+        try:
+            magic, version, length = PREFIX.unpack_from(self._map)
+            if magic != MAGIC or version != SNAPSHOT_FORMAT:
+                raise ValueError(f"Unknown snapshot format: {path}")
+            header = json.loads(
+                self._map[PREFIX.size:PREFIX.size + length]
+                )
+            self.meta = header["meta"]
+            self._layout = header["arrays"]
+            self._start = align(PREFIX.size + length)
+            state = self.meta["state"]
+            # A file cut short would fail on its first read instead
+            end = max((
+                self._start + offset + np.dtype(dtype).itemsize * int(
+                    np.prod(shape)
+                    )
+                for dtype, shape, offset in self._layout.values()
+                ), default=0)
+        except (struct.error, KeyError, TypeError, ValueError) as e:
+            self._map.close()
+            raise ValueError(f"Not a valid snapshot: {path}: {e}")
+        if not isinstance(state, list) or end > len(self._map):
+            self._map.close()
+            raise ValueError(f"Not a valid snapshot: {path}")
+
+    def __contains__(self, name):
+        return name in self._layout
+
+    def __getitem__(self, name):
+        """
+        Function to get an array of the snapshot, backed by the
+        mapping of the file.
+
+        Args:
+        name (str): The name of the array.
+
+        Returns:
+        ndarray: The read-only array.
+        """
+        dtype, shape, offset = self._layout[name]
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        if not count:
+            array = np.empty(shape, dtype=dtype)
+            array.flags.writeable = False
+            return array
+        return np.frombuffer(
+            self._map, dtype=dtype, count=count, offset=self._start + offset
+            ).reshape(shape)
+
+    def group(self, prefix):
+        """
+        Function to get the arrays saved under a prefix.
+
+        Args:
+        prefix (str): The prefix, such as 'matches.'.
+
+        Returns:
+        dict: The arrays by name, without the prefix.
+        """
+        return {
+            name[len(prefix):]: self[name]
+            for name in self._layout if name.startswith(prefix)
+            }
+
+
+class MappedTables(dict):
+    """
+    Subset count tables backed by a snapshot. Pickling them, to send
+    them to the processes of the prediction pool, only sends the path
+    of the snapshot, which each process maps again. Once the snapshot
+    was replaced by another process, the tables themselves are sent.
+    """
+
+    def __init__(self, tables, path, state):
+        super().__init__(tables)
+        self.path = path
+        self.state = state
+
+    def __reduce__(self):
+        if snapshot_state(self.path) == list(self.state):
+            return open_tables, (self.path, self.state)
+        return dict, (dict(self),)
+
+
+def snapshot_state(path):
+    """
+    Function to get the state of the draws a snapshot was built from.
+
+    Args:
+    path (str): The snapshot file.
+
+    Returns:
+    list: The state, or None if there is no valid snapshot.
+    """
+    try:
+        return Snapshot(path).meta["state"]
+    except (OSError, ValueError):
+        return None
+
+
+def open_tables(path, state):
+    """
+    Function to map the subset count tables of a snapshot.
+
+    Args:
+    path (str): The snapshot file.
+    state (list): The state of the draws the tables must have been
+    built from.
+
+    Returns:
+    MappedTables: The tables.
+
+    Raises:
+    ValueError: If the snapshot was replaced in the meantime.
+    """
+    snapshot = Snapshot(path)
+    if snapshot.meta["state"] != list(state):
+        raise ValueError(f"The snapshot {path} has changed.")
+    return tables_from(snapshot)
+
+
+def tables_from(snapshot):
+    tables = {0: snapshot.meta["draws"]}
+    tables.update({
+        int(k): array for k, array in snapshot.group("tables.").items()
+        })
+    return MappedTables(tables, snapshot.path, snapshot.meta["state"])
+
+
+def save_data(path, data, state):
+    """
+    Function to write the draw data of a service to a snapshot.
+
+    Args:
+    path (str): The snapshot file.
+    data (DrawData): The draw data, see service.py.
+    state (tuple): The state of the draws it was built from, see
+    DrawCache.state().
+    """
+    main_since, lucky_since = data.draws_since
+    arrays = {
+        "matrix": data.matrix,
+        "main_counts": data.main_counts,
+        "lucky_counts": data.lucky_counts,
+        "main_since": main_since,
+        "lucky_since": lucky_since,
+    }
+    arrays.update({
+        f"tables.{k}": data.tables[k] for k in range(1, 6)
+        })
+    for prefix, part in (
+            ("index.", data.index), ("matches.", data.matches),
+            ("windows.", data.windows), ("lucky.", data.lucky),
+            ("itemsets.", data.itemsets)):
+        arrays.update({
+            prefix + name: array for name, array in part.arrays().items()
+            })
+    write_snapshot(path, arrays, {
+        "state": list(state),
+        "version": data.version,
+        "last_row": data.last_row,
+        "draws": data.tables[0],
+        "tiers": [list(tier) for tier in data.tiers],
+    })
+
+
+def load_data(path, state):
+    """
+    Function to map the draw data saved in a snapshot.
+
+    Args:
+    path (str): The snapshot file.
+    state (tuple): The state of the draws the data must have been
+    built from.
+
+    Returns:
+    DrawData: The draw data, or None if there is no snapshot or it
+    was built from other draws.
+    """
+    # Imported here, the service imports this module
+    from service import DrawData
+    from itemsets import FrequentItemsets
+    from lucky_tables import LuckyTables
+    from match_index import MatchIndex
+    from ticket_index import TicketIndex
+    from windows import FrequencyWindows
+
+    # A missing, partial or foreign file counts as no snapshot
+    try:
+        snapshot = Snapshot(path)
+        if snapshot.meta["state"] != list(state):
+            return None
+        matrix = snapshot["matrix"]
+        tables = tables_from(snapshot)
+        return DrawData(
+            version=snapshot.meta["version"],
+            last_row=snapshot.meta["last_row"],
+            matrix=matrix,
+            main_counts=snapshot["main_counts"],
+            lucky_counts=snapshot["lucky_counts"],
+            draws_since=(snapshot["main_since"], snapshot["lucky_since"]),
+            tiers=tuple(snapshot.meta["tiers"]),
+            tables=tables,
+            index=TicketIndex.from_arrays(matrix, snapshot.group("index.")),
+            matches=MatchIndex.from_arrays(
+                matrix, snapshot.group("matches.")
+                ),
+            windows=FrequencyWindows.from_arrays(
+                matrix, snapshot.group("windows.")
+                ),
+            lucky=LuckyTables.from_arrays(snapshot.group("lucky.")),
+            itemsets=FrequentItemsets.from_arrays(
+                tables, snapshot.group("itemsets.")
+                ),
+            )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def main(argv=None):
+    """
+    Function to build a snapshot from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    from backends import get_backend
+    from draw_cache import DEFAULT_CACHE_PATH, DrawCache
+    from service import LottoramaService
+
+    parser = argparse.ArgumentParser(
+        description="Build the memory-mapped snapshot of the draw data."
+        )
+    parser.add_argument(
+        "-o", "--output", default=DEFAULT_SNAPSHOT_PATH,
+        required=DEFAULT_SNAPSHOT_PATH is None,
+        help="snapshot file, LOTTORAMA_SNAPSHOT_PATH by default"
+        )
+    parser.add_argument(
+        "--cache", default=DEFAULT_CACHE_PATH,
+        help="path of the local 'euro' draw cache"
+        )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    service = LottoramaService(
+        DrawCache(args.cache), backend=get_backend(), snapshot=None
+        )
+    service.reload()
+    save_data(args.output, service.data, service.cache.state())
+    print(
+        f"{len(service.data.matrix)} draws written to {args.output} "
+        f"({os.path.getsize(args.output) / 2 ** 20:.1f} MiB) in "
+        f"{time.perf_counter() - started:.2f} s.",
+        file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Incrementally maintained statistics of the draw history.
+
+StatsStore keeps the counts of every main and lucky number, the pair
+co-occurrence counts of the main numbers and the position of the last
+draw each number appeared in. Appending a draw updates them in constant
+time per number, instead of recounting the whole history. The service
+serves its number counts, pair counts and draws since each number was
+last drawn from the store.
+
+The store is checkpointed to a NumPy file next to the draw cache, with
+the number of draws it covers and the date of the last one. On restart
+only the draws cached since the checkpoint are replayed. If the cached
+history no longer agrees with the checkpoint, because the 'euro'
+worksheet was edited above its last row, the statistics are rebuilt.
+"""
+import os
+import tempfile
+import zipfile
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from draw_matrix import colex_unrank, draw_matrix
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX, parse_draws
+
+# PAIRS[rank] is the pair of main numbers of that colex rank
+PAIRS = colex_unrank(np.arange(comb(MAIN_NUMBER_MAX, 2)), 2)
+
+# Arrays saved in a checkpoint
+CHECKPOINT_ARRAYS = (
+    "main_counts", "lucky_counts", "pair_counts",
+    "main_last_seen", "lucky_last_seen",
+)
+
+
+class StatsStore:
+    """
+    Number, pair and last-seen statistics of the draws added so far.
+
+    Args:
+    path (str): Optional checkpoint file, loaded if it exists.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.reset()
+        if path and os.path.exists(path):
+            self.load()
+
+    def reset(self):
+        """
+        Function to forget every draw.
+        """
+        self.draws = 0
+        self.last_date = None
+        self.main_counts = np.zeros(MAIN_NUMBER_MAX + 1, dtype=np.int64)
+        self.lucky_counts = np.zeros(LUCKY_NUMBER_MAX + 1, dtype=np.int64)
+        self.pair_counts = np.zeros(
+            (MAIN_NUMBER_MAX + 1, MAIN_NUMBER_MAX + 1), dtype=np.int64
+            )
+        # Index of the last draw of each number, -1 if never drawn
+        self.main_last_seen = np.full(MAIN_NUMBER_MAX + 1, -1, dtype=np.int64)
+        self.lucky_last_seen = np.full(
+            LUCKY_NUMBER_MAX + 1, -1, dtype=np.int64
+            )
+
+    def add_draw(self, main_numbers, lucky_numbers, draw_date=None):
+        """
+        Function to add one draw to the statistics.
+
+        Args:
+        main_numbers (tuple): The five main numbers.
+        lucky_numbers (tuple): The two lucky numbers.
+        draw_date (str): The date of the draw.
+        """
+        position = self.draws
+        for num in main_numbers:
+            self.main_counts[num] += 1
+            self.main_last_seen[num] = position
+        for first, second in combinations(main_numbers, 2):
+            self.pair_counts[first, second] += 1
+            self.pair_counts[second, first] += 1
+        for num in lucky_numbers:
+            self.lucky_counts[num] += 1
+            self.lucky_last_seen[num] = position
+        self.draws += 1
+        self.last_date = draw_date
+
+    def add_draws(self, draws):
+        """
+        Function to add many draws at once, vectorized.
+
+        Args:
+        draws (list): (draw_date, main_numbers, lucky_numbers) tuples
+        as returned by parse_draws(), in draw order.
+
+        Returns:
+        int: The number of draws added.
+        """
+        if not draws:
+            return 0
+        matrix = draw_matrix(draws).astype(np.intp)
+        positions = self.draws + np.arange(len(matrix))
+        main, lucky = matrix[:, :5], matrix[:, 5:]
+
+        np.add.at(self.main_counts, main.ravel(), 1)
+        np.add.at(self.lucky_counts, lucky.ravel(), 1)
+        for first, second in combinations(range(5), 2):
+            np.add.at(self.pair_counts, (main[:, first], main[:, second]), 1)
+            np.add.at(self.pair_counts, (main[:, second], main[:, first]), 1)
+
+        # Positions only grow, so the largest one of each number wins
+        np.maximum.at(
+            self.main_last_seen, main.ravel(), np.repeat(positions, 5)
+            )
+        np.maximum.at(
+            self.lucky_last_seen, lucky.ravel(), np.repeat(positions, 2)
+            )
+        self.draws += len(matrix)
+        self.last_date = draws[-1][0]
+        return len(matrix)
+
+    def pair_table(self):
+        """
+        Function to get the pair co-occurrence counts in the layout of
+        the subset count tables of simulation.build_tables().
+
+        Returns:
+        ndarray: The counts of every pair of main numbers, indexed by
+        draw_matrix.colex_rank().
+        """
+        return self.pair_counts[PAIRS[:, 0], PAIRS[:, 1]]
+
+    def draws_since(self):
+        """
+        Function to get how long ago every number was last drawn.
+
+        Returns:
+        tuple: Two arrays (main, lucky) indexed by the number, holding
+        the draws since it last appeared, 0 for the latest draw, or
+        -1 if it never appeared.
+        """
+        main = np.where(
+            self.main_last_seen < 0, -1, self.draws - 1 - self.main_last_seen
+            )
+        lucky = np.where(
+            self.lucky_last_seen < 0, -1,
+            self.draws - 1 - self.lucky_last_seen
+            )
+        return main, lucky
+
+    def catch_up(self, cache):
+        """
+        Function to add the draws cached since the statistics were
+        last updated, rebuilding them if the cache was rebuilt.
+
+        Args:
+        cache (DrawCache): The local draw cache.
+
+        Returns:
+        int: The number of draws added.
+        """
+        rows = cache.rows(offset=max(self.draws - 1, 0))
+        if self.draws:
+            if rows and rows[0][0] == self.last_date:
+                # The draws appended are added one at a time
+                draws = parse_draws(rows[1:])
+                for draw_date, main_numbers, lucky_numbers in draws:
+                    self.add_draw(main_numbers, lucky_numbers, draw_date)
+                return len(draws)
+            self.reset()
+            rows = cache.rows()
+        return self.add_draws(parse_draws(rows))
+
+    def save(self, path=None):
+        """
+        Function to write a checkpoint, replacing the previous one
+        atomically.
+
+        Args:
+        path (str): The checkpoint file, the store path by default.
+        """
+        path = path or self.path
+        last_date = np.array(self.last_date or "")
+        # A temporary file of its own, several processes may save at once
+        handle, temp = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", suffix=".tmp"
+            )
+        try:
+            with os.fdopen(handle, "wb") as target:
+                np.savez(target, draws=self.draws, last_date=last_date, **{
+                    name: getattr(self, name) for name in CHECKPOINT_ARRAYS
+                    })
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+    def load(self, path=None):
+        """
+        Function to read a checkpoint. A checkpoint that cannot be
+        read is ignored, the draws are then all replayed.
+
+        Args:
+        path (str): The checkpoint file, the store path by default.
+        """
+        try:
+            with np.load(path or self.path) as checkpoint:
+                arrays = {
+                    name: checkpoint[name].astype(np.int64)
+                    for name in CHECKPOINT_ARRAYS
+                    }
+                draws = int(checkpoint["draws"])
+                last_date = str(checkpoint["last_date"]) or None
+        except (OSError, ValueError, KeyError, EOFError,
+                zipfile.BadZipFile):
+            self.reset()
+            return
+        for name, array in arrays.items():
+            if array.shape != getattr(self, name).shape:
+                self.reset()
+                return
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.draws = draws
+        self.last_date = last_date
@@ -0,0 +1,100 @@
+"""
+Synthetic draw histories and tickets.
+
+Random draws and tickets, valid under the rules of the game, generated
+in vectorized chunks so that histories of millions of draws are quick
+to build. They feed the benchmarks, the load test and the fake Google
+Sheets server.
+"""
+import csv
+
+import numpy as np
+
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX
+
+# Draws generated at a time, so that large histories fit in memory
+GENERATION_CHUNK = 1000000
+
+
+def random_numbers(rng, size, count, maximum):
+    """
+    Function to draw unique numbers for many rows at once.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    size (int): The number of rows.
+    count (int): Unique numbers on each row.
+    maximum (int): Numbers are drawn from 1 to maximum.
+
+    Returns:
+    ndarray: (size x count) uint8 numbers, sorted on each row.
+    """
+    keys = rng.random((size, maximum))
+    numbers = keys.argpartition(count - 1, axis=1)[:, :count] + 1
+    numbers.sort(axis=1)
+    return numbers.astype(np.uint8)
+
+
+def synthetic_matrix(rng, draws):
+    """
+    Function to generate a synthetic draw history.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    draws (int): The number of draws.
+
+    Returns:
+    ndarray: The (draws x 7) uint8 draw matrix.
+    """
+    matrix = np.empty((draws, 7), dtype=np.uint8)
+    for start in range(0, draws, GENERATION_CHUNK):
+        size = min(GENERATION_CHUNK, draws - start)
+        matrix[start:start + size, :5] = random_numbers(
+            rng, size, 5, MAIN_NUMBER_MAX
+            )
+        matrix[start:start + size, 5:] = random_numbers(
+            rng, size, 2, LUCKY_NUMBER_MAX
+            )
+    return matrix
+
+
+def write_draws_csv(matrix, path):
+    """
+    Function to write a draw matrix in the layout of the 'euro'
+    worksheet, with a header row and a unique label for each draw.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    path (str): The CSV file to write.
+    """
+    with open(path, "w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(["Date", "N1", "N2", "N3", "N4", "N5", "L1", "L2"])
+        for index, draw in enumerate(matrix.tolist()):
+            writer.writerow([f"D{index:08d}"] + draw)
+
+
+def synthetic_tickets(rng, size):
+    """
+    Function to generate valid tickets as typed in by a user.
+
+    Args:
+    rng (Generator): The NumPy random generator to use.
+    size (int): The number of tickets.
+
+    Returns:
+    list: (main_numbers, lucky_numbers) tuples of comma-separated
+    strings, the main numbers in random order.
+    """
+    tickets = []
+    for start in range(0, size, GENERATION_CHUNK):
+        count = min(GENERATION_CHUNK, size - start)
+        main = rng.permuted(
+            random_numbers(rng, count, 5, MAIN_NUMBER_MAX), axis=1
+            )
+        lucky = random_numbers(rng, count, 2, LUCKY_NUMBER_MAX)
+        tickets.extend(
+            (",".join(map(str, numbers)), ",".join(map(str, lucky_numbers)))
+            for numbers, lucky_numbers in zip(main.tolist(), lucky.tolist())
+            )
+    return tickets
@@ -0,0 +1,21 @@
+"""
+Shared fixtures: small synthetic draw histories, checked by brute force
+against the vectorized code.
+"""
+import numpy as np
+import pytest
+
+from synthetic import synthetic_matrix
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(2024)
+
+
+@pytest.fixture
+def matrix(rng):
+    """
+    A synthetic draw history of 300 draws.
+    """
+    return synthetic_matrix(rng, 300)
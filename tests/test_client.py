@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import pytest
+
+from backends import LocalBackend
+from client import HttpService
+from draw_cache import DrawCache
+from result_cache import ResultCache
+from server import LottoramaServer
+from service import LottoramaService, ServiceError
+from synthetic import write_draws_csv
+
+
+@pytest.fixture
+def services(tmp_path, matrix):
+    """
+    A service and a client of it, served on a free local port.
+    """
+    backend = LocalBackend(str(tmp_path))
+    write_draws_csv(matrix, backend.path("euro"))
+    service = LottoramaService(
+        DrawCache(str(tmp_path / "cache.sqlite3")), backend=backend,
+        candidates=2000, results=ResultCache(max_size=0, path=None),
+        snapshot=None
+        )
+    service.reload()
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(
+        LottoramaServer(service).handle_connection, "127.0.0.1", 0
+        ))
+    port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield service, HttpService(f"http://127.0.0.1:{port}")
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+def test_predict_sends_the_tiers(services):
+    service, client = services
+    high, moderate = [1, 2, 3, 4, 5, 6], [10, 11, 12]
+    remote = client.predict(
+        [7, 45], top_n=3, seed=1, high_ranks=high, moderate_ranks=moderate
+        )
+    assert remote == service.predict(
+        [7, 45], top_n=3, seed=1, high_ranks=high, moderate_ranks=moderate
+        )
+    for ticket in remote["tickets"]:
+        extra = set(ticket["numbers"]) - {7, 45}
+        assert len(extra & set(high)) == 2 and len(extra & set(moderate)) == 1
+
+    # Without tiers, the server predicts from its own
+    assert client.predict([7, 45], top_n=3, seed=1) == service.predict(
+        [7, 45], top_n=3, seed=1
+        )
+
+
+def test_invalid_tiers_are_rejected(services):
+    _, client = services
+    for high in ([1, 2, 99], [1, 1, 2], ["a", 2, 3]):
+        with pytest.raises(ServiceError):
+            client.predict([7, 45], high_ranks=high, moderate_ranks=[10])
@@ -0,0 +1,51 @@
+import numpy as np
+
+from draw_cache import DrawCache
+from draw_matrix import draw_matrix
+from ranking import parse_draws
+
+
+class ListBackend:
+    """
+    Backend reading the 'euro' rows from a list, header first.
+    """
+
+    def __init__(self, matrix):
+        self.rows = [["Date", "N1", "N2", "N3", "N4", "N5", "L1", "L2"]]
+        self.labels = 0
+        for draw in matrix.tolist():
+            self.append(draw)
+
+    def append(self, draw):
+        self.labels += 1
+        self.rows.append([f"D{self.labels:08d}"] + [str(n) for n in draw])
+
+    def read_draws(self, start_row=1):
+        return self.rows[start_row - 1:]
+
+
+def test_matrix_is_kept_until_the_draws_change(tmp_path, matrix):
+    backend = ListBackend(matrix[:200])
+    cache = DrawCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.sync(backend) == 200
+    first = cache.matrix()
+    assert np.array_equal(first, matrix[:200])
+
+    # A sync finding nothing new keeps the matrix
+    assert cache.sync(backend) == 0
+    assert cache.matrix() is first
+
+    for draw in matrix[200:]:
+        backend.append(draw.tolist())
+    assert cache.sync(backend) == 100
+    assert np.array_equal(cache.matrix(), matrix)
+
+    # A draw removed above the last row rebuilds it
+    del backend.rows[5]
+    backend.append(matrix[0].tolist())
+    before = cache.matrix()
+    assert cache.sync(backend) == 300
+    assert cache.matrix() is not before
+    assert np.array_equal(
+        cache.matrix(), draw_matrix(parse_draws(backend.rows))
+        )
@@ -0,0 +1,74 @@
+from itertools import combinations
+from math import comb
+
+import numpy as np
+import pytest
+
+from draw_matrix import (
+    colex_rank, number_counts, pair_counts, subset_counts, triple_counts
+    )
+from ranking import MAIN_NUMBER_MAX
+
+
+def colex_order(k):
+    """
+    Function to list every k-combination of 1 to 50 in colex order,
+    by the reversed numbers.
+    """
+    return sorted(
+        combinations(range(1, MAIN_NUMBER_MAX + 1), k),
+        key=lambda combo: combo[::-1]
+        )
+
+
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_colex_rank_numbers_every_combination_in_order(k):
+    combos = np.array(colex_order(k))
+    assert colex_rank(combos).tolist() == list(range(comb(50, k)))
+
+
+@pytest.mark.parametrize("k", [4, 5])
+def test_colex_rank_is_dense_and_ordered(k, rng):
+    combos = np.sort(
+        rng.random((2000, MAIN_NUMBER_MAX)).argsort(axis=1)[:, :k] + 1,
+        axis=1
+        )
+    ranks = colex_rank(combos)
+    assert ranks.min() >= 0 and ranks.max() < comb(50, k)
+    order = sorted(range(len(combos)), key=lambda i: combos[i][::-1].tolist())
+    assert np.all(np.diff(ranks[order]) >= 0)
+    assert colex_rank(list(range(51 - k, 51))) == comb(50, k) - 1
+
+
+def test_number_counts(matrix):
+    main_counts, lucky_counts = number_counts(matrix)
+    for num in range(1, 51):
+        assert main_counts[num] == (matrix[:, :5] == num).sum()
+    for num in range(1, 13):
+        assert lucky_counts[num] == (matrix[:, 5:] == num).sum()
+    assert main_counts[0] == lucky_counts[0] == 0
+
+
+def test_pair_and_triple_counts(matrix):
+    pairs = pair_counts(matrix)
+    triples = triple_counts(matrix)
+    draws = [set(draw[:5].tolist()) for draw in matrix]
+    for a, b in [(1, 2), (7, 45), (13, 50)]:
+        expected = sum({a, b} <= draw for draw in draws)
+        assert pairs[a, b] == pairs[b, a] == expected
+    for a, b, c in [(1, 2, 3), (4, 17, 33), (20, 21, 49)]:
+        assert triples[a, b, c] == sum({a, b, c} <= draw for draw in draws)
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4, 5])
+def test_subset_counts_match_brute_force(k, matrix):
+    counts = subset_counts(matrix, k)
+    assert len(counts) == comb(50, k)
+    assert counts.sum() == len(matrix) * comb(5, k)
+
+    expected = {}
+    for draw in matrix[:, :5].tolist():
+        for combo in combinations(draw, k):
+            expected[combo] = expected.get(combo, 0) + 1
+    combos = np.array(list(expected))
+    assert counts[colex_rank(combos)].tolist() == list(expected.values())
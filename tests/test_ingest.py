@@ -0,0 +1,102 @@
+import io
+from datetime import date
+
+import numpy as np
+
+from backends import LocalBackend
+from draw_store import DrawStore
+from ingest import deduplicate, ingest, parse_draw, read_draws
+
+
+def csv_stream(lines):
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def test_parse_draw_sorts_and_validates():
+    ordinal, numbers, date_format, errors = parse_draw(
+        ["31/01/2024", "45", "7", "23", "1", "12", "9", "3"]
+        )
+    assert errors == [] and date_format == "%d/%m/%Y"
+    assert ordinal == date(2024, 1, 31).toordinal()
+    assert numbers == [1, 7, 12, 23, 45, 3, 9]
+
+    for row in (
+            ["2024-01-31", "1", "1", "2", "3", "4", "1", "2"],
+            ["2024-01-31", "1", "2", "3", "4", "51", "1", "2"],
+            ["2024-01-31", "1", "2", "3", "4", "5", "1", "13"],
+            ["31 Jan 2024", "1", "2", "3", "4", "5", "1", "2"],
+            ["2024-01-31", "1", "2"]):
+        assert parse_draw(row)[3]
+
+
+def test_read_draws_skips_the_header_and_reports_bad_rows():
+    stream = csv_stream([
+        "Date,N1,N2,N3,N4,N5,L1,L2",
+        "2024-01-02,5,4,3,2,1,2,1",
+        "",
+        "2024-01-05,1,2,3,4,99,1,2",
+        "05.01.2024,10,20,30,40,50,11,12",
+        ])
+    chunks = list(read_draws(stream, chunk_size=1))
+    dates = np.concatenate([dates for dates, _, _ in chunks])
+    numbers = np.vstack([numbers for _, numbers, _ in chunks])
+    invalid = [line for _, _, bad in chunks for line, _ in bad]
+    assert dates.tolist() == [
+        date(2024, 1, 2).toordinal(), date(2024, 1, 5).toordinal()
+        ]
+    assert numbers.tolist() == [
+        [1, 2, 3, 4, 5, 1, 2], [10, 20, 30, 40, 50, 11, 12]
+        ]
+    assert invalid == [4]
+
+
+def test_deduplicate_matches_brute_force(rng):
+    dates = rng.integers(0, 40, 200).astype(np.int32)
+    numbers = rng.integers(1, 4, (200, 7)).astype(np.uint8)
+    kept_dates, kept_numbers, duplicates, conflicts = deduplicate(
+        dates, numbers
+        )
+
+    first = {}
+    expected_conflicts = 0
+    for day, draw in zip(dates.tolist(), numbers.tolist()):
+        if day not in first:
+            first[day] = draw
+        elif draw != first[day]:
+            expected_conflicts += 1
+    assert kept_dates.tolist() == sorted(first)
+    assert kept_numbers.tolist() == [first[day] for day in sorted(first)]
+    assert duplicates == 200 - len(first)
+    assert conflicts == expected_conflicts
+
+
+def test_ingest_merges_with_the_store_first(tmp_path):
+    store = DrawStore(str(tmp_path / "euro.npz"))
+    report = ingest([csv_stream([
+        "2024-01-02,1,2,3,4,5,1,2",
+        "2024-01-05,6,7,8,9,10,3,4",
+        ])], store)
+    assert (report.imported, report.draws, report.conflicts) == (2, 2, 0)
+
+    # The stored draw of a date wins over a later import
+    report = ingest([csv_stream([
+        "2024-01-05,11,12,13,14,15,5,6",
+        "2024-01-09,16,17,18,19,20,7,8",
+        "2024-01-09,16,17,18,19,20,7,8",
+        ])], store)
+    assert (report.imported, report.duplicates, report.conflicts) == (1, 2, 1)
+    assert store.rows() == [
+        ["2024-01-02", "1", "2", "3", "4", "5", "1", "2"],
+        ["2024-01-05", "6", "7", "8", "9", "10", "3", "4"],
+        ["2024-01-09", "16", "17", "18", "19", "20", "7", "8"],
+        ]
+
+    # Importing the same file again changes nothing
+    before = store.matrix()
+    report = ingest([csv_stream(["2024-01-09,16,17,18,19,20,7,8"])], store)
+    assert report.imported == 0
+    assert np.array_equal(store.matrix(), before)
+
+    backend = LocalBackend(str(tmp_path))
+    assert backend.available()
+    assert backend.read_draws(2) == store.rows(1)
@@ -0,0 +1,113 @@
+from itertools import combinations
+from math import comb
+
+import numpy as np
+import pytest
+
+from draw_matrix import colex_rank, colex_unrank
+from itemsets import KEPT_PAIRS, SUBSET_WEIGHT, FrequentItemsets
+from simulation import build_tables
+
+
+def brute_supports(matrix):
+    """
+    Function to count the draws holding every combination of 1 to 5
+    main numbers, one draw at a time.
+    """
+    supports = {}
+    for draw in matrix[:, :5].tolist():
+        for k in range(1, 6):
+            for combo in combinations(draw, k):
+                supports[combo] = supports.get(combo, 0) + 1
+    return supports
+
+
+def brute_score(kept, extra, supports, min_support):
+    """
+    Function to score a completion from the definition.
+    """
+    score = 0
+    for size in range(1, len(extra) + 1):
+        for subset in combinations(extra, size):
+            support = supports.get(tuple(sorted(kept + list(subset))), 0)
+            if support >= min_support:
+                score += SUBSET_WEIGHT ** (size - 1) * support
+    return score
+
+
+@pytest.mark.parametrize("k", [1, 2, 3, 4, 5])
+def test_colex_unrank_inverts_colex_rank(k, rng):
+    ranks = rng.integers(0, comb(50, k), 1000)
+    combos = colex_unrank(ranks, k)
+    assert (np.diff(combos, axis=1) > 0).all()
+    assert combos.min() >= 1 and combos.max() <= 50
+    assert np.array_equal(colex_rank(combos), ranks)
+    assert colex_unrank([0], k).tolist() == [list(range(1, k + 1))]
+
+
+def test_kept_pairs_are_every_pair_in_rank_order():
+    assert len(KEPT_PAIRS) == 1225
+    assert colex_rank(KEPT_PAIRS).tolist() == list(range(1225))
+
+
+def test_support_and_frequent_match_brute_force(matrix):
+    itemsets = FrequentItemsets(build_tables(matrix), min_support=2)
+    supports = brute_supports(matrix)
+    for combo in list(supports)[:200]:
+        assert itemsets.support(list(combo)) == supports[combo]
+    assert itemsets.support([1, 2, 3, 4, 5]) == supports.get(
+        (1, 2, 3, 4, 5), 0
+        )
+
+    for k in (1, 2, 3):
+        expected = sorted(
+            ((list(combo), support) for combo, support in supports.items()
+             if len(combo) == k and support >= 2),
+            key=lambda item: (-item[1], colex_rank(item[0]))
+            )
+        assert itemsets.frequent(k) == [
+            (combo, support) for combo, support in expected
+            ]
+
+
+def test_completions_are_valid_and_scored_by_definition(matrix):
+    itemsets = FrequentItemsets(
+        build_tables(matrix), min_support=2, completions=5
+        )
+    supports = brute_supports(matrix)
+    for kept in ([1, 2], [7, 45], [13, 50], [24, 25]):
+        completions = itemsets.complete(kept, top_n=5)
+        scores = [score for _, score in completions]
+        assert scores == sorted(scores, reverse=True)
+        assert len({tuple(extra) for extra, _ in completions}) == 5
+        for extra, score in completions:
+            assert extra == sorted(extra) and len(set(extra)) == 3
+            assert not set(extra) & set(kept)
+            assert score == brute_score(kept, extra, supports, 2)
+
+
+def test_completion_finds_a_repeated_ticket(matrix):
+    # The ticket drawn three more times is the best completion of any
+    # two of its numbers
+    ticket = np.array([[3, 11, 19, 27, 42, 1, 2]], dtype=np.uint8)
+    history = np.vstack([matrix, ticket, ticket, ticket])
+    itemsets = FrequentItemsets(build_tables(history), min_support=2)
+    supports = brute_supports(history)
+    for kept in combinations([3, 11, 19, 27, 42], 2):
+        [(extra, score)] = itemsets.complete(list(kept))
+        assert sorted(list(kept) + extra) == [3, 11, 19, 27, 42]
+        best = max(
+            brute_score(list(kept), list(other), supports, 2)
+            for other in combinations(
+                [num for num in range(1, 51) if num not in kept], 3
+                )
+            )
+        assert score == best
+
+
+def test_from_arrays_round_trip(matrix):
+    tables = build_tables(matrix)
+    itemsets = FrequentItemsets(tables, min_support=2)
+    copy = FrequentItemsets.from_arrays(tables, itemsets.arrays())
+    assert copy.min_support == 2
+    assert copy.complete([7, 45], 5) == itemsets.complete([7, 45], 5)
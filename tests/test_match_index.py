@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from match_index import PRIZE_TIERS, MatchIndex, draw_bitsets, prize_summary
+from synthetic import synthetic_matrix
+
+
+def brute_table(ticket, matrix):
+    """
+    Function to count the draws by main and lucky numbers a ticket
+    matched, one draw at a time.
+    """
+    table = np.zeros((6, 3), dtype=np.int64)
+    for draw in matrix.tolist():
+        main = len(set(ticket[:5]) & set(draw[:5]))
+        lucky = len(set(ticket[5:]) & set(draw[5:]))
+        table[main, lucky] += 1
+    return table
+
+
+def test_draw_bitsets_set_one_bit_per_number_drawn(matrix):
+    bitsets = draw_bitsets(matrix[:, :5], 50, (len(matrix) + 63) // 64)
+    for num in (1, 25, 50):
+        bits = np.unpackbits(
+            bitsets[num].view(np.uint8), bitorder="little"
+            )[:len(matrix)]
+        assert bits.tolist() == (matrix[:, :5] == num).any(axis=1).tolist()
+
+
+# History lengths around the 64-draw word boundary
+@pytest.mark.parametrize("draws", [1, 63, 64, 65, 300])
+def test_match_table_matches_brute_force(draws, rng):
+    matrix = synthetic_matrix(rng, draws)
+    index = MatchIndex(matrix)
+    tickets = np.vstack([matrix[:5], synthetic_matrix(rng, 40)])
+    # Small chunks, so that the tickets span several of them
+    table = index.match_table(tickets, chunk_size=16)
+    for ticket, counts in zip(tickets.tolist(), table):
+        assert np.array_equal(counts, brute_table(ticket, matrix))
+    assert (table.sum(axis=(1, 2)) == draws).all()
+
+
+def test_prize_counts_follow_the_prize_tiers(matrix):
+    index = MatchIndex(matrix)
+    ticket = matrix[:1]
+    counts = index.prize_counts(ticket)[0]
+    table = brute_table(ticket[0].tolist(), matrix)
+    assert counts.tolist() == [table[m, l] for m, l in PRIZE_TIERS]
+    summary = prize_summary(counts)
+    assert summary["5+2"] >= 1
+    assert list(summary) == [f"{m}+{l}" for m, l in PRIZE_TIERS]
+
+
+def test_empty_history_counts_nothing(rng):
+    index = MatchIndex(np.zeros((0, 7), dtype=np.uint8))
+    table = index.match_table(synthetic_matrix(rng, 3))
+    assert not table.any()
@@ -0,0 +1,87 @@
+import multiprocessing
+
+from result_cache import ResultCache
+
+
+def store_results(path):
+    """
+    Function to store results from another process.
+    """
+    cache = ResultCache(path=path)
+    cache.put("analyse", "v1", [1, 2, 3, 4, 5, 1, 2], {"wins": 1})
+    cache.put("predict", "v1", [[7, 45], 1], {"tickets": []})
+
+
+def test_least_recently_used_results_are_evicted_first():
+    cache = ResultCache(max_size=3, path=None)
+    for name in "abc":
+        cache.put("analyse", "v1", name, name.upper())
+    assert cache.get("analyse", "v1", "a") == (True, "A")
+    cache.put("analyse", "v1", "d", "D")
+    assert cache.get("analyse", "v1", "b") == (False, None)
+    for name in "acd":
+        assert cache.get("analyse", "v1", name) == (True, name.upper())
+    assert cache.stats() == {"hits": 4, "misses": 1, "size": 3}
+
+
+def test_results_of_another_version_are_not_served():
+    cache = ResultCache(max_size=10, path=None)
+    cache.put("analyse", "v1", [1, 2], {"wins": [1]})
+    found, value = cache.get("analyse", "v1", [1, 2])
+    value["wins"].append(2)
+    assert cache.get("analyse", "v1", [1, 2]) == (True, {"wins": [1]})
+    assert cache.get("analyse", "v2", [1, 2]) == (False, None)
+    assert cache.get("predict", "v1", [1, 2]) == (False, None)
+
+    calls = []
+    assert cache.get_or_compute(
+        "analyse", "v2", [1, 2], lambda: calls.append(1) or "new"
+        ) == "new"
+    assert cache.get_or_compute(
+        "analyse", "v2", [1, 2], lambda: calls.append(1) or "newer"
+        ) == "new"
+    assert calls == [1]
+    assert cache.get("analyse", "v1", [1, 2]) == (False, None)
+
+
+def test_shared_results_are_read_by_other_processes(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    process = multiprocessing.get_context("spawn").Process(
+        target=store_results, args=(path,)
+        )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    cache = ResultCache(max_size=10, path=path)
+    assert cache.get("analyse", "v1", [1, 2, 3, 4, 5, 1, 2]) == (
+        True, {"wins": 1}
+        )
+    assert cache.get("predict", "v1", [[7, 45], 1]) == (
+        True, {"tickets": []}
+        )
+
+    # A new version drops the shared results of the same kind only
+    cache.put("analyse", "v2", [6, 7, 8, 9, 10, 3, 4], {"wins": 2})
+    other = ResultCache(max_size=0, path=path)
+    assert other.get("analyse", "v1", [1, 2, 3, 4, 5, 1, 2]) == (False, None)
+    assert other.get("analyse", "v2", [6, 7, 8, 9, 10, 3, 4]) == (
+        True, {"wins": 2}
+        )
+    assert other.get("predict", "v1", [[7, 45], 1]) == (
+        True, {"tickets": []}
+        )
+
+
+def test_shared_file_keeps_the_most_recently_used(tmp_path):
+    cache = ResultCache(
+        max_size=0, path=str(tmp_path / "results.sqlite3"),
+        max_shared_size=2
+        )
+    cache.put("analyse", "v1", "a", "A")
+    cache.put("analyse", "v1", "b", "B")
+    assert cache.get("analyse", "v1", "a") == (True, "A")
+    cache.put("analyse", "v1", "c", "C")
+    assert cache.get("analyse", "v1", "b") == (False, None)
+    assert cache.get("analyse", "v1", "a") == (True, "A")
+    assert cache.get("analyse", "v1", "c") == (True, "C")
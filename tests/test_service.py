@@ -0,0 +1,99 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backends import LocalBackend
+from draw_cache import DrawCache
+from result_cache import ResultCache
+from service import LottoramaService
+from synthetic import synthetic_matrix, write_draws_csv
+
+
+@pytest.fixture
+def service(tmp_path, matrix, monkeypatch):
+    """
+    A service syncing its draw cache on every reload, counting how
+    often it loads the draws.
+    """
+    backend = LocalBackend(str(tmp_path))
+    write_draws_csv(matrix, backend.path("euro"))
+    service = LottoramaService(
+        DrawCache(str(tmp_path / "cache.sqlite3"), ttl=0), backend=backend,
+        results=ResultCache(max_size=0, path=None), snapshot=None
+        )
+    service.opened = 0
+    open_data = service._open
+
+    def counted():
+        service.opened += 1
+        open_data()
+
+    monkeypatch.setattr(service, "_open", counted)
+    return service
+
+
+def add_draw(service, label):
+    with open(service.backend.path("euro"), "a") as target:
+        target.write(f"{label},1,2,3,4,5,1,2\n")
+
+
+def test_reload_loads_the_draws_only_when_they_change(service, matrix):
+    for _ in range(3):
+        service.reload()
+    assert service.opened == 1
+    data = service.data
+
+    add_draw(service, "D99999999")
+    service.reload()
+    assert service.opened == 2
+    assert len(service.data.matrix) == len(matrix) + 1
+    assert service.data is not data
+
+
+def test_concurrent_reloads_load_new_draws_once(service):
+    service.reload()
+    add_draw(service, "D99999999")
+    threads = [threading.Thread(target=service.reload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert service.opened == 2
+    assert service.last_draw()["date"] == "D99999999"
+
+
+def test_appended_draws_extend_the_data_as_a_full_load(
+        service, rng, tmp_path, monkeypatch):
+    service.reload()
+    with open(service.backend.path("euro"), "a") as target:
+        for index, draw in enumerate(synthetic_matrix(rng, 40).tolist()):
+            target.write(",".join(map(str, [f"E{index:08d}"] + draw)) + "\n")
+    loaded = []
+    load = service._load
+    monkeypatch.setattr(
+        service, "_load", lambda matrix: loaded.append(1) or load(matrix)
+        )
+    service.reload()
+    assert loaded == []
+
+    fresh = LottoramaService(
+        DrawCache(str(tmp_path / "fresh.sqlite3")), backend=service.backend,
+        results=ResultCache(max_size=0, path=None), snapshot=None
+        )
+    fresh.reload()
+    extended, built = service.data, fresh.data
+    for name in built._fields:
+        expected, actual = getattr(built, name), getattr(extended, name)
+        if hasattr(expected, "arrays"):
+            expected, actual = expected.arrays(), actual.arrays()
+        if isinstance(expected, dict):
+            assert list(expected) == list(actual)
+            expected, actual = list(expected.values()), list(actual.values())
+        if isinstance(expected, (list, tuple)):
+            for left, right in zip(expected, actual):
+                assert np.array_equal(left, right), name
+        else:
+            assert np.array_equal(expected, actual), name
+    assert service.tiers(half_life=20) == fresh.tiers(half_life=20)
+    assert service.complete([7, 45], 3) == fresh.complete([7, 45], 3)
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+
+from simulation import (
+    PRIZE_WEIGHTS, build_tables, generate_candidates, match_distribution,
+    score_tickets, simulate, tier_pools
+    )
+from synthetic import synthetic_matrix
+
+
+def brute_distribution(ticket, matrix):
+    """
+    Function to count the draws a ticket matched on 0 to 5 numbers,
+    one draw at a time.
+    """
+    ticket = set(ticket)
+    distribution = [0] * 6
+    for draw in matrix[:, :5].tolist():
+        distribution[len(ticket & set(draw))] += 1
+    return distribution
+
+
+def random_tickets(rng, size):
+    return np.sort(
+        rng.random((size, 50)).argsort(axis=1)[:, :5] + 1, axis=1
+        )
+
+
+def test_match_distribution_inverts_subset_sums(matrix, rng):
+    tables = build_tables(matrix)
+    # Past draws themselves, to cover four and five matches
+    tickets = np.vstack([random_tickets(rng, 50), matrix[:10, :5]])
+    distributions = match_distribution(tickets, tables)
+    for ticket, distribution in zip(tickets.tolist(), distributions):
+        assert distribution.tolist() == brute_distribution(ticket, matrix)
+
+
+def test_score_tickets_weights_the_distribution(matrix, rng):
+    tables = build_tables(matrix)
+    tickets = random_tickets(rng, 20)
+    expected = [
+        int(np.dot(brute_distribution(ticket, matrix), PRIZE_WEIGHTS))
+        for ticket in tickets.tolist()
+        ]
+    assert score_tickets(tickets, tables).tolist() == expected
+
+
+def test_candidates_follow_the_tier_rules(rng):
+    high_ranks = list(range(1, 21))
+    moderate_ranks = list(range(21, 31))
+    pools = tier_pools([5, 40], high_ranks, moderate_ranks)
+    tickets = generate_candidates(rng, [5, 40], *pools, 500)
+    for ticket in tickets.tolist():
+        assert ticket == sorted(ticket) and len(set(ticket)) == 5
+        assert {5, 40} <= set(ticket)
+        rest = set(ticket) - {5, 40}
+        assert sum(num in high_ranks for num in rest) == 2
+        assert sum(num in moderate_ranks for num in rest) == 1
+
+
+def test_simulate_returns_the_best_candidates(matrix):
+    tables = build_tables(matrix)
+    high_ranks = list(range(1, 21))
+    moderate_ranks = list(range(21, 31))
+    best = simulate(
+        matrix, [5, 40], high_ranks, moderate_ranks, candidates=3000,
+        top_n=5, seed=1, workers=1, tables=tables
+        )
+    scores = [score for _, score in best]
+    assert scores == sorted(scores, reverse=True)
+    for ticket, score in best:
+        assert score == np.dot(
+            brute_distribution(ticket, matrix), PRIZE_WEIGHTS
+            )
+    # The same seed gives the same tickets
+    assert best == simulate(
+        matrix, [5, 40], high_ranks, moderate_ranks, candidates=3000,
+        top_n=5, seed=1, workers=1, tables=tables
+        )
+
+
+def test_concurrent_simulations_use_their_own_tables(matrix, rng):
+    histories = [matrix, synthetic_matrix(rng, 300)]
+    tables = [build_tables(history) for history in histories]
+
+    def run(index):
+        # Small chunks, so that the threads interleave
+        return simulate(
+            histories[index], [5, 40], range(1, 21), range(21, 31),
+            candidates=2000, top_n=3, seed=1, workers=1, chunk_size=50,
+            tables=tables[index]
+            )
+
+    expected = [run(0), run(1)]
+    assert expected[0] != expected[1]
+    results = {}
+
+    def record(thread):
+        results[thread] = run(thread % 2)
+
+    threads = [
+        threading.Thread(target=record, args=(thread,)) for thread in range(8)
+        ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results[thread] == expected[thread % 2] for thread in range(8))
@@ -0,0 +1,138 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from backends import LocalBackend
+from draw_cache import DrawCache
+from result_cache import ResultCache
+from service import LottoramaService
+from snapshot import (
+    PREFIX, MappedTables, Snapshot, load_data, save_data, write_snapshot
+    )
+from synthetic import write_draws_csv
+
+
+@pytest.fixture
+def services(tmp_path, matrix):
+    """
+    A service that built the draw data and wrote the snapshot, and a
+    second one mapping it.
+    """
+    backend = LocalBackend(str(tmp_path))
+    write_draws_csv(matrix, backend.path("euro"))
+    path = str(tmp_path / "lottorama.snapshot")
+
+    def service(**options):
+        return LottoramaService(
+            DrawCache(str(tmp_path / "cache.sqlite3")), backend=backend,
+            results=ResultCache(max_size=0, path=None), snapshot=path,
+            **options
+            )
+
+    built = service()
+    built.reload()
+    mapped = service()
+    mapped.reload()
+    return built, mapped, path
+
+
+def test_arrays_round_trip(tmp_path):
+    arrays = {
+        "bytes": np.arange(10, dtype=np.uint8),
+        "words": np.arange(12, dtype=np.uint64).reshape(3, 4),
+        "floats": np.linspace(0, 1, 7),
+        "flags": np.array([True, False, True]),
+        "empty": np.zeros((0, 5), dtype=np.int32),
+        "scalar": np.array(3),
+    }
+    path = str(tmp_path / "arrays.snapshot")
+    write_snapshot(path, arrays, {"state": [1, 2.5], "name": "test"})
+    snapshot = Snapshot(path)
+    assert snapshot.meta == {"state": [1, 2.5], "name": "test"}
+    for name, array in arrays.items():
+        assert snapshot[name].dtype == array.dtype
+        assert np.array_equal(snapshot[name], array)
+        assert not snapshot[name].flags.writeable
+    assert list(tmp_path.iterdir()) == [tmp_path / "arrays.snapshot"]
+
+
+def test_mapped_data_matches_the_data_built(services):
+    built, mapped, _ = services
+    assert isinstance(mapped.data.tables, MappedTables)
+    assert not isinstance(built.data.tables, MappedTables)
+    for name in built.data._fields:
+        expected = getattr(built.data, name)
+        actual = getattr(mapped.data, name)
+        if hasattr(expected, "arrays"):
+            expected, actual = expected.arrays(), actual.arrays()
+        if isinstance(expected, dict):
+            assert expected.keys() == actual.keys()
+            expected, actual = list(expected.values()), list(actual.values())
+        if isinstance(expected, (list, tuple)):
+            assert len(expected) == len(actual)
+            for left, right in zip(expected, actual):
+                assert np.array_equal(left, right), name
+        else:
+            assert np.array_equal(expected, actual), name
+
+    for method, args in (
+            ("analyse", ([7, 23, 34, 45, 49], [3, 11])),
+            ("complete", ([7, 45], 3)),
+            ("last_draw", ())):
+        assert getattr(mapped, method)(*args) == getattr(built, method)(*args)
+    assert mapped.tiers(half_life=20) == built.tiers(half_life=20)
+    assert mapped.predict([7, 45], 3, seed=1) == built.predict(
+        [7, 45], 3, seed=1
+        )
+
+
+def test_tables_pickle_to_the_path_until_replaced(services):
+    _, mapped, path = services
+    tables = mapped.data.tables
+    small = pickle.dumps(tables)
+    assert len(small) < 1000
+    restored = pickle.loads(small)
+    assert all(np.array_equal(restored[k], tables[k]) for k in range(1, 6))
+
+    # Once replaced, the tables themselves are sent
+    save_data(path, mapped.data, (0, 0.0))
+    restored = pickle.loads(pickle.dumps(tables))
+    assert type(restored) is dict
+    assert all(np.array_equal(restored[k], tables[k]) for k in range(1, 6))
+
+
+def test_other_states_and_bad_files_are_not_loaded(services, tmp_path):
+    built, _, path = services
+    state = built.cache.state()
+    assert load_data(path, state) is not None
+    assert load_data(path, (state[0] + 1,) + state[1:]) is None
+    assert load_data(str(tmp_path / "missing"), state) is None
+
+    with open(path, "rb") as source:
+        content = source.read()
+    for bad in (b"", b"12345", PREFIX.pack(b"LOTTOSNP", 1, 2) + b"{}",
+                content[:PREFIX.size + 100], content[:len(content) // 2]):
+        with open(path, "wb") as target:
+            target.write(bad)
+        assert load_data(path, state) is None
+
+
+def test_a_sync_without_new_draws_keeps_the_snapshot(services, matrix):
+    _, mapped, path = services
+    data = mapped.data
+    written = os.stat(path)
+    assert mapped.cache.sync(mapped.backend) == 0
+    mapped.reload()
+    assert mapped.data is data
+    assert os.stat(path).st_ino == written.st_ino
+
+    # A new draw is loaded and written for the other processes
+    with open(mapped.backend.path("euro"), "a") as target:
+        target.write("D99999999,1,2,3,4,5,1,2\n")
+    assert mapped.cache.sync(mapped.backend) == 1
+    mapped.reload()
+    assert len(mapped.data.matrix) == len(matrix) + 1
+    assert os.stat(path).st_ino != written.st_ino
+    assert load_data(path, mapped.cache.state()) is not None
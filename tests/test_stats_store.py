@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+
+from backends import LocalBackend
+from draw_cache import DrawCache
+from draw_matrix import subset_counts
+from ranking import parse_draws
+from stats_store import StatsStore
+from synthetic import write_draws_csv
+
+
+def brute_stats(matrix):
+    """
+    Function to recount every statistic of the store, one draw at a
+    time.
+    """
+    main = np.zeros(51, dtype=np.int64)
+    lucky = np.zeros(13, dtype=np.int64)
+    pairs = np.zeros((51, 51), dtype=np.int64)
+    main_since = np.full(51, -1)
+    lucky_since = np.full(13, -1)
+    for age, draw in enumerate(matrix[::-1].tolist()):
+        for num in draw[:5]:
+            main[num] += 1
+            if main_since[num] < 0:
+                main_since[num] = age
+            for other in draw[:5]:
+                if other != num:
+                    pairs[num, other] += 1
+        for num in draw[5:]:
+            lucky[num] += 1
+            if lucky_since[num] < 0:
+                lucky_since[num] = age
+    return main, lucky, pairs, main_since, lucky_since
+
+
+def assert_counts(store, matrix):
+    main, lucky, pairs, main_since, lucky_since = brute_stats(matrix)
+    assert store.draws == len(matrix)
+    assert np.array_equal(store.main_counts, main)
+    assert np.array_equal(store.lucky_counts, lucky)
+    assert np.array_equal(store.pair_counts, pairs)
+    assert np.array_equal(store.draws_since()[0], main_since)
+    assert np.array_equal(store.draws_since()[1], lucky_since)
+    assert np.array_equal(store.pair_table(), subset_counts(matrix, 2))
+
+
+@pytest.fixture
+def cache(tmp_path, matrix):
+    """
+    A draw cache synced with the first 250 draws.
+    """
+    backend = LocalBackend(str(tmp_path))
+    write_draws_csv(matrix[:250], backend.path("euro"))
+    cache = DrawCache(str(tmp_path / "cache.sqlite3"))
+    cache.sync(backend)
+    cache.backend = backend
+    return cache
+
+
+def append_draws(cache, matrix, start):
+    with open(cache.backend.path("euro"), "a") as target:
+        for index, draw in enumerate(matrix.tolist(), start=start):
+            target.write(",".join(map(str, [f"D{index:08d}"] + draw)) + "\n")
+    cache.sync(cache.backend)
+
+
+def test_draws_added_one_at_a_time_or_at_once_match_a_recount(matrix):
+    one_by_one = StatsStore()
+    draws = [
+        (f"D{index:08d}", tuple(draw[:5]), tuple(draw[5:]))
+        for index, draw in enumerate(matrix.tolist())
+        ]
+    for draw_date, main_numbers, lucky_numbers in draws:
+        one_by_one.add_draw(main_numbers, lucky_numbers, draw_date)
+    assert_counts(one_by_one, matrix)
+    assert one_by_one.last_date == draws[-1][0]
+
+    at_once = StatsStore()
+    for start in range(0, len(draws), 70):
+        at_once.add_draws(draws[start:start + 70])
+    assert_counts(at_once, matrix)
+    assert at_once.add_draws([]) == 0
+
+
+def test_catch_up_adds_only_the_new_draws(cache, matrix):
+    store = StatsStore()
+    assert store.catch_up(cache) == 250
+    assert_counts(store, matrix[:250])
+    assert store.catch_up(cache) == 0
+
+    append_draws(cache, matrix[250:], 250)
+    added = []
+    store.add_draw = lambda *draw: added.append(draw) or StatsStore.add_draw(
+        store, *draw
+        )
+    assert store.catch_up(cache) == 50
+    assert len(added) == 50
+    assert_counts(store, matrix)
+
+
+def test_checkpoint_round_trip(cache, matrix, tmp_path):
+    path = str(tmp_path / "stats.npz")
+    store = StatsStore(path)
+    store.catch_up(cache)
+    store.save()
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".tmp"] == []
+
+    restored = StatsStore(path)
+    assert_counts(restored, matrix[:250])
+    assert restored.last_date == store.last_date
+
+    # Only the draws cached since the checkpoint are added
+    append_draws(cache, matrix[250:], 250)
+    assert restored.catch_up(cache) == 50
+    assert_counts(restored, matrix)
+
+
+def test_stale_checkpoint_is_rebuilt(cache, matrix, tmp_path):
+    path = str(tmp_path / "stats.npz")
+    store = StatsStore(path)
+    store.catch_up(cache)
+    store.save()
+
+    # Draws were removed from the worksheet above its last row
+    write_draws_csv(matrix[:200], cache.backend.path("euro"))
+    append_draws(cache, matrix[200:], 1000)
+    restored = StatsStore(path)
+    assert restored.catch_up(cache) == 300
+    assert_counts(restored, matrix)
+    assert restored.last_date == parse_draws(cache.rows())[-1][0]
+
+
+@pytest.mark.parametrize("content", [
+    b"", b"not a checkpoint", b"PK\x03\x04 cut short"
+    ])
+def test_unreadable_checkpoint_is_ignored(cache, matrix, tmp_path, content):
+    path = tmp_path / "stats.npz"
+    path.write_bytes(content)
+    store = StatsStore(str(path))
+    assert store.draws == 0
+    assert store.catch_up(cache) == 250
+    assert_counts(store, matrix[:250])
+
+
+def test_checkpoint_of_another_shape_is_ignored(tmp_path):
+    path = str(tmp_path / "stats.npz")
+    np.savez(
+        path, draws=3, last_date=np.array("D00000002"),
+        main_counts=np.ones(10), lucky_counts=np.ones(13),
+        pair_counts=np.ones((51, 51)), main_last_seen=np.ones(51),
+        lucky_last_seen=np.ones(13)
+        )
+    store = StatsStore(path)
+    assert store.draws == 0 and not store.main_counts.any()
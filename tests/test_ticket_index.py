@@ -0,0 +1,73 @@
+import numpy as np
+
+from synthetic import synthetic_matrix
+from ticket_index import (
+    TICKET_RANKS, TicketIndex, decode, encode, lucky_overlap, main_overlap,
+    popcount, ticket_rank
+    )
+
+
+def test_popcount_with_and_without_bitwise_count(rng, monkeypatch):
+    masks = rng.integers(0, 2 ** 64 - 1, 500, dtype=np.uint64)
+    expected = [bin(int(mask)).count("1") for mask in masks]
+    assert popcount(masks).tolist() == expected
+    monkeypatch.delattr(np, "bitwise_count", raising=False)
+    assert popcount(masks).tolist() == expected
+
+
+def test_encode_decode_round_trip(matrix):
+    masks = encode(matrix)
+    assert popcount(masks).tolist() == [7] * len(matrix)
+    assert np.array_equal(decode(masks), matrix)
+
+
+def test_overlaps_match_set_intersections(matrix, rng):
+    tickets = synthetic_matrix(rng, 50)
+    overlaps = main_overlap(encode(tickets)[:, None], encode(matrix)[None])
+    lucky = lucky_overlap(encode(tickets)[:, None], encode(matrix)[None])
+    for i, ticket in enumerate(tickets.tolist()):
+        for j, draw in enumerate(matrix.tolist()):
+            assert overlaps[i, j] == len(set(ticket[:5]) & set(draw[:5]))
+            assert lucky[i, j] == len(set(ticket[5:]) & set(draw[5:]))
+
+
+def test_ticket_rank_is_dense_and_unique(rng):
+    tickets = np.unique(synthetic_matrix(rng, 5000), axis=0)
+    ranks = ticket_rank(tickets)
+    assert len(np.unique(ranks)) == len(tickets)
+    assert ranks.min() >= 0 and ranks.max() < TICKET_RANKS
+    last = [[46, 47, 48, 49, 50, 11, 12]]
+    assert ticket_rank(last).tolist() == [TICKET_RANKS - 1]
+
+
+def test_index_queries_match_brute_force(matrix, rng):
+    index = TicketIndex(matrix)
+    draws = [(set(draw[:5]), draw) for draw in matrix.tolist()]
+    tickets = np.vstack([matrix[:20], synthetic_matrix(rng, 200)])
+
+    expected_won = [
+        any(ticket == draw for _, draw in draws) for ticket in tickets.tolist()
+        ]
+    assert index.has_won(tickets).tolist() == expected_won
+    assert all(expected_won[:20])
+
+    expected_best = [
+        max(len(set(ticket[:5]) & main) for main, _ in draws)
+        for ticket in tickets.tolist()
+        ]
+    assert index.best_match(tickets).tolist() == expected_best
+
+    for k in range(1, 6):
+        combos = tickets[:, :k]
+        expected = [
+            any(set(combo) <= main for main, _ in draws)
+            for combo in combos.tolist()
+            ]
+        assert index.seen_together(combos).tolist() == expected
+
+
+def test_empty_history_has_no_wins(rng):
+    index = TicketIndex(np.zeros((0, 7), dtype=np.uint8))
+    tickets = synthetic_matrix(rng, 10)
+    assert not index.has_won(tickets).any()
+    assert index.best_match(tickets).tolist() == [0] * 10
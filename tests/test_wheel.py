@@ -0,0 +1,86 @@
+from itertools import combinations
+
+import pytest
+
+from draw_cache import DrawCache
+from result_cache import ResultCache
+from service import LottoramaService, ServiceError
+from wheel import main, wheel
+
+
+def uncovered(pool, tickets, guarantee):
+    """
+    Function to list the pairs or triples of the pool on no ticket.
+    """
+    covered = {
+        subset for ticket in tickets
+        for subset in combinations(ticket, guarantee)
+        }
+    return [
+        subset for subset in combinations(sorted(pool), guarantee)
+        if subset not in covered
+        ]
+
+
+@pytest.mark.parametrize("guarantee, sizes", [
+    (2, range(8, 21)), (3, range(8, 13)),
+    ])
+def test_every_subset_of_the_pool_is_covered(rng, guarantee, sizes):
+    for size in sizes:
+        pool = (rng.choice(50, size, replace=False) + 1).tolist()
+        tickets = wheel(pool, guarantee)
+        assert tickets == sorted(tickets)
+        for ticket in tickets:
+            assert ticket == sorted(ticket) and len(set(ticket)) == 5
+            assert set(ticket) <= set(pool)
+        assert uncovered(pool, tickets, guarantee) == []
+
+        # No ticket can be left out
+        for index in range(len(tickets)):
+            others = tickets[:index] + tickets[index + 1:]
+            assert uncovered(pool, others, guarantee), (size, index)
+
+
+def test_pool_given_as_strings_is_wheeled_as_numbers():
+    assert wheel(["3", "7", "12", "18", "23", "31", "40", "44"]) == wheel(
+        [44, 40, 31, 23, 18, 12, 7, 3]
+        )
+
+
+@pytest.mark.parametrize("pool, guarantee, message", [
+    (list(range(1, 8)), 2, "Between 8 and 20 numbers required"),
+    (list(range(1, 22)), 2, "Between 8 and 20 numbers required"),
+    ([0, 2, 3, 4, 5, 6, 7, 8], 2, "between 1 and 50"),
+    ([1, 2, 3, 4, 5, 6, 7, 51], 2, "between 1 and 50"),
+    ([1, 1, 3, 4, 5, 6, 7, 8], 2, "should be unique"),
+    (["1", "2", "x", "4", "5", "6", "7", "8"], 2, "invalid literal"),
+    (list(range(1, 9)), 4, "guarantee should be 2 or 3"),
+    ])
+def test_invalid_pools_are_rejected(tmp_path, pool, guarantee, message):
+    with pytest.raises(ValueError, match=message):
+        wheel(pool, guarantee)
+
+    service = LottoramaService(
+        DrawCache(str(tmp_path / "cache.sqlite3")),
+        results=ResultCache(max_size=0, path=None), snapshot=None
+        )
+    with pytest.raises(ServiceError) as error:
+        service.wheel(pool, [1, 2], guarantee)
+    assert any(message in text for text in error.value.errors)
+
+
+def test_command_line_writes_a_ticket_per_row(tmp_path, capsys):
+    path = tmp_path / "tickets.csv"
+    pool = "3,7,12,18,23,31,40,44"
+    assert main([pool, "--lucky", "9,2", "-o", str(path)]) == 0
+    rows = [
+        list(map(int, line.split(",")))
+        for line in path.read_text().splitlines()
+        ]
+    assert [row[:5] for row in rows] == wheel(pool.split(","))
+    assert all(row[5:] == [2, 9] for row in rows)
+    assert f"{len(rows)} tickets." in capsys.readouterr().err
+
+    assert main([pool, "--lucky", "2,2"]) == 2
+    assert main(["3,7,12"]) == 2
+    assert "Between 8 and 20" in capsys.readouterr().err
@@ -0,0 +1,142 @@
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from windows import (
+    BLOCK_SIZE, DECAYED_CACHE_SIZE, MAX_HALF_LIFE, FrequencyWindows,
+    prefix_counts
+    )
+from synthetic import synthetic_matrix
+
+
+def brute_counts(draws):
+    """
+    Function to count the main and lucky numbers of draws, one draw at
+    a time.
+    """
+    main, lucky = np.zeros(51, dtype=np.int64), np.zeros(13, dtype=np.int64)
+    for draw in draws.tolist():
+        for num in draw[:5]:
+            main[num] += 1
+        for num in draw[5:]:
+            lucky[num] += 1
+    return main, lucky
+
+
+@pytest.fixture
+def history(rng):
+    """
+    Over three blocks of draws, one every three or four days.
+    """
+    matrix = synthetic_matrix(rng, 2 * BLOCK_SIZE + 77)
+    days = np.cumsum(rng.integers(3, 5, len(matrix)))
+    dates = [
+        (date(2004, 2, 13) + timedelta(days=int(day))).isoformat()
+        for day in days
+        ]
+    return matrix, dates
+
+
+def test_prefix_counts_match_a_running_count(history):
+    matrix, _ = history
+    blocks, offsets = prefix_counts(matrix[:, :5], 50)
+    assert offsets.dtype == np.uint8 and len(offsets) == len(matrix) + 1
+    for rows in (0, 1, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1,
+                 len(matrix)):
+        counts = blocks[rows // BLOCK_SIZE] + offsets[rows]
+        assert np.array_equal(counts, brute_counts(matrix[:rows])[0])
+
+    # A number drawn in every draw of a block still fits in a byte
+    same = np.tile(np.arange(1, 8, dtype=np.uint8), (3 * BLOCK_SIZE, 1))
+    blocks, offsets = prefix_counts(same[:, :5], 50)
+    assert (blocks[-1] + offsets[-1])[1] == 3 * BLOCK_SIZE
+
+
+def test_last_and_since_match_brute_force(history):
+    matrix, dates = history
+    windows = FrequencyWindows(matrix, dates)
+    for draws in (0, 1, 10, BLOCK_SIZE, BLOCK_SIZE + 3, len(matrix),
+                  len(matrix) + 10):
+        expected = brute_counts(matrix[len(matrix) - min(draws, len(matrix)):])
+        for actual, counts in zip(windows.last(draws), expected):
+            assert np.array_equal(actual, counts)
+
+    for index in (0, 1, 100, BLOCK_SIZE, len(matrix) - 1):
+        expected = brute_counts(matrix[index:])
+        day = date.fromisoformat(dates[index])
+        for since in (day, dates[index],
+                      day.strftime("%d/%m/%Y"), day - timedelta(days=1)):
+            for actual, counts in zip(windows.since(since), expected):
+                assert np.array_equal(actual, counts)
+
+    day = date.fromisoformat(dates[-1]) + timedelta(days=1)
+    assert not windows.since(day)[0].any()
+    with pytest.raises(ValueError):
+        windows.since("31 Jan 2024")
+    with pytest.raises(ValueError):
+        FrequencyWindows(matrix).since(day)
+
+
+def test_sweep_matches_last(history):
+    matrix, _ = history
+    windows = FrequencyWindows(matrix)
+    sizes = [0, 5, BLOCK_SIZE, 400, len(matrix), len(matrix) + 1]
+    main, lucky = windows.sweep(sizes)
+    for row, size in enumerate(sizes):
+        expected = windows.last(size)
+        assert np.array_equal(main[row], expected[0])
+        assert np.array_equal(lucky[row], expected[1])
+
+
+def test_decayed_matches_brute_force(history):
+    matrix, _ = history
+    windows = FrequencyWindows(matrix)
+    # Short half-lives only weigh the most recent draws, older ones
+    # weigh less than 2 ** -64 each
+    for half_life in (0.5, 3, 50, 2.5 * BLOCK_SIZE, MAX_HALF_LIFE):
+        main = np.zeros(51)
+        lucky = np.zeros(13)
+        for age, draw in enumerate(matrix[::-1].tolist()):
+            weight = 0.5 ** (age / half_life)
+            main[draw[:5]] += weight
+            lucky[draw[5:]] += weight
+        actual = windows.decayed(half_life)
+        assert np.allclose(actual[0], main, rtol=1e-12, atol=1e-15)
+        assert np.allclose(actual[1], lucky, rtol=1e-12, atol=1e-15)
+
+    for half_life in (0, -1, float("nan"), float("inf"), MAX_HALF_LIFE + 1):
+        with pytest.raises(ValueError):
+            windows.decayed(half_life)
+
+
+def test_decayed_keeps_the_last_half_lives(history):
+    matrix, _ = history
+    windows = FrequencyWindows(matrix)
+
+    def ask(half_life):
+        windows.decayed(half_life)
+
+    threads = [
+        threading.Thread(target=ask, args=(half_life,))
+        for half_life in range(1, 41)
+        ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(windows._decayed) == DECAYED_CACHE_SIZE
+    first = windows.decayed(7)
+    assert windows.decayed(7) is first
+
+
+def test_from_arrays_round_trip(history):
+    matrix, dates = history
+    windows = FrequencyWindows(matrix, dates)
+    copy = FrequencyWindows.from_arrays(matrix, windows.arrays())
+    assert np.array_equal(copy.sweep([3, 300])[0], windows.sweep([3, 300])[0])
+    assert np.array_equal(
+        copy.since(dates[50])[1], windows.since(dates[50])[1]
+        )
+    assert np.array_equal(copy.decayed(20)[0], windows.decayed(20)[0])
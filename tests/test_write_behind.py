@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+import sheets
+from backends import SheetsBackend
+from fake_sheets import FakeSheetsServer, FakeSpreadsheet
+from write_behind import WriteBehindQueue
+
+
+class Recorder:
+    """
+    Write function recording the batches written, failing while
+    'failing' is set and holding every write until 'gate' is set.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.calls = []
+        self.failing = False
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, rows):
+        self.calls.append(time.monotonic())
+        self.gate.wait()
+        if self.failing:
+            raise ConnectionError("backend down")
+        self.batches.append(list(rows))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_close_writes_the_queued_rows_in_batches():
+    recorder = Recorder()
+    log = WriteBehindQueue(recorder, interval=60, batch_size=10)
+    rows = [[index] for index in range(25)]
+    for row in rows:
+        assert log.submit(row)
+    assert log.close()
+    assert [row for batch in recorder.batches for row in batch] == rows
+    assert all(len(batch) <= 10 for batch in recorder.batches)
+    assert len(recorder.batches) <= 4
+    assert log.written == 25 and log.pending() == 0
+
+    assert not log.submit([25])
+    assert log.dropped == 1
+
+
+def test_full_queue_drops_rows_after_the_timeout():
+    recorder = Recorder()
+    recorder.gate.clear()
+    log = WriteBehindQueue(recorder, max_size=2, interval=0, batch_size=1)
+    accepted = [log.submit([index], timeout=0.05) for index in range(4)]
+    assert not all(accepted)
+    assert log.dropped == accepted.count(False)
+
+    recorder.gate.set()
+    assert log.close()
+    assert log.written == accepted.count(True)
+    assert log.written + log.dropped == 4
+
+
+def test_failed_batch_is_retried_with_backoff():
+    recorder = Recorder()
+    recorder.failing = True
+    log = WriteBehindQueue(recorder, interval=0.02, max_attempts=5)
+    log.submit(["a"])
+    log.submit(["b"])
+    wait_for(lambda: len(recorder.calls) == 3)
+    recorder.failing = False
+    wait_for(lambda: log.written == 2)
+    assert recorder.batches == [[["a"], ["b"]]]
+    assert isinstance(log.last_error, ConnectionError)
+    assert log.dropped == 0 and log.pending() == 0
+
+    # Each failure doubles the wait before the next attempt
+    gaps = [later - earlier for earlier, later in zip(
+        recorder.calls, recorder.calls[1:]
+        )]
+    assert gaps[0] >= 0.015 and gaps[1] >= 0.035 and gaps[2] >= 0.075
+    log.close()
+
+
+def test_batch_is_dropped_after_its_last_attempt(capsys):
+    recorder = Recorder()
+    recorder.failing = True
+    log = WriteBehindQueue(
+        recorder, interval=0.01, max_attempts=3, max_backoff=0.02
+        )
+    log.submit(["2024-01-02 10:00:00", 7, 45])
+    wait_for(lambda: log.dropped == 1)
+    assert len(recorder.calls) == 3
+    assert log.pending() == 0
+    stderr = capsys.readouterr().err
+    assert "1 tickets could not be written and were dropped" in stderr
+    assert "2024-01-02 10:00:00,7,45" in stderr
+
+    # The next batch is written once the backend is back
+    recorder.failing = False
+    log.submit(["2024-01-02 10:00:05", 8, 46])
+    wait_for(lambda: log.written == 1)
+    assert recorder.batches == [[["2024-01-02 10:00:05", 8, 46]]]
+    assert log.close()
+
+
+def test_close_drops_what_cannot_be_written(capsys):
+    recorder = Recorder()
+    recorder.failing = True
+    log = WriteBehindQueue(recorder, interval=60, batch_size=2)
+    for index in range(5):
+        log.submit([index])
+    assert log.close()
+    assert log.written == 0 and log.dropped == 5
+    assert "5 tickets could not be written" in capsys.readouterr().err
+
+
+@pytest.fixture
+def spreadsheet(monkeypatch):
+    """
+    A fake 'lottorama-data' document that Google Sheets calls go to.
+    """
+    document = FakeSpreadsheet([["01/01/2024", 1, 2, 3, 4, 5, 1, 2]])
+    server = FakeSheetsServer(("127.0.0.1", 0), document).start()
+    monkeypatch.setattr(sheets, "OFFLINE", False)
+    monkeypatch.setattr(sheets, "SHEETS_URL", server.url)
+    monkeypatch.setattr(sheets, "_client", None)
+    monkeypatch.setattr(sheets, "_spreadsheets", {})
+    monkeypatch.setattr(sheets, "_worksheets", {})
+    yield server.spreadsheet
+    server.shutdown()
+    server.server_close()
+
+
+def test_tickets_worksheet_is_added_on_first_append(spreadsheet):
+    assert "tickets" not in spreadsheet.worksheets
+    backend = SheetsBackend()
+    log = WriteBehindQueue(backend.append_tickets, interval=60)
+    log.submit(["2024-01-02 10:00:00", 7, 23, 34, 45, 49, 3, 11])
+    assert log.close() and log.written == 1
+
+    # Another process finds the worksheet added
+    sheets._spreadsheets.clear()
+    sheets._worksheets.clear()
+    backend.append_tickets([["2024-01-02 10:00:05", 1, 2, 3, 4, 5, 6, 7]])
+    assert [row[:2] for row in spreadsheet.worksheets["tickets"]] == [
+        ["2024-01-02 10:00:00", "7"], ["2024-01-02 10:00:05", "1"]
+        ]
@@ -0,0 +1,251 @@
+"""
+Combinatorial index of Euro Millions tickets.
+
+A ticket of five main numbers and two lucky numbers is encoded two ways:
+
+- As a 64-bit mask, with bit n - 1 set for each main number n and
+  bit 49 + n set for each lucky number n. Membership is a single AND,
+  and the overlap of two tickets is the popcount of their AND.
+- As a dense rank from 0 to 2,118,760 x 66 - 1: the colex rank of the
+  main numbers among the 50 choose 5 combinations, times the 66 lucky
+  pairs, plus the colex rank of the lucky pair.
+
+TicketIndex precomputes, from the draw history, which combinations of
+1 to 5 main numbers have ever been drawn together and which full
+tickets have ever won the jackpot. Queries on them are array lookups,
+whatever the length of the history.
+"""
+from math import comb
+
+import numpy as np
+
+from draw_matrix import colex_rank, subset_counts
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX
+from simulation import SUBSET_COLUMNS
+
+MAIN_COMBINATIONS = comb(MAIN_NUMBER_MAX, 5)
+LUCKY_PAIRS = comb(LUCKY_NUMBER_MAX, 2)
+TICKET_RANKS = MAIN_COMBINATIONS * LUCKY_PAIRS
+
+MAIN_MASK = np.uint64((1 << MAIN_NUMBER_MAX) - 1)
+LUCKY_MASK = np.uint64(((1 << LUCKY_NUMBER_MAX) - 1) << MAIN_NUMBER_MAX)
+
+# NUMBER_BITS[n] is the bit of main number n, LUCKY_BITS[n] of lucky n
+NUMBER_BITS = np.array(
+    [0] + [1 << (num - 1) for num in range(1, MAIN_NUMBER_MAX + 1)],
+    dtype=np.uint64
+    )
+LUCKY_BITS = np.array(
+    [0] + [1 << (MAIN_NUMBER_MAX + num - 1)
+           for num in range(1, LUCKY_NUMBER_MAX + 1)],
+    dtype=np.uint64
+    )
+
+# Bits set in every byte, for NumPy versions without bitwise_count
+BYTE_POPCOUNT = np.array(
+    [bin(byte).count("1") for byte in range(256)], dtype=np.uint8
+    )
+
+
+def popcount(masks):
+    """
+    Function to count the bits set in 64-bit masks.
+
+    Args:
+    masks (ndarray): uint64 masks of any shape.
+
+    Returns:
+    ndarray: The number of bits set in each mask.
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks)
+    as_bytes = masks[..., np.newaxis].view(np.uint8)
+    return BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def encode(tickets):
+    """
+    Function to encode tickets as 64-bit masks.
+
+    Args:
+    tickets (ndarray): (n x 7) tickets or draws, five main numbers
+    followed by two lucky numbers, such as the draw matrix.
+
+    Returns:
+    ndarray: The n uint64 masks.
+    """
+    tickets = np.asarray(tickets, dtype=np.intp)
+    return (
+        np.bitwise_or.reduce(NUMBER_BITS[tickets[:, :5]], axis=1) |
+        np.bitwise_or.reduce(LUCKY_BITS[tickets[:, 5:7]], axis=1)
+        )
+
+
+def decode(masks):
+    """
+    Function to decode 64-bit masks back into tickets.
+
+    Args:
+    masks (ndarray): uint64 masks of valid tickets.
+
+    Returns:
+    ndarray: (n x 7) uint8 tickets with sorted main and lucky numbers.
+    """
+    masks = np.asarray(masks, dtype=np.uint64).reshape(-1)
+    main = (masks[:, np.newaxis] & NUMBER_BITS[1:]) != 0
+    lucky = (masks[:, np.newaxis] & LUCKY_BITS[1:]) != 0
+    numbers = np.arange(1, MAIN_NUMBER_MAX + 1, dtype=np.uint8)
+    return np.hstack([
+        np.broadcast_to(numbers, main.shape)[main].reshape(-1, 5),
+        np.broadcast_to(numbers[:LUCKY_NUMBER_MAX], lucky.shape)[
+            lucky].reshape(-1, 2),
+        ])
+
+
+def main_overlap(masks, other):
+    """
+    Function to count the main numbers two sets of tickets share.
+
+    Args:
+    masks (ndarray): uint64 ticket masks.
+    other (ndarray): uint64 masks broadcastable against them.
+
+    Returns:
+    ndarray: The number of main numbers in common.
+    """
+    return popcount(np.asarray(masks) & np.asarray(other) & MAIN_MASK)
+
+
+def lucky_overlap(masks, other):
+    """
+    Function to count the lucky numbers two sets of tickets share.
+
+    Args:
+    masks (ndarray): uint64 ticket masks.
+    other (ndarray): uint64 masks broadcastable against them.
+
+    Returns:
+    ndarray: The number of lucky numbers in common.
+    """
+    return popcount(np.asarray(masks) & np.asarray(other) & LUCKY_MASK)
+
+
+def ticket_rank(tickets):
+    """
+    Function to number tickets densely from 0 to TICKET_RANKS - 1.
+
+    Args:
+    tickets (ndarray): (n x 7) tickets with sorted main numbers and
+    sorted lucky numbers.
+
+    Returns:
+    ndarray: The int64 ranks.
+    """
+    tickets = np.asarray(tickets)
+    return (
+        colex_rank(tickets[:, :5]) * LUCKY_PAIRS +
+        colex_rank(tickets[:, 5:7])
+        )
+
+
+class TicketIndex:
+    """
+    Which combinations of main numbers and which full tickets have
+    appeared in the draw history.
+
+    Args:
+    matrix (ndarray): The draw matrix.
+    tables (dict): Optional subset count tables from
+    simulation.build_tables(), to avoid counting them again.
+    """
+
+    def __init__(self, matrix, tables=None):
+        if tables is None:
+            tables = {k: subset_counts(matrix, k) for k in range(1, 6)}
+        self.draws = len(matrix)
+        self.seen = {k: tables[k] > 0 for k in range(1, 6)}
+        self.jackpots = np.zeros((TICKET_RANKS + 7) // 8, dtype=np.uint8)
+        if self.draws:
+            ranks = np.unique(ticket_rank(matrix))
+            np.bitwise_or.at(
+                self.jackpots, ranks >> 3,
+                (1 << (7 - (ranks & 7))).astype(np.uint8)
+                )
+
+    def arrays(self):
+        """
+        Function to get the arrays of the index, to save them.
+
+        Returns:
+        dict: The arrays by name.
+        """
+        arrays = {f"seen_{k}": self.seen[k] for k in range(1, 6)}
+        arrays["jackpots"] = self.jackpots
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, matrix, arrays):
+        """
+        Function to rebuild an index from its saved arrays, without
+        copying them.
+
+        Args:
+        matrix (ndarray): The draw matrix the index was built from.
+        arrays (dict): The arrays from arrays().
+
+        Returns:
+        TicketIndex: The index.
+        """
+        index = cls.__new__(cls)
+        index.draws = len(matrix)
+        index.seen = {k: arrays[f"seen_{k}"] for k in range(1, 6)}
+        index.jackpots = arrays["jackpots"]
+        return index
+
+    def has_won(self, tickets):
+        """
+        Function to check if tickets have ever won the jackpot.
+
+        Args:
+        tickets (ndarray): (n x 7) sorted tickets.
+
+        Returns:
+        ndarray: True for each ticket drawn exactly in the history.
+        """
+        ranks = ticket_rank(tickets)
+        return (self.jackpots[ranks >> 3] >> (7 - (ranks & 7))) & 1 == 1
+
+    def seen_together(self, combos):
+        """
+        Function to check if main numbers were ever drawn together.
+
+        Args:
+        combos (ndarray): (n x k) sorted combinations of 1 to 5 main
+        numbers.
+
+        Returns:
+        ndarray: True for each combination found in at least one draw.
+        """
+        combos = np.asarray(combos)
+        return self.seen[combos.shape[-1]][colex_rank(combos)]
+
+    def best_match(self, tickets):
+        """
+        Function to get the most main numbers of each ticket ever
+        drawn together, which is the best past match of the ticket.
+
+        Args:
+        tickets (ndarray): (n x 5) or (n x 7) sorted tickets.
+
+        Returns:
+        ndarray: The best match of each ticket, from 0 to 5.
+        """
+        main = np.asarray(tickets)[:, :5]
+        best = np.zeros(len(main), dtype=np.int64)
+        for k in range(1, 6):
+            found = self.seen[k][
+                colex_rank(main[:, SUBSET_COLUMNS[k]])
+                ].any(axis=1)
+            best[found] = k
+        return best
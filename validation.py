@@ -0,0 +1,180 @@
+"""
+Validation rules for Euro Millions tickets.
+
+The rules are kept apart from the interactive game so that tickets
+read from files can be checked the same way as tickets typed in by
+the user.
+"""
+from colorama import Fore, Style
+
+COUNT_ERROR = "Error: Exactly 5 whole numbers required!"
+
+# Smallest and largest pools of main numbers that can be wheeled
+MIN_POOL_SIZE = 8
+MAX_POOL_SIZE = 20
+
+
+def main_number_errors(values):
+    """
+    Function to list the problems with the five main numbers
+    of a ticket.
+
+    Args:
+    values (str or list): The numbers as a comma-separated string
+    or list.
+
+    Returns:
+    list: Error messages, empty if the numbers are valid. A wrong
+    amount of numbers is reported on its own as COUNT_ERROR.
+    """
+    errors = []
+
+    # If the input is a list, convert it to a comma-separated string
+    if isinstance(values, list):
+        values = ','.join(map(str, values))
+
+    # Check if there are spaces between values and commas
+    if any(' ' in value for value in values.split(',')):
+        errors.append("Error: Spaces not allowed between values and commas.")
+
+    """
+    Convert each value to an integer and check if they are within
+    the range of 1 to 50
+    """
+    int_values = []
+    for value in values.split(','):
+        try:
+            int_values.append(int(value))
+        except ValueError as ve:
+            errors.append(f"Error: {ve}")
+
+    # Check if exactly 5 values are provided
+    if len(int_values) != 5:
+        return [COUNT_ERROR]
+
+    for value in int_values:
+        if not 1 <= value <= 50:
+            errors.append("Error: Values should be between 1 and 50.")
+
+    # Check if the numbers are unique
+    if len(set(int_values)) != 5:
+        errors.append("Error: The 5 numbers should be unique.")
+
+    return errors
+
+
+def pool_errors(values):
+    """
+    Function to list the problems with a pool of main numbers
+    to wheel, checked with the same rules as the five main numbers
+    of a ticket.
+
+    Args:
+    values (str or list): The numbers as a comma-separated string
+    or list.
+
+    Returns:
+    list: Error messages, empty if the pool is valid.
+    """
+    if isinstance(values, list):
+        values = ','.join(map(str, values))
+
+    if any(' ' in value for value in values.split(',')):
+        return ["Error: Spaces not allowed between values and commas."]
+
+    try:
+        int_values = [int(value) for value in values.split(',')]
+    except ValueError as ve:
+        return [f"Error: {ve}"]
+
+    errors = []
+    if not MIN_POOL_SIZE <= len(int_values) <= MAX_POOL_SIZE:
+        errors.append(
+            f"Error: Between {MIN_POOL_SIZE} and {MAX_POOL_SIZE} " +
+            "numbers required!"
+            )
+
+    if not all(1 <= value <= 50 for value in int_values):
+        errors.append("Error: Values should be between 1 and 50.")
+
+    if len(set(int_values)) != len(int_values):
+        errors.append("Error: The numbers should be unique.")
+
+    return errors
+
+
+def lucky_number_errors(values):
+    """
+    Function to list the problems with the two lucky numbers
+    of a ticket.
+
+    Args:
+    values (str or list): The lucky numbers as a comma-separated
+    string or list.
+
+    Returns:
+    list: Error messages, empty if the lucky numbers are valid.
+    """
+    if isinstance(values, list):
+        values = ','.join(map(str, values))
+
+    # Check if the input contains spaces
+    if " " in values:
+        return [
+            "Error: Spaces are not allowed. " +
+            "Please re-enter lucky numbers without spaces."
+            ]
+
+    try:
+        lucky_numbers = [int(num) for num in values.split(",")]
+    except ValueError:
+        return ["Error: Please enter only two integers for lucky numbers."]
+
+    if not (
+        all(1 <= num <= 12 for num in lucky_numbers) and
+        len(lucky_numbers) == 2
+            ):
+        return [
+            "Error: Lucky numbers should be two integers between 1 and 12."
+            ]
+
+    # Check if lucky_numbers are unique
+    if len(set(lucky_numbers)) != 2:
+        return [
+            "Error: Lucky numbers should " +
+            "be two unique integers between 1 and 12."
+            ]
+
+    return []
+
+
+def validate_data(values):
+    """
+    Function to validate user-entered data for
+    Euro Millions ticket numbers of user.
+
+    Args:
+    values (str or list): The user-entered numbers
+    as a comma-separated string or list.
+
+    Returns:
+    bool: True if the data is valid, False otherwise.
+    """
+    errors_five_nums = main_number_errors(values)
+
+    if errors_five_nums == [COUNT_ERROR]:
+        print(Fore.RED + Style.BRIGHT + COUNT_ERROR + " \n")
+        return False
+
+    if errors_five_nums:
+        """
+        Print the errors, if any, and return False
+        indicating data is not valid
+        """
+        for num in errors_five_nums:
+            print(Fore.RED + Style.BRIGHT + num)
+        print("\n" + Fore.YELLOW + "* Please try again!")
+        return False
+
+    # Return True if the data is valid
+    return True
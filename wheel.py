@@ -0,0 +1,195 @@
+"""
+Wheeling of a pool of main numbers into a set of tickets.
+
+A wheel of a pool of 8 to 20 main numbers is a set of tickets, each
+made of five numbers of the pool, such that every pair (guarantee 2)
+or every triple (guarantee 3) of the pool is on at least one ticket.
+Whatever numbers of the pool are drawn, one ticket then holds any two
+or three of them.
+
+Finding the smallest wheel is a set cover problem, solved greedily:
+each candidate ticket is encoded as a bitset of the pairs or triples
+it covers, and the ticket covering the most pairs or triples not yet
+covered is taken until all are. Each round is a vectorized AND and
+popcount over all candidates, up to 15,504 tickets for a pool of 20.
+Tickets that the others made redundant are then dropped.
+
+Usage:
+    python3 wheel.py 3,7,12,18,23,31,40,44 --lucky 2,9
+    python3 wheel.py 1,5,8,13,21,27,30,34,41,47,50,2 --guarantee 3 \\
+        -o tickets.csv
+"""
+import argparse
+import csv
+import sys
+from contextlib import ExitStack
+from itertools import combinations
+from math import comb
+
+import numpy as np
+
+from draw_matrix import colex_rank
+from simulation import SUBSET_COLUMNS
+from ticket_index import popcount
+from validation import lucky_number_errors, pool_errors
+
+# Pairs or triples of the pool every wheel can guarantee
+GUARANTEES = (2, 3)
+
+
+def cover_masks(tickets, guarantee, size):
+    """
+    Function to encode the pairs or triples each ticket covers.
+
+    Args:
+    tickets (ndarray): (n x 5) tickets of indices 0 to size - 1 in
+    the pool, sorted ascending.
+    guarantee (int): 2 for pairs, 3 for triples.
+    size (int): The size of the pool.
+
+    Returns:
+    tuple: (n x words) uint64 bitsets, with bit r set for the pair or
+    triple of colex rank r, and the (n x (5 choose guarantee)) ranks
+    themselves.
+    """
+    ranks = colex_rank(tickets[:, SUBSET_COLUMNS[guarantee]] + 1)
+    words = (comb(size, guarantee) + 63) // 64
+    masks = np.zeros((len(tickets), words), dtype=np.uint64)
+    rows = np.repeat(np.arange(len(tickets)), ranks.shape[1])
+    np.bitwise_or.at(
+        masks, (rows, ranks.ravel() >> 6),
+        np.left_shift(np.uint64(1), (ranks.ravel() & 63).astype(np.uint64))
+        )
+    return masks, ranks
+
+
+def greedy_cover(masks, targets):
+    """
+    Function to pick tickets until every target is covered, each
+    time the one covering the most targets left.
+
+    Args:
+    masks (ndarray): (n x words) bitsets of the targets each ticket
+    covers.
+    targets (int): The number of targets, bits 0 to targets - 1.
+
+    Returns:
+    list: The indices of the tickets picked, in order.
+    """
+    uncovered = np.zeros(masks.shape[1], dtype=np.uint64)
+    for bit in range(0, targets, 64):
+        uncovered[bit >> 6] = np.uint64(
+            (1 << min(targets - bit, 64)) - 1
+            )
+    picked = []
+    while uncovered.any():
+        gains = popcount(masks & uncovered).sum(axis=1, dtype=np.int64)
+        best = int(np.argmax(gains))
+        picked.append(best)
+        uncovered &= ~masks[best]
+    return picked
+
+
+def drop_redundant(picked, ranks, targets):
+    """
+    Function to drop the tickets whose targets are all covered by
+    other tickets, the last picked first.
+
+    Args:
+    picked (list): Indices of the tickets picked.
+    ranks (ndarray): Targets covered by every candidate ticket.
+    targets (int): The number of targets.
+
+    Returns:
+    list: The indices of the tickets kept.
+    """
+    covers = np.bincount(ranks[picked].ravel(), minlength=targets)
+    kept = []
+    for index in reversed(picked):
+        if (covers[ranks[index]] > 1).all():
+            covers[ranks[index]] -= 1
+        else:
+            kept.append(index)
+    return kept[::-1]
+
+
+def wheel(pool, guarantee=2):
+    """
+    Function to wheel a pool of main numbers.
+
+    Args:
+    pool (list): 8 to 20 unique main numbers.
+    guarantee (int): 2 to cover every pair of the pool, 3 for
+    every triple.
+
+    Returns:
+    list: The tickets, each five numbers in ascending order, sorted.
+
+    Raises:
+    ValueError: If the pool or the guarantee is not valid.
+    """
+    errors = pool_errors(pool)
+    if errors:
+        raise ValueError(" ".join(errors))
+    if guarantee not in GUARANTEES:
+        raise ValueError("The guarantee should be 2 or 3.")
+
+    numbers = np.array(sorted(int(num) for num in pool))
+    size = len(numbers)
+    tickets = np.array(list(combinations(range(size), 5)), dtype=np.int64)
+    targets = comb(size, guarantee)
+    masks, ranks = cover_masks(tickets, guarantee, size)
+    picked = drop_redundant(greedy_cover(masks, targets), ranks, targets)
+    return sorted(numbers[tickets[picked]].tolist())
+
+
+def main(argv=None):
+    """
+    Function to wheel a pool of numbers from the command line.
+
+    Returns:
+    int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Wheel a pool of Euro Millions numbers into tickets."
+        )
+    parser.add_argument(
+        "pool", help="8 to 20 main numbers separated by commas"
+        )
+    parser.add_argument(
+        "--lucky", default="1,2",
+        help="the two lucky numbers of every ticket"
+        )
+    parser.add_argument(
+        "--guarantee", type=int, choices=GUARANTEES, default=2,
+        help="cover every pair (2) or every triple (3) of the pool"
+        )
+    parser.add_argument(
+        "-o", "--output", default="-",
+        help="tickets CSV file, or - to write to standard output"
+        )
+    args = parser.parse_args(argv)
+
+    errors = pool_errors(args.pool) + lucky_number_errors(args.lucky)
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        return 2
+    lucky = sorted(int(num) for num in args.lucky.split(","))
+    tickets = wheel(args.pool.split(","), args.guarantee)
+
+    # One ticket per row, the input format of batch.py
+    with ExitStack() as stack:
+        target = sys.stdout if args.output == "-" else stack.enter_context(
+            open(args.output, "w", newline="")
+            )
+        writer = csv.writer(target)
+        for numbers in tickets:
+            writer.writerow(numbers + lucky)
+
+    print(f"{len(tickets)} tickets.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""
+Windowed and time-decayed number frequencies of the draw history.
+
+The counts of every main and lucky number are accumulated draw by draw
+into prefix-sum arrays, so that the counts over any range of draws, the
+last N draws or the draws since a date, are the difference of two rows:
+a query costs one subtraction per number, whatever the length of the
+history. Many window sizes can be swept in a single vectorized
+subtraction.
+
+The prefix sums are split in blocks of BLOCK_SIZE draws: the counts at
+the start of every block, and for every draw the counts since the start
+of its block, which fit in a byte. They take a byte per number and
+draw, 640 MB for ten million draws instead of 2.6 GB as int32 counts.
+
+Exponentially decayed counts, where the weight of a draw halves every
+half_life draws, are computed with a weighted bincount of the last
+DECAY_HORIZON half-lives of draws, older draws weighing next to
+nothing. With half-lives up to MAX_HALF_LIFE draws, they cost at most
+64,000 draws, whatever the length of the history. The last few
+half-lives asked for are kept.
+"""
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+
+from ranking import LUCKY_NUMBER_MAX, MAIN_NUMBER_MAX
+
+# Formats tried in turn to read the draw dates of the 'euro' worksheet
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y")
+
+# Draws per block of the prefix sums, the counts since the start of a
+# block fit in a byte
+BLOCK_SIZE = 256
+
+# Decayed counts kept, by half-life
+DECAYED_CACHE_SIZE = 4
+
+# Longest half-life, in draws, of decayed counts
+MAX_HALF_LIFE = 1000
+
+# Half-lives of draws weighed in decayed counts, older draws weigh less
+# than 2 ** -64
+DECAY_HORIZON = 64
+
+
+def parse_date(text):
+    """
+    Function to read a draw date.
+
+    Args:
+    text (str): The date, in one of DATE_FORMATS.
+
+    Returns:
+    date: The date, or None if it is in none of the formats.
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def prefix_counts(columns, maximum):
+    """
+    Function to accumulate the counts of every number draw by draw,
+    by blocks of BLOCK_SIZE draws.
+
+    Args:
+    columns (ndarray): (draws x k) numbers of each draw, unique
+    within a draw.
+    maximum (int): The largest number.
+
+    Returns:
+    tuple: The (draws // BLOCK_SIZE + 1) x (maximum + 1) int64 counts
+    of every number before each block, and the (draws + 1) x
+    (maximum + 1) uint8 counts since the start of the block of each
+    row, so that the counts over the first i draws are
+    blocks[i // BLOCK_SIZE] + offsets[i].
+    """
+    draws = len(columns)
+    count = draws // BLOCK_SIZE + 1
+    drawn = np.zeros((count * BLOCK_SIZE, maximum + 1), dtype=np.uint8)
+    drawn[np.arange(draws)[:, np.newaxis], columns.astype(np.intp)] = 1
+    drawn = drawn.reshape(count, BLOCK_SIZE, maximum + 1)
+
+    # Row i of a block counts the i draws of the block before it
+    offsets = np.zeros_like(drawn)
+    np.cumsum(drawn[:, :-1], axis=1, dtype=np.uint8, out=offsets[:, 1:])
+    blocks = np.zeros((count, maximum + 1), dtype=np.int64)
+    np.cumsum(drawn[:-1].sum(axis=1, dtype=np.int64), axis=0, out=blocks[1:])
+    return blocks, offsets.reshape(-1, maximum + 1)[:draws + 1]
+
+
+def prefix_rows(blocks, offsets, rows):
+    """
+    Function to read the counts over the first draws from blocked
+    prefix sums.
+
+    Args:
+    blocks (ndarray): The counts before each block.
+    offsets (ndarray): The counts since the start of each block.
+    rows (int or ndarray): The numbers of draws counted.
+
+    Returns:
+    ndarray: The int64 counts of every number, one row per row asked.
+    """
+    return blocks[np.asarray(rows) // BLOCK_SIZE] + offsets[rows]
+
+
+def date_ordinals(dates):
+    """
+    Function to read the dates of draws in draw order.
+
+    Args:
+    dates (list): The dates as strings.
+
+    Returns:
+    ndarray: The proleptic Gregorian ordinal of every date, or None if
+    a date cannot be read or they are not in ascending order.
+    """
+    parsed = [parse_date(text) for text in dates]
+    if not all(parsed):
+        return None
+    ordinals = np.array([day.toordinal() for day in parsed], dtype=np.int64)
+    if np.any(ordinals[1:] < ordinals[:-1]):
+        return None
+    return ordinals
+
+
+class FrequencyWindows:
+    """
+    Number counts over windows of the draw history.
+
+    Args:
+    matrix (ndarray): The draw matrix, in draw order.
+    dates (list): Optional draw dates as strings, in the same order,
+    needed for the queries by date.
+    """
+
+    def __init__(self, matrix, dates=None):
+        self.draws = len(matrix)
+        self.main = prefix_counts(matrix[:, :5], MAIN_NUMBER_MAX)
+        self.lucky = prefix_counts(matrix[:, 5:7], LUCKY_NUMBER_MAX)
+        self._main_numbers = matrix[:, :5]
+        self._lucky_numbers = matrix[:, 5:7]
+        self._decayed = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.ordinals = None if dates is None else date_ordinals(dates)
+
+    def arrays(self):
+        """
+        Function to get the prefix sums and draw dates, to save them.
+
+        Returns:
+        dict: The arrays by name.
+        """
+        arrays = {
+            "main_blocks": self.main[0], "main_offsets": self.main[1],
+            "lucky_blocks": self.lucky[0], "lucky_offsets": self.lucky[1],
+            }
+        if self.ordinals is not None:
+            arrays["ordinals"] = self.ordinals
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, matrix, arrays):
+        """
+        Function to rebuild the windows from their saved arrays,
+        without copying them.
+
+        Args:
+        matrix (ndarray): The draw matrix they were built from.
+        arrays (dict): The arrays from arrays().
+
+        Returns:
+        FrequencyWindows: The windows.
+        """
+        windows = cls.__new__(cls)
+        windows.draws = len(matrix)
+        windows.main = arrays["main_blocks"], arrays["main_offsets"]
+        windows.lucky = arrays["lucky_blocks"], arrays["lucky_offsets"]
+        windows._main_numbers = matrix[:, :5]
+        windows._lucky_numbers = matrix[:, 5:7]
+        windows._decayed = OrderedDict()
+        windows._lock = threading.Lock()
+        windows.ordinals = arrays.get("ordinals")
+        return windows
+
+    def extended(self, matrix, dates=None):
+        """
+        Function to add draws to the windows. Only the prefix sums of
+        the last block are computed again.
+
+        Args:
+        matrix (ndarray): The draw matrix with the draws added, the
+        draws of the windows first.
+        dates (list): The dates of the draws added, as strings.
+
+        Returns:
+        FrequencyWindows: The windows of the whole matrix.
+        """
+        start = self.draws // BLOCK_SIZE * BLOCK_SIZE
+        windows = self.__class__.__new__(self.__class__)
+        windows.draws = len(matrix)
+        for name, columns, maximum in (
+                ("main", matrix[:, :5], MAIN_NUMBER_MAX),
+                ("lucky", matrix[:, 5:7], LUCKY_NUMBER_MAX)):
+            blocks, offsets = getattr(self, name)
+            added_blocks, added_offsets = prefix_counts(
+                columns[start:], maximum
+                )
+            setattr(windows, name, (
+                np.concatenate([
+                    blocks[:start // BLOCK_SIZE],
+                    blocks[start // BLOCK_SIZE] + added_blocks
+                    ]),
+                np.concatenate([offsets[:start], added_offsets]),
+                ))
+        windows._main_numbers = matrix[:, :5]
+        windows._lucky_numbers = matrix[:, 5:7]
+        windows._decayed = OrderedDict()
+        windows._lock = threading.Lock()
+
+        windows.ordinals = None
+        if self.ordinals is not None and dates is not None:
+            ordinals = date_ordinals(dates)
+            if ordinals is not None and not (
+                    len(self.ordinals) and len(ordinals)
+                    and ordinals[0] < self.ordinals[-1]):
+                windows.ordinals = np.concatenate([self.ordinals, ordinals])
+        return windows
+
+    def between(self, start, stop):
+        """
+        Function to count the numbers of a range of draws.
+
+        Args:
+        start (int): Index of the first draw of the range.
+        stop (int): Index past the last draw of the range.
+
+        Returns:
+        tuple: Two arrays (main_counts, lucky_counts) indexed by the
+        number, as from draw_matrix.number_counts().
+        """
+        start = min(max(start, 0), self.draws)
+        stop = min(max(stop, start), self.draws)
+        return (
+            prefix_rows(*self.main, stop) - prefix_rows(*self.main, start),
+            prefix_rows(*self.lucky, stop) - prefix_rows(*self.lucky, start),
+            )
+
+    def last(self, draws):
+        """
+        Function to count the numbers of the most recent draws.
+
+        Args:
+        draws (int): The number of draws.
+
+        Returns:
+        tuple: Two arrays (main_counts, lucky_counts).
+        """
+        return self.between(self.draws - max(draws, 0), self.draws)
+
+    def since(self, day):
+        """
+        Function to count the numbers of the draws since a date.
+
+        Args:
+        day (date or str): The first day counted, as a date or in one
+        of DATE_FORMATS.
+
+        Returns:
+        tuple: Two arrays (main_counts, lucky_counts).
+
+        Raises:
+        ValueError: If the day or the draw dates cannot be read.
+        """
+        if self.ordinals is None:
+            raise ValueError("The draw dates are not in a known format.")
+        if not isinstance(day, date):
+            text, day = day, parse_date(str(day))
+            if day is None:
+                raise ValueError(f"Unknown date format: {text}")
+        start = np.searchsorted(self.ordinals, day.toordinal(), side="left")
+        return self.between(int(start), self.draws)
+
+    def decayed(self, half_life):
+        """
+        Function to count the numbers with exponentially decaying
+        weights, 1 for the latest draw and halving every half_life
+        draws before it. Only the last DECAY_HORIZON half-lives of
+        draws are weighed.
+
+        Args:
+        half_life (float): Draws for the weight to halve, up to
+        MAX_HALF_LIFE.
+
+        Returns:
+        tuple: Two float arrays (main_counts, lucky_counts).
+
+        Raises:
+        ValueError: If the half-life is not a positive number up to
+        MAX_HALF_LIFE.
+        """
+        if not (math.isfinite(half_life) and 0 < half_life <= MAX_HALF_LIFE):
+            raise ValueError(
+                "The half-life must be a positive number of draws up to "
+                f"{MAX_HALF_LIFE}."
+                )
+        with self._lock:
+            if half_life in self._decayed:
+                self._decayed.move_to_end(half_life)
+                return self._decayed[half_life]
+
+        start = max(self.draws - math.ceil(DECAY_HORIZON * half_life), 0)
+        weights = 0.5 ** (
+            (self.draws - 1 - np.arange(start, self.draws)) / half_life
+            )
+        counts = (
+            np.bincount(
+                self._main_numbers[start:].ravel(),
+                weights=np.repeat(weights, 5),
+                minlength=MAIN_NUMBER_MAX + 1
+                ),
+            np.bincount(
+                self._lucky_numbers[start:].ravel(),
+                weights=np.repeat(weights, 2),
+                minlength=LUCKY_NUMBER_MAX + 1
+                ),
+            )
+        with self._lock:
+            self._decayed[half_life] = counts
+            while len(self._decayed) > DECAYED_CACHE_SIZE:
+                self._decayed.popitem(last=False)
+        return counts
+
+    def sweep(self, sizes):
+        """
+        Function to count the numbers of the most recent draws for
+        many window sizes at once.
+
+        Args:
+        sizes (list): The window sizes, in draws.
+
+        Returns:
+        tuple: Two arrays (main_counts, lucky_counts) with one row
+        per window size.
+        """
+        starts = self.draws - np.clip(np.asarray(sizes), 0, self.draws)
+        return (
+            prefix_rows(*self.main, self.draws) -
+            prefix_rows(*self.main, starts),
+            prefix_rows(*self.lucky, self.draws) -
+            prefix_rows(*self.lucky, starts),
+            )
@@ -0,0 +1,201 @@
+"""
+Write-behind queue for the tickets submitted by users.
+
+Submitting a ticket only puts it in a bounded in-memory queue and
+returns. A background thread takes the queued tickets in batches and
+writes each batch with a single append, at most every flush interval,
+so answering a user never waits on Google Sheets. When the queue is
+full, submitting waits for room up to a timeout (backpressure) and the
+ticket is dropped and counted if none frees up. A batch that fails to
+be written is kept and retried, without taking more tickets in the
+meantime, waiting twice as long after each failure up to a limit. Once
+it has failed max_attempts times it is dropped, counted and its rows
+are logged to stderr as CSV so they can be entered again, and the next
+batch is taken. Closing the queue writes every ticket still queued
+before returning.
+"""
+import csv
+import os
+import queue
+import sys
+import threading
+import time
+
+from metrics import increment, span
+
+# Most tickets held in memory waiting to be written
+DEFAULT_MAX_SIZE = int(os.environ.get("LOTTORAMA_TICKET_QUEUE_SIZE", 10000))
+
+# Seconds between batch writes
+DEFAULT_INTERVAL = float(
+    os.environ.get("LOTTORAMA_TICKET_FLUSH_INTERVAL", 5.0)
+    )
+
+# Most tickets written by a single append
+DEFAULT_BATCH_SIZE = 500
+
+# Writes of a batch attempted before it is dropped
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Most seconds waited before retrying a batch
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of rows written in batches by a background thread.
+
+    Args:
+    write (callable): Writes a list of rows in one call, such as
+    the append_tickets() method of a backend.
+    max_size (int): Most rows held in the queue.
+    interval (float): Seconds between batch writes.
+    batch_size (int): Most rows given to a single write.
+    max_attempts (int): Writes of a batch attempted before it is
+    dropped.
+    max_backoff (float): Most seconds waited before retrying a batch.
+    """
+
+    def __init__(self, write, max_size=DEFAULT_MAX_SIZE,
+                 interval=DEFAULT_INTERVAL, batch_size=DEFAULT_BATCH_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 max_backoff=DEFAULT_MAX_BACKOFF):
+        self.write = write
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.written = 0
+        self.dropped = 0
+        self.last_error = None
+        self._queue = queue.Queue(max_size)
+        self._stop = threading.Event()
+        # Held while a row is put, so that none lands after close()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+            )
+        self._thread.start()
+
+    def submit(self, row, timeout=1.0):
+        """
+        Function to queue a row to be written.
+
+        Args:
+        row (list): The row.
+        timeout (float): Seconds to wait for room when the queue is
+        full, None to wait as long as needed.
+
+        Returns:
+        bool: False if the row was dropped, because the queue stayed
+        full or is closed.
+        """
+        with self._lock:
+            try:
+                if self._stop.is_set():
+                    raise queue.Full
+                self._queue.put(row, timeout=timeout)
+            except queue.Full:
+                self.dropped += 1
+                increment("write_behind_dropped_total")
+                return False
+        increment("write_behind_queued_total")
+        return True
+
+    def pending(self):
+        """
+        Function to get the number of rows waiting to be written.
+
+        Returns:
+        int: The rows queued or in a batch being written.
+        """
+        return self._queue.unfinished_tasks
+
+    def _take(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows):
+        """
+        Function to write a batch of rows.
+
+        Returns:
+        bool: True if the batch was written.
+        """
+        try:
+            with span("write_behind.flush"):
+                self.write(rows)
+        except Exception as e:
+            self.last_error = e
+            increment("write_behind_errors_total")
+            return False
+        self.written += len(rows)
+        increment("write_behind_rows_total", len(rows))
+        for _ in rows:
+            self._queue.task_done()
+        return True
+
+    def _drop(self, rows):
+        """
+        Function to give up on rows that could not be written, logging
+        them to stderr.
+        """
+        self.dropped += len(rows)
+        increment("write_behind_dropped_total", len(rows))
+        print(
+            f"{len(rows)} tickets could not be written and were dropped: "
+            f"{self.last_error}", file=sys.stderr
+            )
+        csv.writer(sys.stderr).writerows(rows)
+        for _ in rows:
+            self._queue.task_done()
+
+    def _run(self):
+        batch = []
+        failures = 0
+        while not self._stop.is_set():
+            started = time.monotonic()
+            wait = self.interval
+            batch = batch or self._take(self.batch_size)
+            if batch and self._flush(batch):
+                batch, failures = [], 0
+            elif batch:
+                failures += 1
+                if failures >= self.max_attempts:
+                    self._drop(batch)
+                    batch, failures = [], 0
+                else:
+                    wait = min(
+                        self.interval * 2 ** (failures - 1), self.max_backoff
+                        )
+            # Keep writing full batches while the queue is backed up
+            if batch or self._queue.qsize() < self.batch_size:
+                self._stop.wait(max(wait - (time.monotonic() - started), 0))
+
+        # Closing: write everything left, one last attempt per batch
+        batch = batch or self._take(self.batch_size)
+        while batch:
+            if not self._flush(batch):
+                self._drop(batch + self._take(self._queue.qsize()))
+                return
+            batch = self._take(self.batch_size)
+
+    def close(self, timeout=30.0):
+        """
+        Function to stop taking rows and write the rows still queued.
+
+        Args:
+        timeout (float): Most seconds to wait for the last writes.
+
+        Returns:
+        bool: True if every row was handled before the timeout.
+        """
+        with self._lock:
+            self._stop.set()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()